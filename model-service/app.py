@@ -1,13 +1,34 @@
-import os, uuid, cv2, requests, logging, threading
+import os, cv2, requests, logging, threading, time, hmac, torch
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
 from ultralytics import YOLO
-from datetime import datetime, timedelta
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
-from pydantic import BaseModel
+from datetime import datetime
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
 from uploader import trim_video_ffmpeg, upload_to_drive
+from detection_index import (
+    INDEX_MIN_CONF, CooldownGate, DetectionIndex, DetectionIndexWriter,
+    extract_alerts, format_timestamp,
+)
+from sharding import iter_sharded_detections
+from frame_transport import read_frames, start_decoder, track_frames
+from jobs import JOB_ID_PATTERN, JobStore, RUNNING, EVENT_PENDING
+from autotune import AUTOTUNE, DEFAULT_IMGSZ, apply_profile, load_or_tune, profile_summary
+from cluster import COORDINATOR_URL, NODE_ID, NODE_MAX_JOBS, NODE_URL, NodeAgent
+from hotswap import (
+    MODEL_WARMUP_FRAMES, SHADOW_SAMPLE_RATE, ModelManager, NoCandidate, SwapInProgress,
+)
+from overload import LIVE, ARCHIVE, OVERLOAD_CONTROL, OVERLOAD_MIN_IMGSZ, OverloadController, build_levels
+from scratch import CLIP_DIR, SCRATCH_QUOTA_MB, ScratchSpace, node_dir
+from profiler import PROFILE_MAX_SECONDS, ProfilerBusy, collapse, sample, tag_thread, untag_thread
+from metrics import (
+    REGISTRY, ALERTS, DETECTION_TO_ACK_SECONDS, JOB_FPS, QUEUE_DEPTH, SCRATCH_REJECTED_JOBS,
+    JobRate, observe_frame, timed,
+)
 from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
 import glob
-import shutil
 from zoneinfo import ZoneInfo
 
 # Load environment variables from .env file (for local development)
@@ -24,36 +45,205 @@ logger = logging.getLogger("model-service")
 MODEL_WEIGHTS = os.getenv("YOLO_WEIGHTS", "/app/weights/best.pt")
 device = "cpu"
 THRESHOLD = 0.7
-COOLDOWN_SECONDS = 20
+COOLDOWN_SECONDS = 30
 VIDEO_DIR = os.getenv("VIDEO_DIR", "/app/videos")
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(VIDEO_DIR, "index"))
+SAVE_DETECTION_INDEX = os.getenv("SAVE_DETECTION_INDEX", "false").lower() == "true"
+VIDEO_SHARDS = int(os.getenv("VIDEO_SHARDS", "1"))
+DECODE_PROCESS = os.getenv("DECODE_PROCESS", "false").lower() == "true"
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(VIDEO_DIR, "jobs"))
+SCRATCH_DIR = os.getenv("SCRATCH_DIR", os.path.join(VIDEO_DIR, "scratch"))
 BACKEND_URL = os.getenv("INTERNAL_BACKEND_URL")
 SECRET_HEADER_NAME = "X-INTERNAL-SECRET"
 SECRET = os.environ["INTERNAL_SECRET"]
 ACCIDENT_CLASS_ID = 0
 
 ACCIDENT_CLASS_ID = 0  # Class ID for accident
-app = FastAPI(title="CrashAlertAI-Model-Service")
+
+@asynccontextmanager
+async def lifespan(app):
+    global node_agent
+    # Nothing runs yet, so whatever is left in scratch space belongs to a crashed run.
+    # Files of older versions are only swept outside a cluster, where no other node can own them.
+    scratch.sweep([] if COORDINATOR_URL else [
+        "/tmp/clip_*.mp4",
+        os.path.join(VIDEO_DIR, "runs", "track", "inference_bbox*"),
+    ])
+    if COORDINATOR_URL:
+        # The coordinator owns running jobs and moves them from its last heartbeat
+        resume_interrupted_jobs(resume_running=False)
+        node_agent = NodeAgent(COORDINATOR_URL, NODE_ID, NODE_URL, NODE_MAX_JOBS, running_job_snapshots, SECRET,
+                               accepting=lambda: not scratch.full())
+        node_agent.start()
+    else:
+        resume_interrupted_jobs()
+    if overload:
+        overload.start()
+    yield
+    if overload:
+        overload.stop()
+    if node_agent:
+        node_agent.stop()
+
+app = FastAPI(title="CrashAlertAI-Model-Service", lifespan=lifespan)
+
+# Inference settings: the tuned profile for this host, or the defaults
+inference_profile = load_or_tune(MODEL_WEIGHTS) if AUTOTUNE else None
+if inference_profile:
+    apply_profile(inference_profile)
+IMGSZ = inference_profile["imgsz"] if inference_profile else DEFAULT_IMGSZ
+INFERENCE_WEIGHTS = inference_profile["modelPath"] if inference_profile else MODEL_WEIGHTS
+
+def load_model(weights):
+    loaded = YOLO(weights)
+    if weights.endswith(".pt"):
+        # Exported models (ONNX, OpenVINO) pick their device when loaded
+        loaded = loaded.to(device)
+        # Fused once here rather than by the first predictor of each job copy, which
+        # would fuse the shared weights while other jobs run inference on them
+        with torch.no_grad():
+            loaded.fuse()
+    return loaded
 
 # Load YOLO11 model
 try:
-    model = YOLO(MODEL_WEIGHTS).to(device)
-    logger.info(f"✅ Successfully loaded YOLO11 model from {MODEL_WEIGHTS}")
+    model = load_model(INFERENCE_WEIGHTS)
+    logger.info(f"✅ Successfully loaded YOLO11 model from {INFERENCE_WEIGHTS}")
 except Exception as e:
     logger.info(f"⚠️  Model loading failed: {str(e)}")
     model = None
 
+def _model_swapped(version):
+    global model
+    model = version.model
+
+# Jobs lease the active model for their whole run; /admin/model swaps it for new jobs
+models = ModelManager(model, INFERENCE_WEIGHTS, load_model, THRESHOLD, IMGSZ, ACCIDENT_CLASS_ID,
+                      on_swap=_model_swapped)
+
+# Under load, live jobs trade frame stride and image size for keeping close to real time.
+# Exported models only run at the image size they were exported at.
+_fixed_imgsz = bool(inference_profile) and inference_profile["backend"] != "pytorch"
+overload = OverloadController(
+    build_levels(IMGSZ, min_imgsz=IMGSZ if _fixed_imgsz else OVERLOAD_MIN_IMGSZ)
+) if OVERLOAD_CONTROL else None
+
+# Checkpoints of running jobs, kept on the videos volume so they survive restarts
+job_store = JobStore(JOBS_DIR)
+# Per-job temporary files (inference output, clips), deleted when the job ends.
+# Cluster nodes may share VIDEO_DIR and /tmp, so each sweeps and meters only its own directory.
+if COORDINATOR_URL:
+    SCRATCH_DIR, CLIP_DIR = node_dir(SCRATCH_DIR, NODE_ID), CLIP_DIR and node_dir(CLIP_DIR, NODE_ID)
+scratch = ScratchSpace(SCRATCH_DIR, CLIP_DIR, int(SCRATCH_QUOTA_MB * 1024 * 1024))
+# Heartbeats to the coordinator when this instance is a cluster node
+node_agent = None
+
 class RunRequest(BaseModel):
     videoId: str
     cameraId: str
     location: str
+    saveIndex: bool = SAVE_DETECTION_INDEX
+    shards: int = Field(VIDEO_SHARDS, ge=1, le=os.cpu_count() or 1)   # each shard is a process with its own model
+    priority: Literal[LIVE, ARCHIVE] = LIVE   # archive jobs are paused first under overload
+    # Set by the coordinator only; both require the X-INTERNAL-SECRET header
+    jobId: Optional[str] = Field(None, pattern=JOB_ID_PATTERN)
+    checkpoint: Optional[dict] = None    # progress from a failed node, to resume from
+
+class ModelSwapRequest(BaseModel):
+    weights: str
+    shadow: bool = False                                      # compare on live frames before promotion
+    shadowSampleRate: float = Field(SHADOW_SAMPLE_RATE, gt=0, le=1)
+    warmupFrames: int = Field(MODEL_WARMUP_FRAMES, ge=0)
+
+class RethresholdRequest(BaseModel):
+    videoId: str
+    threshold: float = THRESHOLD
+    cooldownSeconds: float = COOLDOWN_SECONDS
+    classIds: List[int] = [ACCIDENT_CLASS_ID]
+
+def get_index_dir(video_path):
+    video_id = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(INDEX_DIR, video_id)
 
-def predict_video(video_path, metadata):
+def iter_video_results(video_path, conf, start_frame=0, model_version=None, job=None, fps=None):
+    """
+    Yield (frame_index, Results) for every frame of a video from start_frame on
+    
+    Frames are tracked with the model_version a job leased, or the active model.
+    With DECODE_PROCESS enabled, frames are decoded in a separate process into a
+    shared-memory ring and tracked here without being copied or pickled;
+    otherwise YOLO's built-in video streaming decodes in this thread, or OpenCV
+    when the video has to start from a frame other than the first.
+    
+    With the overload controller on, a job's frames are always decoded by
+    OpenCV or the ring, so the controller can skip frames, change the image
+    size from one frame to the next and pause archive jobs.
+    """
+    yolo = model_version.model if model_version else model
+    load = None
+    if overload and job and fps:
+        load = overload.register(job.job_id, fps, job.options.get("priority", LIVE), start_frame)
+    imgsz = (lambda: overload.level.imgsz) if load else IMGSZ
+    try:
+        if not DECODE_PROCESS and not start_frame and not load:
+            yield from enumerate(yolo.track(source=video_path, stream=True, conf=conf, imgsz=IMGSZ, verbose=False))
+            return
+        
+        if not DECODE_PROCESS:
+            cap = cv2.VideoCapture(video_path)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            frames = read_frames(cap, start_frame)
+            try:
+                yield from track_frames(yolo, overload.throttle(load, frames) if load else frames, conf, imgsz)
+            finally:
+                cap.release()
+            return
+        
+        ring, decoder = start_decoder(video_path, start_frame)
+        frames = ring.frames()
+        try:
+            for i, item in enumerate(track_frames(yolo, overload.throttle(load, frames) if load else frames, conf, imgsz)):
+                if i % 30 == 0:
+                    stats = ring.stats()
+                    QUEUE_DEPTH.set(stats["frames_written"] - stats["frames_read"], queue="frame_ring")
+                yield item
+        finally:
+            decoder.join(timeout=5)
+            if decoder.is_alive():
+                decoder.terminate()
+            logger.info(f"Frame transport stats for {video_path}: {ring.stats()}")
+            ring.close()
+    finally:
+        if load:
+            overload.unregister(load)
+
+def raise_alert(job, frame_index, video_path, timestamp_str, metadata, confidence, last_alert_time):
+    """Log an accident, checkpoint it with the job (if any) and broadcast it in a new thread"""
+    logger.info(f"🔍 Accident detected at {timestamp_str} with confidence {confidence:.2f}")
+    
+    event = None
+    if job:
+        event = job_store.record_event(job, frame_index, timestamp_str, confidence, last_alert_time)
+    
+    # Start a new thread to broadcast the accident alert
+    threading.Thread(
+        target=broadcast,
+        args=(video_path, timestamp_str, metadata, confidence),
+        kwargs={"job": job, "event": event, "detected_at": time.perf_counter()}
+    ).start()
+
+def predict_video(video_path, metadata, save_index=False, job=None, model_version=None):
     """
     Process a video for accident detection using YOLOv11m and broadcast accidents
     
     Args:
         video_path (str): Path to the video file to analyze
         metadata (dict): Dictionary containing camera metadata including cameraId and location
+        save_index (bool): Also keep every raw detection down to INDEX_MIN_CONF in a
+            detection index, so alerts can later be re-extracted without inference
+        job (Job): Checkpointed job to report progress to; processing resumes from
+            its frame offset and cooldown state
+        model_version (ModelVersion): Model leased for this job (default: the active model)
     """
     # Set up logging
     logger = logging.getLogger(__name__)
@@ -67,21 +257,32 @@ def predict_video(video_path, metadata):
     fps = cap.get(cv2.CAP_PROP_FPS)
     cap.release()  # Release as we'll use YOLO's built-in video processing
     
-    # Initialize variables for accident detection and cooldown
-    last_detection_time = None
-    cooldown_period = timedelta(seconds=30)
+    start_frame = job.frame_offset if job else 0
+    if save_index and start_frame:
+        logger.warning(f"Resuming {video_path} at frame {start_frame}: the detection index is not saved for resumed jobs")
+        save_index = False
     
-    # Process the video using YOLO's stream feature for better performance
-    frame_count = 0
+    # Cooldown is measured in video time so the alerts can be reproduced from the index
+    gate = CooldownGate(COOLDOWN_SECONDS, job.last_alert_time if job else None)
+    index_writer = DetectionIndexWriter(get_index_dir(video_path), fps) if save_index else None
+    track_conf = min(INDEX_MIN_CONF, THRESHOLD) if index_writer else THRESHOLD
     
-    logger.info(f"Starting accident detection on video: {video_path}")
+    frame_count = start_frame
     
-    # Use YOLO's built-in video processing for better performance
-    for results in model.track(source=video_path, stream=True, conf=THRESHOLD, verbose=False):
+    logger.info(f"Starting accident detection on video: {video_path} (from frame {start_frame})")
+    
+    rate = JobRate(job.job_id if job else os.path.basename(video_path))
+    waited_since = time.perf_counter()
+    for frame_index, results in iter_video_results(video_path, track_conf, start_frame, model_version, job, fps):
+        observe_frame(results, time.perf_counter() - waited_since)
+        rate.tick()
+        shadow = models.shadow   # read once: a promote or discard may clear it at any time
+        if shadow:
+            shadow.offer(results, model_version)
+        
         # Calculate current timestamp in the video
-        current_time = timedelta(seconds=frame_count / fps)
-        current_time_seconds = int(current_time.total_seconds())
-        frame_count += 1
+        current_time_seconds = frame_index / fps
+        previous_count, frame_count = frame_count, frame_index + 1
         
         # Check if an accident was detected
         detections = results.boxes
@@ -91,180 +292,130 @@ def predict_video(video_path, metadata):
             cls_id = int(detection.cls.item())
             confidence = detection.conf.item()
             
+            if index_writer:
+                index_writer.add(frame_index, cls_id, confidence, detection.xyxy[0].tolist())
+            
             # Check if the detection is an accident with sufficient confidence
             if cls_id == ACCIDENT_CLASS_ID and confidence >= THRESHOLD:
                 # Check if we're outside the cooldown period
-                current_datetime = datetime.now()
-                
-                if last_detection_time is None or (current_datetime - last_detection_time) > cooldown_period:
-                    # Update the last detection time
-                    last_detection_time = current_datetime
-                    
+                if gate.admit(current_time_seconds):
                     # Create timestamp string (MM:SS format)
-                    minutes = int(current_time.total_seconds() // 60)
-                    seconds = int(current_time.total_seconds() % 60)
-                    timestamp_str = f"{minutes:02d}:{seconds:02d}"
-                    
-                    logger.info(f"🔍 Accident detected at {timestamp_str} with confidence {confidence:.2f}")
-                    
-                    # Start a new thread to broadcast the accident alert
-                    threading.Thread(
-                        target=broadcast,
-                        args=(video_path, timestamp_str, metadata, confidence)
-                    ).start()
+                    timestamp_str = format_timestamp(current_time_seconds)
+                    raise_alert(job, frame_index, video_path, timestamp_str, metadata, confidence, gate.last_alert_time)
+        
+        if job and job_store.due(frame_count, since=previous_count):
+            job_store.checkpoint(job, frame_count, gate.last_alert_time)
+        waited_since = time.perf_counter()
     
+    rate.close()
+    if index_writer:
+        index_writer.close(frame_count)
+        logger.info(f"Saved detection index to {index_writer.index_dir}")
     logger.info(f"Completed accident detection on video: {video_path}")
 
-def broadcast(video_path, timestamp, metadata, confidence):
+def predict_video_sharded(video_path, metadata, shards, save_index=False, job=None, model_version=None):
     """
-    Broadcast an accident alert to the appropriate channels
+    Process a long video in parallel time shards and broadcast accidents
+    
+    Produces the same alerts as predict_video: shards are merged in video order
+    and run through the same threshold and cooldown rules.
     
     Args:
-        video_path (str): Path to the video where the accident was detected
-        timestamp (str): Timestamp in the video when the accident occurred
-        metadata (dict): Information about the camera (cameraId, location, etc.)
-        confidence (float): Confidence score of the detection
+        video_path (str): Path to the video file to analyze
+        metadata (dict): Dictionary containing camera metadata including cameraId and location
+        shards (int): Number of shards processed in parallel worker processes
+        save_index (bool): Also keep a detection index (see predict_video)
+        job (Job): Checkpointed job to report progress to (see predict_video)
+        model_version (ModelVersion): Model leased for this job; the workers load its weights
     """
     logger = logging.getLogger(__name__)
     
+    start_frame = job.frame_offset if job else 0
+    if save_index and start_frame:
+        logger.warning(f"Resuming {video_path} at frame {start_frame}: the detection index is not saved for resumed jobs")
+        save_index = False
+    
+    gate = CooldownGate(COOLDOWN_SECONDS, job.last_alert_time if job else None)
+    index_writer = None
+    track_conf = min(INDEX_MIN_CONF, THRESHOLD) if save_index else THRESHOLD
+    frame_count = start_frame
+    
+    logger.info(f"Starting sharded accident detection on video: {video_path} (from frame {start_frame})")
+    
+    rate = JobRate(job.job_id if job else os.path.basename(video_path), every=1)
     try:
-        # Parse the timestamp to get seconds
-        minutes, seconds = map(int, timestamp.split(':'))
-        current_time_seconds = minutes * 60 + seconds
-        
-        # Trim video around detection (7 seconds before, 8 seconds after)
-        clip_path = f"/tmp/clip_{uuid.uuid4().hex}.mp4"
-        trim_video_ffmpeg(
-            input_video=video_path,
-            start_time=max(0, current_time_seconds - 7),
-            duration=15,
-            output_video=clip_path
-        )
-        
-        # Upload trimmed clip to Google Drive using existing function
-        gdrive_link = upload_to_drive(logger, clip_path)
-
-        # Israel current time
-        israel_time = datetime.now(ZoneInfo("Asia/Jerusalem")).isoformat()
-        
-        # Prepare accident document
-        accident_doc = {
-            "cameraId": metadata.get("cameraId", "unknown"),
-            "location": metadata.get("location", "unknown"),
-            "date": israel_time,
-            "displayDate": None,
-            "displayTime": None,
-            "severity": "no severity",
-            "video": gdrive_link,
-            "description": f"{confidence:.2f}",
-            "assignedTo": None,
-            "status": "active",
-            "falsePositive": False,
-        }
-        
-        # Send to backend using global configuration
-        response = requests.post(
-            BACKEND_URL,
-            headers={SECRET_HEADER_NAME: SECRET},
-            json=accident_doc,
-            timeout=10
-        )
-        
-        if response.status_code == 201:
-            logger.info("✅ Accident alert sent successfully")
-        else:
-            logger.info(f"❌ Accident alert sent but failed at backend: {response.status_code}")
+        weights = model_version.weights if model_version else INFERENCE_WEIGHTS
+        for shard_index in iter_sharded_detections(video_path, weights, shards, track_conf,
+                                                   start_frame=start_frame, imgsz=IMGSZ):
+            if save_index and index_writer is None:
+                index_writer = DetectionIndexWriter(get_index_dir(video_path), shard_index.fps)
+            if index_writer:
+                index_writer.extend(shard_index)
+            rate.tick(shard_index.meta["end"] - frame_count)
+            frame_count = shard_index.meta["end"]
             
-    except Exception as e:
-        error_message = f"❌ Error in broadcast function: {str(e)}"
-        logger.error(error_message)
+            for event in extract_alerts(shard_index, THRESHOLD, COOLDOWN_SECONDS, [ACCIDENT_CLASS_ID], gate):
+                raise_alert(job, event["frame"], video_path, event["timestamp"], metadata,
+                            event["confidence"], event["seconds"])
+            
+            if job:
+                job_store.checkpoint(job, frame_count, gate.last_alert_time)
+    except IOError as e:
+        logger.error(f"Error in predict_video_sharded: {str(e)}")
+        return
+    finally:
+        rate.close()
+    
+    if index_writer:
+        index_writer.close(frame_count)
+        logger.info(f"Saved detection index to {index_writer.index_dir}")
+    logger.info(f"Completed sharded accident detection on video: {video_path}")
 
-def predict_video_with_bbox(video_path, metadata):
+def broadcast(video_path, timestamp, metadata, confidence, job=None, event=None, detected_at=None):
     """
-    Process a video for accident detection using YOLOv11m, save video with bounding boxes,
-    and post accident to backend. The trimmed segment will have bounding boxes for all frames
-    where the model detects the accident class, and the cooldown period is used to avoid
-    duplicate alerts for the same accident.
+    Broadcast an accident alert to the appropriate channels
+    
+    Args:
+        video_path (str): Path to the video where the accident was detected
+        timestamp (str): Timestamp in the video when the accident occurred
+        metadata (dict): Information about the camera (cameraId, location, etc.)
+        confidence (float): Confidence score of the detection
+        job (Job): Job that raised the alert; the outcome is recorded on its event
+        event (dict): The job's record of this alert
+        detected_at (float): time.perf_counter() at detection, for the end-to-end latency metric
+    
+    Returns:
+        bool: True if the backend accepted the alert
     """
     logger = logging.getLogger(__name__)
+    sent = False
+    QUEUE_DEPTH.inc(queue="broadcast")
+    tag_thread(job.job_id if job else None, "broadcast")
     
-    base_dir = os.path.join(VIDEO_DIR, "runs", "track")
-    os.makedirs(base_dir, exist_ok=True)
-    bbox_video_path = None
-    try:
-        # 1. Run YOLO and save video with bounding boxes to a known location
-        results_iter = model.track(
-            source=video_path,
-            conf=THRESHOLD,
-            save=True,
-            stream=True,
-            verbose=False,
-            project=base_dir,
-            name="inference_bbox"
-        )
-
-        # 2. Accident detection loop (consume all results)
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            logger.error(f"Error: Could not open video file {video_path}")
-            return
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        cap.release()
-
-        last_detection_time = None
-        cooldown_period = timedelta(seconds=30)
-        frame_count = 0
-        accident_events = []
-
-        for results in results_iter:
-            current_time = timedelta(seconds=frame_count / fps)
-            current_time_seconds = int(current_time.total_seconds())
-            frame_count += 1
-
-            detections = results.boxes
-            for detection in detections:
-                cls_id = int(detection.cls.item())
-                confidence = detection.conf.item()
-                if cls_id == ACCIDENT_CLASS_ID and confidence >= THRESHOLD:
-                    current_datetime = datetime.now()
-                    # Only send one alert per cooldown period
-                    if last_detection_time is None or (current_datetime - last_detection_time) > cooldown_period:
-                        last_detection_time = current_datetime
-                        minutes = int(current_time.total_seconds() // 60)
-                        seconds = int(current_time.total_seconds() % 60)
-                        timestamp_str = f"{minutes:02d}:{seconds:02d}"
-                        logger.info(f"🔍 Accident detected at {timestamp_str} with confidence {confidence:.2f}")
-                        accident_events.append((current_time_seconds, confidence))
-                    break
-
-        # 3. The output video should exist in the latest inference_bbox* directory
-        latest_dir = get_latest_inference_bbox_dir(base_dir)
-        if latest_dir:
-            # YOLO saves as .avi by default
-            avi_candidate = os.path.join(latest_dir, os.path.splitext(os.path.basename(video_path))[0] + ".avi")
-            if os.path.exists(avi_candidate):
-                bbox_video_path = avi_candidate
-            else:
-                logger.error(f"No output video with bounding boxes found at {avi_candidate}")
-                return
-        else:
-            logger.error("No inference_bbox output directory found")
-            return
-
-        # 4. For each detected accident event, trim/upload/post (one per cooldown period)
-        for current_time_seconds, confidence in accident_events:
-            clip_path = f"/tmp/clip_bbox_{uuid.uuid4().hex}.mp4"
+    with scratch.workspace(job.job_id if job else None) as workspace:
+        clip_path = None
+        try:
+            # Parse the timestamp to get seconds
+            minutes, seconds = map(int, timestamp.split(':'))
+            current_time_seconds = minutes * 60 + seconds
+        
+            # Trim video around detection (7 seconds before, 8 seconds after)
+            # into the job's workspace; the clip is deleted once handled, sent or not
+            clip_path = workspace.clip_path()
             trim_video_ffmpeg(
-                input_video=bbox_video_path,
+                input_video=video_path,
                 start_time=max(0, current_time_seconds - 7),
                 duration=15,
                 output_video=clip_path
             )
+        
+            # Upload trimmed clip to Google Drive using existing function
             gdrive_link = upload_to_drive(logger, clip_path)
 
             # Israel current time
             israel_time = datetime.now(ZoneInfo("Asia/Jerusalem")).isoformat()
-
+        
+            # Prepare accident document
             accident_doc = {
                 "cameraId": metadata.get("cameraId", "unknown"),
                 "location": metadata.get("location", "unknown"),
@@ -278,27 +429,176 @@ def predict_video_with_bbox(video_path, metadata):
                 "status": "active",
                 "falsePositive": False,
             }
-            response = requests.post(
-                BACKEND_URL,
-                headers={SECRET_HEADER_NAME: SECRET},
-                json=accident_doc,
-                timeout=10
-            )
+        
+            # Send to backend using global configuration
+            with timed("backend_post"):
+                response = requests.post(
+                    BACKEND_URL,
+                    headers={SECRET_HEADER_NAME: SECRET},
+                    json=accident_doc,
+                    timeout=10
+                )
+        
             if response.status_code == 201:
+                sent = True
+                ALERTS.inc(outcome="sent")
+                if detected_at is not None:
+                    DETECTION_TO_ACK_SECONDS.observe(time.perf_counter() - detected_at)
                 logger.info("✅ Accident alert sent successfully")
             else:
+                ALERTS.inc(outcome="rejected")
                 logger.info(f"❌ Accident alert sent but failed at backend: {response.status_code}")
-    except Exception as e:
-        logger.error(f"Error in predict_video_with_bbox: {str(e)}")
-    finally:
-        # Always try to delete the output folder
-        if bbox_video_path and os.path.exists(bbox_video_path):
-            output_dir = os.path.dirname(bbox_video_path)  # Get the parent folder
-            try:
-                shutil.rmtree(output_dir)  # Remove the folder and all its contents
-                logger.info(f"Deleted temporary folder: {output_dir}")
-            except Exception as e:
-                logger.warning(f"Could not delete temporary folder {output_dir}: {e}")
+            
+        except Exception as e:
+            ALERTS.inc(outcome="error")
+            error_message = f"❌ Error in broadcast function: {str(e)}"
+            logger.error(error_message)
+        finally:
+            if clip_path:
+                workspace.discard(clip_path)
+            untag_thread()
+            QUEUE_DEPTH.dec(queue="broadcast")
+            if job and event:
+                job_store.mark_event(job, event, sent)
+    return sent
+
+def predict_video_with_bbox(video_path, metadata, job=None, model_version=None):
+    """
+    Process a video for accident detection using YOLOv11m, save video with bounding boxes,
+    and post accident to backend. The trimmed segment will have bounding boxes for all frames
+    where the model detects the accident class, and the cooldown period is used to avoid
+    duplicate alerts for the same accident.
+    
+    The annotated video is always rendered from the start; when a checkpointed job is
+    resumed, alerts it already delivered are skipped.
+    """
+    logger = logging.getLogger(__name__)
+    
+    # The annotated video and the clips live in the job's workspace, which is
+    # deleted when the job ends whether it succeeded or not
+    with scratch.workspace(job.job_id if job else None) as workspace:
+        base_dir = workspace.subdir("runs", "track")
+        bbox_video_path = None
+        try:
+            # 1. Run YOLO and save video with bounding boxes to a known location
+            yolo = model_version.model if model_version else model
+            results_iter = yolo.track(
+                source=video_path,
+                conf=THRESHOLD,
+                imgsz=IMGSZ,
+                save=True,
+                stream=True,
+                verbose=False,
+                project=base_dir,
+                name="inference_bbox"
+            )
+
+            # 2. Accident detection loop (consume all results)
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                logger.error(f"Error: Could not open video file {video_path}")
+                return
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+
+            gate = CooldownGate(COOLDOWN_SECONDS)
+            frame_count = 0
+            accident_events = []
+
+            rate = JobRate(job.job_id if job else os.path.basename(video_path))
+            waited_since = time.perf_counter()
+            for results in results_iter:
+                observe_frame(results, time.perf_counter() - waited_since)
+                rate.tick()
+                current_time_seconds = frame_count / fps
+                frame_count += 1
+                shadow = models.shadow   # read once: a promote or discard may clear it at any time
+                if shadow:
+                    shadow.offer(results, model_version)
+
+                detections = results.boxes
+                for detection in detections:
+                    cls_id = int(detection.cls.item())
+                    confidence = detection.conf.item()
+                    if cls_id == ACCIDENT_CLASS_ID and confidence >= THRESHOLD:
+                        # Only send one alert per cooldown period
+                        if gate.admit(current_time_seconds):
+                            timestamp_str = format_timestamp(current_time_seconds)
+                            logger.info(f"🔍 Accident detected at {timestamp_str} with confidence {confidence:.2f}")
+                            accident_events.append((int(current_time_seconds), confidence, frame_count - 1, time.perf_counter()))
+                        break
+                waited_since = time.perf_counter()
+            rate.close()
+
+            # 3. The output video should exist in the latest inference_bbox* directory
+            latest_dir = get_latest_inference_bbox_dir(base_dir)
+            if latest_dir:
+                # YOLO saves as .avi by default
+                avi_candidate = os.path.join(latest_dir, os.path.splitext(os.path.basename(video_path))[0] + ".avi")
+                if os.path.exists(avi_candidate):
+                    bbox_video_path = avi_candidate
+                else:
+                    logger.error(f"No output video with bounding boxes found at {avi_candidate}")
+                    return
+            else:
+                logger.error("No inference_bbox output directory found")
+                return
+
+            # 4. For each detected accident event, trim/upload/post (one per cooldown period)
+            for current_time_seconds, confidence, frame_index, detected_at in accident_events:
+                event = job.find_event(frame_index) if job else None
+                if event and event["status"] != EVENT_PENDING:
+                    logger.info(f"Skipping alert at frame {frame_index}, already handled before restart")
+                    continue
+                if job and event is None:
+                    event = job_store.record_event(
+                        job, frame_index, format_timestamp(current_time_seconds), confidence, None
+                    )
+
+                clip_path = workspace.clip_path("clip_bbox")
+                trim_video_ffmpeg(
+                    input_video=bbox_video_path,
+                    start_time=max(0, current_time_seconds - 7),
+                    duration=15,
+                    output_video=clip_path
+                )
+                gdrive_link = upload_to_drive(logger, clip_path)
+
+                # Israel current time
+                israel_time = datetime.now(ZoneInfo("Asia/Jerusalem")).isoformat()
+
+                accident_doc = {
+                    "cameraId": metadata.get("cameraId", "unknown"),
+                    "location": metadata.get("location", "unknown"),
+                    "date": israel_time,
+                    "displayDate": None,
+                    "displayTime": None,
+                    "severity": "no severity",
+                    "video": gdrive_link,
+                    "description": f"{confidence:.2f}",
+                    "assignedTo": None,
+                    "status": "active",
+                    "falsePositive": False,
+                }
+                with timed("backend_post"):
+                    response = requests.post(
+                        BACKEND_URL,
+                        headers={SECRET_HEADER_NAME: SECRET},
+                        json=accident_doc,
+                        timeout=10
+                    )
+                if response.status_code == 201:
+                    ALERTS.inc(outcome="sent")
+                    DETECTION_TO_ACK_SECONDS.observe(time.perf_counter() - detected_at)
+                    logger.info("✅ Accident alert sent successfully")
+                else:
+                    ALERTS.inc(outcome="rejected")
+                    logger.info(f"❌ Accident alert sent but failed at backend: {response.status_code}")
+                if job:
+                    job_store.mark_event(job, event, response.status_code == 201)
+                workspace.discard(clip_path)
+        except Exception as e:
+            logger.error(f"Error in predict_video_with_bbox: {str(e)}")
 
 def ensure_thumbnails():
     thumb_dir = os.path.join(VIDEO_DIR, "thumbnails")
@@ -348,33 +648,141 @@ def list_videos(request: Request):
     return video_list
 
 @app.post("/run")
-def process_video(req: RunRequest, bg: BackgroundTasks):
+def process_video(req: RunRequest, bg: BackgroundTasks, secret: str = Header(None, alias=SECRET_HEADER_NAME)):
     file_path = os.path.join(VIDEO_DIR, f"{req.videoId}.mp4")
     logger.info(f"Processing video: {file_path}")
     logger.info(f"Camera ID: {req.cameraId}")
     logger.info(f"Location: {req.location}")
+    check_coordinator_fields(req, secret)
     if not os.path.isfile(file_path):
         raise HTTPException(404, detail="Video file not found")
+    check_scratch_space()
     
-    bg.add_task(predict_video, file_path, {
+    job = job_store.create("run", file_path, {
         "cameraId": req.cameraId,
         "location": req.location
-    })
-    return {"status": "processing_started", "video": req.videoId} 
+    }, {"saveIndex": req.saveIndex, "shards": req.shards, "priority": req.priority}, job_id=req.jobId, checkpoint=req.checkpoint)
+    resend_pending_alerts(job)
+    bg.add_task(run_job, job)
+    return {"status": "processing_started", "video": req.videoId, "jobId": job.job_id}
+
+@app.post("/rethreshold")
+def rethreshold_video(req: RethresholdRequest):
+    """Re-extract alerts from a saved detection index without running inference."""
+    try:
+        index = DetectionIndex.load(os.path.join(INDEX_DIR, req.videoId))
+    except FileNotFoundError:
+        raise HTTPException(404, detail="Detection index not found")
+    if req.threshold < index.min_conf:
+        raise HTTPException(
+            400, detail=f"Threshold is below the index minimum confidence {index.min_conf}"
+        )
+
+    start = time.perf_counter()
+    events = extract_alerts(index, req.threshold, req.cooldownSeconds, req.classIds)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {
+        "video": req.videoId,
+        "threshold": req.threshold,
+        "cooldownSeconds": req.cooldownSeconds,
+        "classIds": req.classIds,
+        "events": events,
+        "elapsedMs": round(elapsed_ms, 3),
+    }
 
 @app.post("/run-bbox")
-def process_video_with_bbox(req: RunRequest, bg: BackgroundTasks):
+def process_video_with_bbox(req: RunRequest, bg: BackgroundTasks,
+                            secret: str = Header(None, alias=SECRET_HEADER_NAME)):
     file_path = os.path.join(VIDEO_DIR, f"{req.videoId}.mp4")
     logger.info(f"Processing video with bbox: {file_path}")
     logger.info(f"Camera ID: {req.cameraId}")
     logger.info(f"Location: {req.location}")
+    check_coordinator_fields(req, secret)
     if not os.path.isfile(file_path):
         raise HTTPException(404, detail="Video file not found")
-    bg.add_task(predict_video_with_bbox, file_path, {
+    check_scratch_space()
+    # Pending bbox alerts are re-sent by the run, which renders the boxes again
+    job = job_store.create("bbox", file_path, {
         "cameraId": req.cameraId,
         "location": req.location
-    })
-    return {"status": "processing_started", "video": req.videoId}
+    }, job_id=req.jobId, checkpoint=req.checkpoint)
+    bg.add_task(run_job, job)
+    return {"status": "processing_started", "video": req.videoId, "jobId": job.job_id}
+
+def check_coordinator_fields(req: RunRequest, secret: str):
+    """A job id and checkpoint are only taken from the coordinator, which sends the internal secret."""
+    if req.jobId is not None or req.checkpoint is not None:
+        require_internal_secret(secret)
+
+def check_scratch_space():
+    """Refuse new jobs while scratch space is at its quota; running jobs are left to finish."""
+    if scratch.full():
+        SCRATCH_REJECTED_JOBS.inc()
+        raise HTTPException(503, detail="Scratch space is full", headers={"Retry-After": "30"})
+
+def run_job(job):
+    """Run a checkpointed job to completion, from its last checkpoint if it was interrupted"""
+    QUEUE_DEPTH.inc(queue="jobs")
+    tag_thread(job.job_id, "predict_video_with_bbox" if job.kind == "bbox" else "predict_video")
+    failed = False
+    try:
+        with models.lease() as version, scratch.workspace(job.job_id):
+            if job.kind == "bbox":
+                predict_video_with_bbox(job.video_path, job.metadata, job=job, model_version=version)
+            elif job.options.get("shards", 1) > 1:
+                predict_video_sharded(job.video_path, job.metadata, job.options["shards"],
+                                      save_index=job.options.get("saveIndex", False), job=job,
+                                      model_version=version)
+            else:
+                predict_video(job.video_path, job.metadata,
+                              save_index=job.options.get("saveIndex", False), job=job,
+                              model_version=version)
+    except Exception as e:
+        failed = True
+        logger.exception(f"Job {job.job_id} failed at frame {job.frame_offset}: {e}")
+    finally:
+        untag_thread()
+        QUEUE_DEPTH.dec(queue="jobs")
+        JOB_FPS.remove(job=job.job_id)
+        if not failed:
+            if node_agent:
+                # Reported before the checkpoint stops saying running, so no heartbeat sees the job lost
+                node_agent.job_finished(job.job_id)
+            job_store.finish(job)
+        elif node_agent:
+            # Missing from the next heartbeat, so the coordinator runs it again from its last checkpoint
+            job_store.delete(job)
+        # Otherwise the checkpoint still says running and the job resumes from it on the next start
+
+def running_job_snapshots():
+    return [job.to_dict() for job in job_store.load_all() if job.status == RUNNING]
+
+def resend_pending_alerts(job):
+    for event in job.pending_events():
+        logger.info(f"Re-sending unacknowledged alert at {event['timestamp']} for job {job.job_id}")
+        threading.Thread(
+            target=broadcast,
+            args=(job.video_path, event["timestamp"], job.metadata, event["confidence"]),
+            kwargs={"job": job, "event": event}
+        ).start()
+
+def resume_interrupted_jobs(resume_running=True):
+    """Resume jobs that were running when the service stopped and re-send unacknowledged alerts"""
+    for job in job_store.interrupted():
+        if job.status == RUNNING and not resume_running:
+            logger.info(f"Leaving job {job.job_id} to the coordinator")
+            job_store.delete(job)
+            continue
+        if job.kind == "bbox":
+            # Pending bbox alerts are re-sent by the re-run, which renders the boxes again
+            if job.status != RUNNING:
+                job_store.delete(job)
+                continue
+        else:
+            resend_pending_alerts(job)
+        if job.status == RUNNING:
+            logger.info(f"Resuming job {job.job_id} for {job.video_path} from frame {job.frame_offset}")
+            threading.Thread(target=run_job, args=(job,), daemon=True).start()
 
 def get_latest_inference_bbox_dir(base_dir):
     dirs = glob.glob(os.path.join(base_dir, "inference_bbox*"))
@@ -383,9 +791,95 @@ def get_latest_inference_bbox_dir(base_dir):
     dirs.sort(key=os.path.getmtime, reverse=True)
     return dirs[0]
 
+def require_internal_secret(secret: str = Header(None, alias=SECRET_HEADER_NAME)):
+    """Admin endpoints take the same shared secret the service uses towards the backend"""
+    if not secret or not hmac.compare_digest(secret, SECRET):
+        raise HTTPException(401, detail="Invalid internal secret")
+
+@app.post("/admin/profile", dependencies=[Depends(require_internal_secret)])
+def profile_process(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10, alias="intervalMs", ge=1, le=1000),
+    by_job: bool = Query(False, alias="byJob"),
+    include_idle: bool = Query(False, alias="includeIdle"),
+):
+    """
+    Sample the stacks of every thread for a number of seconds.
+
+    Returns collapsed stacks (one "frame;frame;frame count" line per stack) that
+    flamegraph.pl or speedscope read directly. With byJob, returns JSON that also
+    splits the samples of each job's predict_video and broadcast threads.
+    """
+    try:
+        profile = sample(seconds, interval_ms / 1000, include_idle)
+    except ProfilerBusy:
+        raise HTTPException(409, detail="A profile is already running")
+    if not by_job:
+        return PlainTextResponse(collapse(profile["stacks"]))
+    return {
+        "seconds": profile["seconds"],
+        "intervalMs": profile["intervalMs"],
+        "samples": profile["samples"],
+        "collapsed": collapse(profile["stacks"]),
+        "jobs": {
+            job_id: {
+                role: {"samples": sum(stacks.values()), "collapsed": collapse(stacks)}
+                for role, stacks in roles.items()
+            }
+            for job_id, roles in profile["jobs"].items()
+        },
+    }
+
+@app.get("/admin/model", dependencies=[Depends(require_internal_secret)])
+def model_status():
+    """Active model, the candidate being loaded or shadowed, and replaced models still finishing jobs"""
+    return models.status()
+
+@app.post("/admin/model", status_code=202, dependencies=[Depends(require_internal_secret)])
+def swap_model(req: ModelSwapRequest):
+    """
+    Load new weights in the background and swap them in for new jobs.
+
+    Running jobs finish on the model they started with. With shadow, the new
+    model only runs on a sample of live frames until /admin/model/promote.
+    """
+    if not os.path.isfile(req.weights):
+        raise HTTPException(404, detail="Weights file not found")
+    try:
+        return models.stage(req.weights, req.shadow, req.shadowSampleRate, req.warmupFrames)
+    except SwapInProgress:
+        raise HTTPException(409, detail="A candidate model is already loading or being shadowed")
+
+@app.post("/admin/model/promote", dependencies=[Depends(require_internal_secret)])
+def promote_model():
+    try:
+        return models.promote().to_dict()
+    except NoCandidate:
+        raise HTTPException(409, detail="No loaded candidate model to promote")
+
+@app.delete("/admin/model/candidate", dependencies=[Depends(require_internal_secret)])
+def discard_model():
+    if not models.discard():
+        raise HTTPException(404, detail="No candidate model")
+    return {"status": "discarded"}
+
+@app.get("/admin/overload", dependencies=[Depends(require_internal_secret)])
+def overload_status():
+    if not overload:
+        raise HTTPException(404, detail="Overload control is off")
+    return overload.status()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint"""
+    scratch.usage()
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health_check():
     return {
         "status": "healthy", 
-        "model_loaded": model is not None
+        "model_loaded": model is not None,
+        "model_version": models.active.version,
+        "inference_profile": profile_summary(inference_profile)
     }
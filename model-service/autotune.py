@@ -0,0 +1,331 @@
+"""
+Startup autotuner for torch threads, inference image size and backend.
+
+Runs a short grid of settings on a calibration clip and keeps the fastest one
+whose detections still reach a minimum recall. The result is saved as a
+profile per host and reused on the next start.
+
+Usage (from model-service/):
+    python -m autotune --weights weights/best.pt --clip calibration/clip.mp4
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import logging
+import argparse
+import importlib.util
+from datetime import datetime
+import cv2
+import torch
+from ultralytics import YOLO
+from frame_transport import read_frames, track_frames
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+AUTOTUNE = os.getenv("AUTOTUNE", "false").lower() == "true"
+AUTOTUNE_CLIP = os.getenv("AUTOTUNE_CLIP", "/app/calibration/clip.mp4")
+AUTOTUNE_PROFILE_DIR = os.getenv(
+    "AUTOTUNE_PROFILE_DIR", os.path.join(os.getenv("VIDEO_DIR", "/app/videos"), "profiles")
+)
+AUTOTUNE_HOST = os.getenv("AUTOTUNE_HOST", socket.gethostname())  # set it when container hostnames change
+AUTOTUNE_MIN_RECALL = float(os.getenv("AUTOTUNE_MIN_RECALL", "0.95"))
+AUTOTUNE_FRAMES = int(os.getenv("AUTOTUNE_FRAMES", "150"))
+
+DEFAULT_IMGSZ = 640
+IMGSZ_CANDIDATES = (640, 512, 416, 320)
+WARMUP_FRAMES = 5
+MATCH_FRAMES = 3  # a detection this many frames early or late still counts as recalled
+
+# backend -> (modules needed to export and run it, suffix of the exported model)
+BACKENDS = {
+    "pytorch": ((), ".pt"),
+    "onnx": (("onnx", "onnxruntime"), ".onnx"),
+    "openvino": (("openvino",), "_openvino_model"),
+}
+
+
+def available_backends() -> list:
+    """Backends whose optional packages are installed."""
+    return [
+        name for name, (modules, _) in BACKENDS.items()
+        if all(importlib.util.find_spec(module) for module in modules)
+    ]
+
+
+def thread_candidates(cpu_count: int = None) -> list:
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return sorted({cpu_count, max(1, cpu_count // 2), max(1, cpu_count // 4)}, reverse=True)
+
+
+# ─────────────────────────────────────────────────────────────
+# Measuring one setting
+# ─────────────────────────────────────────────────────────────
+def read_calibration_frames(clip: str, max_frames: int = AUTOTUNE_FRAMES) -> list:
+    cap = cv2.VideoCapture(clip)
+    if not cap.isOpened():
+        raise IOError(f"Could not open calibration clip {clip}")
+    try:
+        return [frame for _, frame in read_frames(cap, 0, max_frames)]
+    finally:
+        cap.release()
+
+
+def measure(model, frames: list, imgsz: int, threshold: float, class_id: int) -> tuple:
+    """
+    Track the frames with one setting.
+
+    Returns:
+        tuple: (frames per second after warm-up, set of frame indices with a
+        detection of class_id at or above threshold)
+    """
+    positives = set()
+    start = None
+    for frame_index, results in track_frames(model, enumerate(frames), threshold, imgsz):
+        if frame_index == WARMUP_FRAMES:
+            start = time.perf_counter()
+        for detection in results.boxes:
+            if int(detection.cls.item()) == class_id and detection.conf.item() >= threshold:
+                positives.add(frame_index)
+                break
+    timed_frames = len(frames) - WARMUP_FRAMES
+    if start is None or timed_frames <= 0:
+        raise ValueError(f"Calibration needs more than {WARMUP_FRAMES} frames")
+    return timed_frames / (time.perf_counter() - start), positives
+
+
+def recall(found: set, reference: set, tolerance: int = MATCH_FRAMES) -> float:
+    """Fraction of reference frames with a detection within tolerance frames."""
+    if not reference:
+        return 1.0
+    hits = sum(1 for f in reference if any(f + d in found for d in range(-tolerance, tolerance + 1)))
+    return hits / len(reference)
+
+
+def load_labels(clip: str):
+    """Ground-truth accident frames from <clip>.json ({"accidentFrames": [...]}), if present."""
+    labels_path = os.path.splitext(clip)[0] + ".json"
+    if not os.path.exists(labels_path):
+        return None
+    with open(labels_path) as f:
+        return set(json.load(f)["accidentFrames"])
+
+
+def export_model(weights: str, backend: str, imgsz: int, out_dir: str) -> str:
+    """Export weights for a backend at a fixed image size, reusing an earlier export."""
+    if backend == "pytorch":
+        return weights
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    target = os.path.join(out_dir, f"{stem}_{imgsz}{BACKENDS[backend][1]}")
+    if not os.path.exists(target):
+        os.makedirs(out_dir, exist_ok=True)
+        exported = YOLO(weights).export(format=backend, imgsz=imgsz, verbose=False)
+        shutil.move(str(exported), target)
+    return target
+
+
+# ─────────────────────────────────────────────────────────────
+# Tuning
+# ─────────────────────────────────────────────────────────────
+def _weights_signature(weights: str) -> dict:
+    stat = os.stat(weights)
+    return {"path": os.path.abspath(weights), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def tune(weights: str, clip: str, profile_dir: str = AUTOTUNE_PROFILE_DIR,
+         min_recall: float = AUTOTUNE_MIN_RECALL, max_frames: int = AUTOTUNE_FRAMES,
+         threshold: float = 0.7, class_id: int = 0, imgsz_candidates=IMGSZ_CANDIDATES,
+         threads=None, backends=None) -> dict:
+    """
+    Find the fastest setting that keeps recall on the calibration clip.
+
+    The grid is searched one dimension at a time: torch threads at the default
+    image size, then image size with the best thread count, then the other
+    backends at the best image size. Recall is measured against the clip's
+    labels when it has them, otherwise against the detections of the default
+    setting (PyTorch, 640 px, all cores). A clip without any accident keeps
+    the default image size.
+
+    Returns:
+        dict: The chosen profile, with every measured candidate
+    """
+    frames = read_calibration_frames(clip, max_frames)
+    cpu_count = os.cpu_count() or 1
+    threads = threads or thread_candidates(cpu_count)
+    backends = backends or available_backends()
+    labels = load_labels(clip)
+    reference = labels
+    candidates = []
+    service_threads = torch.get_num_threads()
+
+    def evaluate(backend, imgsz, n_threads):
+        model_path = export_model(weights, backend, imgsz, os.path.join(profile_dir, "models"))
+        torch.set_num_threads(n_threads)
+        try:
+            fps, positives = measure(YOLO(model_path, task="detect"), frames, imgsz, threshold, class_id)
+        finally:
+            # Also after a failed candidate; apply_profile sets the chosen count
+            torch.set_num_threads(service_threads)
+        entry = {"backend": backend, "imgsz": imgsz, "torchThreads": n_threads, "modelPath": model_path,
+                 "fps": round(fps, 2), "positives": positives}
+        candidates.append(entry)
+        return entry
+
+    def best(entries):
+        eligible = [e for e in entries if e["recall"] >= min_recall]
+        return max(eligible, key=lambda e: e["fps"]) if eligible else None
+
+    def score(entry):
+        entry["recall"] = round(recall(entry.pop("positives"), reference), 4)
+        logger.info(f"Autotune {entry['backend']} imgsz={entry['imgsz']} threads={entry['torchThreads']}: "
+                    f"{entry['fps']:.1f} fps, recall {entry['recall']:.2f}")
+        return entry
+
+    default = evaluate("pytorch", DEFAULT_IMGSZ, cpu_count)
+    if reference is None:
+        reference = set(default["positives"])
+    score(default)
+    if not reference:
+        # Recall would be 1.0 for any setting, so smaller images cannot be checked
+        logger.warning(f"No accidents in calibration clip {clip}; keeping image size {DEFAULT_IMGSZ}")
+        imgsz_candidates = ()
+
+    stage = [default] + [score(evaluate("pytorch", DEFAULT_IMGSZ, n)) for n in threads if n != cpu_count]
+    chosen = best(stage) or default
+
+    stage = [chosen] + [
+        score(evaluate("pytorch", size, chosen["torchThreads"])) for size in imgsz_candidates if size != DEFAULT_IMGSZ
+    ]
+    chosen = best(stage) or chosen
+
+    stage = [chosen]
+    for backend in backends:
+        if backend == "pytorch":
+            continue
+        try:
+            stage.append(score(evaluate(backend, chosen["imgsz"], chosen["torchThreads"])))
+        except Exception as e:
+            logger.warning(f"Autotune skipped backend {backend}: {e}")
+    chosen = best(stage) or chosen
+    if chosen["recall"] < min_recall:
+        logger.warning(f"No setting reaches recall {min_recall}; keeping the defaults")
+        chosen = default
+
+    return {
+        "host": AUTOTUNE_HOST,
+        "cpuCount": cpu_count,
+        "weights": _weights_signature(weights),
+        "clip": clip,
+        "frames": len(frames),
+        "labelled": labels is not None,
+        "minRecall": min_recall,
+        "backend": chosen["backend"],
+        "modelPath": chosen["modelPath"],
+        "imgsz": chosen["imgsz"],
+        "torchThreads": chosen["torchThreads"],
+        "fps": chosen["fps"],
+        "recall": chosen["recall"],
+        "defaultFps": default["fps"],
+        "candidates": candidates,
+        "created": datetime.now().isoformat(),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Profiles
+# ─────────────────────────────────────────────────────────────
+def profile_path(profile_dir: str = AUTOTUNE_PROFILE_DIR, host: str = AUTOTUNE_HOST) -> str:
+    return os.path.join(profile_dir, f"{host}.json")
+
+
+def save_profile(profile: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_profile(weights: str, path: str):
+    """The saved profile, or None if there is none or it was tuned for other weights or another CPU count."""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get("weights") != _weights_signature(weights) or profile.get("cpuCount") != (os.cpu_count() or 1):
+        logger.info(f"Inference profile {path} is stale; tuning again")
+        return None
+    if not os.path.exists(profile["modelPath"]):
+        return None
+    return profile
+
+
+def load_or_tune(weights: str, clip: str = AUTOTUNE_CLIP, profile_dir: str = AUTOTUNE_PROFILE_DIR,
+                 force: bool = False, **kwargs):
+    """
+    Return this host's inference profile, tuning and saving it first if needed.
+
+    Never raises: without weights, a calibration clip or on any tuning error
+    the service falls back to the default settings (None).
+    """
+    path = profile_path(profile_dir)
+    try:
+        if not os.path.exists(weights):
+            logger.warning(f"Autotune skipped: weights {weights} not found")
+            return None
+        profile = None if force else load_profile(weights, path)
+        if profile:
+            logger.info(f"Using inference profile {path}")
+            return profile
+        if not os.path.exists(clip):
+            logger.warning(f"Autotune skipped: calibration clip {clip} not found")
+            return None
+        logger.info(f"Autotuning inference settings on {clip}")
+        profile = tune(weights, clip, profile_dir, **kwargs)
+        save_profile(profile, path)
+        logger.info(f"Saved inference profile {path}")
+        return profile
+    except Exception as e:
+        logger.warning(f"Autotune failed, using default settings: {e}")
+        return None
+
+
+def apply_profile(profile: dict) -> None:
+    torch.set_num_threads(profile["torchThreads"])
+
+
+def profile_summary(profile):
+    """The part of a profile reported by /health."""
+    if not profile:
+        return None
+    keys = ("host", "backend", "imgsz", "torchThreads", "fps", "defaultFps", "recall", "minRecall", "created")
+    return {key: profile[key] for key in keys}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=os.getenv("YOLO_WEIGHTS", "weights/best.pt"))
+    parser.add_argument("--clip", default=AUTOTUNE_CLIP)
+    parser.add_argument("--profile-dir", default=AUTOTUNE_PROFILE_DIR)
+    parser.add_argument("--min-recall", type=float, default=AUTOTUNE_MIN_RECALL)
+    parser.add_argument("--frames", type=int, default=AUTOTUNE_FRAMES, help="Calibration frames per setting")
+    parser.add_argument("--force", action="store_true", help="Tune even if a valid profile exists")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    profile = load_or_tune(args.weights, args.clip, args.profile_dir, force=args.force,
+                           min_recall=args.min_recall, max_frames=args.frames)
+    if profile is None:
+        return 1
+    print(json.dumps(profile_summary(profile), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Job throughput of a coordinator with 1, 2, 4... nodes.
+
+For each node count, starts the coordinator (coordinator.py) and that many
+nodes (benchmarks/serve.py with COORDINATOR_URL set) on local ports, sends a
+burst of /run requests to the coordinator and waits until the nodes have
+reported every job finished. Prints jobs per second, the speed-up over one
+node and the scaling efficiency (speed-up / nodes, 1.0 = linear).
+
+Each node runs at most --slots jobs at a time (NODE_MAX_JOBS), so the cluster
+has nodes * slots slots. With the stub model inference is a sleep, which
+measures the coordinator and the dispatch path rather than the CPU; with real
+weights, nodes on one machine share its cores and scale only up to the
+number of cores.
+
+--kill-after stops one node that many seconds into each run of two or more
+nodes; its jobs must still finish on the others.
+
+Usage (from model-service/):
+    python -m benchmarks.cluster_scaling --nodes 1 2 4 --jobs 32 --slots 2
+    python -m benchmarks.cluster_scaling --nodes 2 --jobs 8 --kill-after 2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.fixtures import make_synthetic_video
+from benchmarks.load import SERVICE_DIR, _free_port, build_schedule, fire, start_service, wait_for_health
+from benchmarks.stand_ins import FakeBackend, FakeDrive
+
+HEARTBEAT_SECONDS = 0.5
+
+
+class LocalCluster:
+    """A coordinator and its nodes as local subprocesses, stopped on exit."""
+
+    def __init__(self, nodes: int, slots: int, model: str, detect_every: int, env: dict):
+        self.size = nodes
+        self.slots = slots
+        self.model = model
+        self.detect_every = detect_every
+        self.env = {
+            **env,
+            "HEARTBEAT_SECONDS": str(HEARTBEAT_SECONDS),
+            "NODE_TIMEOUT_SECONDS": str(HEARTBEAT_SECONDS * 4),
+        }
+        self.coordinator = None
+        self.url = None
+        self.nodes = []
+
+    def __enter__(self):
+        port = _free_port()
+        self.coordinator = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "coordinator:app", "--port", str(port), "--log-level", "warning"],
+            cwd=SERVICE_DIR, env={**os.environ, **self.env},
+        )
+        self.url = f"http://127.0.0.1:{port}"
+        try:
+            wait_for_health(self.coordinator, self.url, timeout=60)
+            for _ in range(self.size):
+                port = _free_port()
+                process, _ = start_service(self.model, self.detect_every, {
+                    **self.env,
+                    "COORDINATOR_URL": self.url,
+                    "NODE_URL": f"http://127.0.0.1:{port}",
+                    "NODE_MAX_JOBS": str(self.slots),
+                    "JOBS_DIR": os.path.join(self.env["JOBS_DIR"], f"node-{port}"),
+                }, port=port)
+                self.nodes.append(process)
+            self.wait_for_nodes(self.size)
+        except Exception:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for process in self.nodes + [self.coordinator]:
+            if process and process.poll() is None:
+                process.terminate()
+                process.wait(timeout=30)
+        return False
+
+    def status(self) -> dict:
+        return requests.get(f"{self.url}/nodes", timeout=5).json()
+
+    def wait_for_nodes(self, count: int, timeout: float = 30) -> None:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if sum(node["alive"] for node in self.status()["nodes"]) >= count:
+                return
+            time.sleep(0.1)
+        raise TimeoutError(f"{count} nodes did not join within {timeout} s")
+
+    def wait_until_drained(self, jobs: int, timeout: float) -> bool:
+        """Wait until the nodes have reported jobs finished, and nothing is queued or running."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = self.status()
+            if status["completed"] >= jobs and not status["queued"] and not status["running"]:
+                return True
+            time.sleep(0.1)
+        return False
+
+    def kill_node(self, index: int = 0) -> None:
+        self.nodes[index].kill()
+        self.nodes[index].wait()
+
+
+def run_case(nodes: int, args, video_ids: list, env: dict) -> dict:
+    with FakeBackend() as backend, FakeDrive() as drive:
+        env = {**env, "INTERNAL_BACKEND_URL": backend.alert_url, "DRIVE_API_ENDPOINT": drive.url}
+        with LocalCluster(nodes, args.slots, args.model, args.detect_every, env) as cluster:
+            schedule = build_schedule("burst", args.jobs, 1.0, video_ids)
+            start = time.time()
+            sent = fire(cluster.url, schedule)
+            if args.kill_after and nodes > 1:
+                time.sleep(max(0.0, start + args.kill_after - time.time()))
+                cluster.kill_node()
+            drained = cluster.wait_until_drained(args.jobs, args.timeout)
+            wall = time.time() - start
+            status = cluster.status()
+
+    return {
+        "nodes": nodes,
+        "slots": nodes * args.slots,
+        "jobs": args.jobs,
+        "failed_requests": sum(r["error"] is not None for r in sent),
+        "drained": drained,
+        "wall_seconds": round(wall, 2),
+        "jobs_per_second": round(status["completed"] / wall, 3),
+        "completed": status["completed"],
+        "reassigned": status["reassigned"],
+        "alerts": len(backend.received()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=32, help="Jobs per run, all sent at once")
+    parser.add_argument("--slots", type=int, default=2, help="Concurrent jobs per node (NODE_MAX_JOBS)")
+    parser.add_argument("--model", default="stub", help='"stub", "tiny" or a path to weights')
+    parser.add_argument("--detect-every", type=int, default=150, help="Stub only: one accident detection every N frames")
+    parser.add_argument("--seconds", type=float, default=5, help="Length of the synthetic videos")
+    parser.add_argument("--videos", type=int, default=4, help="Number of synthetic videos")
+    parser.add_argument("--kill-after", type=float, help="Kill one node this many seconds into each multi-node run")
+    parser.add_argument("--timeout", type=float, default=600, help="Give up waiting for jobs after this many seconds")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="crashalert-cluster-")
+    video_dir = os.path.join(work_dir, "videos")
+    video_ids = []
+    for i in range(args.videos):
+        video_id = f"synthetic{i}_cluster"
+        make_synthetic_video(os.path.join(video_dir, f"{video_id}.mp4"), args.seconds, width=320, height=180, seed=i)
+        video_ids.append(video_id)
+
+    results = []
+    for nodes in sorted(set(args.nodes)):
+        # Nodes share the videos like they would a volume; each keeps its checkpoints under JOBS_DIR
+        env = {
+            "INTERNAL_SECRET": os.getenv("INTERNAL_SECRET", "cluster-test"),
+            "VIDEO_DIR": video_dir,
+            "JOBS_DIR": os.path.join(work_dir, f"jobs-{nodes}"),
+        }
+        results.append(run_case(nodes, args, video_ids, env))
+
+    baseline = results[0]
+    print(f"{'nodes':>5} {'slots':>5} {'jobs':>5} {'wall s':>8} {'jobs/s':>8} {'speed-up':>9} "
+          f"{'efficiency':>10} {'reassigned':>10} {'drained':>8}")
+    for r in results:
+        r["speedup"] = round(r["jobs_per_second"] / baseline["jobs_per_second"], 3) if baseline["jobs_per_second"] else None
+        r["efficiency"] = round(r["speedup"] * baseline["nodes"] / r["nodes"], 3) if r["speedup"] else None
+        print(f"{r['nodes']:>5} {r['slots']:>5} {r['completed']:>5} {r['wall_seconds']:>8.2f} "
+              f"{r['jobs_per_second']:>8.2f} {r['speedup'] or 0:>9.2f} {r['efficiency'] or 0:>10.2f} "
+              f"{r['reassigned']:>10} {str(r['drained']):>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Offline inputs for the benchmarks: synthetic videos and models that need no downloads.
+"""
+import os
+import sys
+import time
+import tempfile
+import cv2
+import numpy as np
+
+TINY_MODEL_CONFIG = "yolo11n.yaml"  # architecture only, built with random weights
+
+
+def make_synthetic_video(path: str, seconds: float = 10, width: int = 640, height: int = 360,
+                         fps: float = 30, seed: int = 0) -> str:
+    """
+    Write a reproducible test video: a few boxes moving over a noisy road-like background.
+
+    The same arguments always produce the same frames, so runs on different
+    machines decode identical input.
+    """
+    rng = np.random.default_rng(seed)
+    background = np.tile(np.linspace(60, 140, width, dtype=np.uint8), (height, 1))
+    background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+    cars = [
+        {
+            "pos": rng.uniform([0, 0], [width, height]),
+            "vel": rng.uniform(-4, 4, size=2),
+            "size": rng.integers(20, max(21, min(width, height) // 4), size=2),
+            "color": tuple(int(c) for c in rng.integers(0, 255, size=3)),
+        }
+        for _ in range(4)
+    ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Could not open video writer for {path}")
+    try:
+        for _ in range(int(round(seconds * fps))):
+            frame = background.copy()
+            noise = rng.integers(0, 16, size=frame.shape, dtype=np.uint8)
+            cv2.add(frame, noise, dst=frame)
+            for car in cars:
+                car["pos"] = (car["pos"] + car["vel"]) % [width, height]
+                x, y = car["pos"].astype(int)
+                w, h = car["size"]
+                cv2.rectangle(frame, (x, y), (x + int(w), y + int(h)), car["color"], -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+class StubBox:
+    """One detection, shaped like a row of ultralytics Boxes."""
+
+    def __init__(self, cls_id: int, confidence: float, xyxy):
+        self.cls = np.array([float(cls_id)])
+        self.conf = np.array([confidence])
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+
+
+class StubResult:
+    """The parts of an ultralytics Results object the service reads."""
+
+    def __init__(self, boxes: list, speed: dict):
+        self.boxes = boxes
+        self.speed = speed
+
+
+class StubModel:
+    """
+    Stand-in for a YOLO model.
+
+    Frames are still decoded and resized like the real preprocessing, and
+    inference_ms of simulated inference is spent per frame, so the benchmark
+    measures the pipeline around the model. It detects nothing unless
+    detect_every is set, in which case every detect_every-th frame has one
+    accident (class 0) detection, which is enough to drive the alert path.
+    """
+
+    predictor = None
+
+    def __init__(self, inference_ms: float = 5.0, imgsz: int = 640, detect_every: int = 0, confidence: float = 0.9):
+        self.inference_ms = inference_ms
+        self.imgsz = imgsz
+        self.detect_every = detect_every
+        self.confidence = confidence
+        self._frames = 0
+
+    def _boxes(self, frame, frame_index: int) -> list:
+        if not self.detect_every or (frame_index + 1) % self.detect_every:
+            return []
+        height, width = frame.shape[:2]
+        return [StubBox(0, self.confidence, [width / 4, height / 4, width / 2, height / 2])]
+
+    def _result(self, frame, frame_index: int) -> StubResult:
+        start = time.perf_counter()
+        cv2.resize(frame, (self.imgsz, self.imgsz))
+        preprocess = time.perf_counter() - start
+        start = time.perf_counter()
+        if self.inference_ms:
+            time.sleep(self.inference_ms / 1000)
+        inference = time.perf_counter() - start
+        speed = {"preprocess": preprocess * 1000, "inference": inference * 1000, "postprocess": 0.0}
+        return StubResult(self._boxes(frame, frame_index), speed)
+
+    def _stream(self, video_path: str, save_dir: str = None):
+        cap = cv2.VideoCapture(video_path)
+        writer = None
+        if save_dir:
+            # Like ultralytics with save=True: <project>/<name>/<video stem>.avi
+            stem = os.path.splitext(os.path.basename(video_path))[0]
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            writer = cv2.VideoWriter(os.path.join(save_dir, f"{stem}.avi"), cv2.VideoWriter_fourcc(*"MJPG"),
+                                     cap.get(cv2.CAP_PROP_FPS), size)
+        frame_index = 0
+        try:
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                if writer:
+                    writer.write(frame)
+                yield self._result(frame, frame_index)
+                frame_index += 1
+        finally:
+            cap.release()
+            if writer:
+                writer.release()
+
+    @staticmethod
+    def _save_dir(project: str, name: str) -> str:
+        """Create the first free <name>, <name>2, <name>3... directory under project."""
+        os.makedirs(project, exist_ok=True)
+        path, n = os.path.join(project, name), 2
+        while True:
+            try:
+                os.mkdir(path)
+                return path
+            except FileExistsError:
+                path, n = os.path.join(project, f"{name}{n}"), n + 1
+
+    def track(self, source=None, stream=False, save=False, project="runs/track", name="track", **kwargs):
+        if isinstance(source, str):
+            results = self._stream(source, self._save_dir(project, name) if save else None)
+            return results if stream else list(results)
+        # One frame at a time (frame ring, shards): count frames across calls
+        self._frames += 1
+        return [self._result(source, self._frames - 1)]
+
+
+def load_model(spec: str, detect_every: int = 0):
+    """
+    Load the model for a benchmark case.
+
+    Args:
+        spec (str): "stub", "tiny" (YOLO11n architecture with random weights,
+            no download needed) or a path to real weights
+        detect_every (int): For the stub, raise one accident detection every this many frames
+
+    Returns:
+        A YOLO model, or a StubModel
+    """
+    if spec == "stub":
+        return StubModel(detect_every=detect_every)
+    from ultralytics import YOLO
+
+    return YOLO(TINY_MODEL_CONFIG if spec == "tiny" else spec).to("cpu")
+
+
+def import_service(work_dir: str = None):
+    """
+    Import app for an in-process benchmark, without a deployed service's environment.
+
+    Importing app reads INTERNAL_SECRET, creates its directories under
+    VIDEO_DIR and loads YOLO_WEIGHTS. Variables that are not set get harmless
+    values: a placeholder secret, directories under work_dir (a temporary
+    directory by default), the tiny architecture as weights and autotuning
+    off. Variables that are set are left alone. Benchmarks replace the model
+    and raise_alert, so no backend, Drive credentials or real weights are
+    needed.
+    """
+    if "app" not in sys.modules:
+        work_dir = work_dir or tempfile.mkdtemp(prefix="crashalert-service-")
+        defaults = {
+            "INTERNAL_SECRET": "benchmark",
+            "VIDEO_DIR": os.path.join(work_dir, "service"),
+            "YOLO_WEIGHTS": TINY_MODEL_CONFIG,
+            "AUTOTUNE": "false",
+        }
+        for name, value in defaults.items():
+            os.environ.setdefault(name, value)
+    import app
+
+    return app
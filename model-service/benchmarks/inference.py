@@ -0,0 +1,263 @@
+"""
+Frames per second, per-stage time and peak memory of predict_video.
+
+Every case runs predict_video over one video with one model, on synthetic
+videos by default or on local clips passed with --video. Models are "stub"
+(no inference, measures the pipeline around the model), "tiny" (YOLO11n
+architecture with random weights, no download) or a path to real weights.
+Alerts are recorded instead of being trimmed, uploaded and posted.
+
+Per case the report has:
+    fps           frames processed per wall-clock second
+    stages        seconds per pipeline stage, from the crashalert_stage_seconds metric
+    peak_rss_mb   peak resident memory of the process and its children during the run
+
+With --baseline the results are compared against an earlier --output file and
+the script exits non-zero when a case lost more than --tolerance of its FPS or
+grew its peak memory by more than that fraction.
+
+Without --baseline nothing is checked; the script says so and exits 0.
+The service's environment variables are optional (see
+benchmarks.fixtures.import_service).
+
+Usage (from model-service/):
+    python -m benchmarks.inference --models stub tiny --output bench.json
+    python -m benchmarks.inference --models weights/best.pt --video videos/clip.mp4 --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import psutil
+
+from benchmarks.fixtures import import_service, load_model, make_synthetic_video
+
+FRAME_STAGES = ("decode", "preprocess", "inference", "postprocess")
+
+
+class PeakRSS:
+    """Sample the resident memory of this process and its children in the background."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak_bytes = max(self.peak_bytes, rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak_bytes / (1024 * 1024)
+
+
+class _Patched:
+    """Temporarily replace module attributes."""
+
+    def __init__(self, module, **attrs):
+        self.module = module
+        self.attrs = attrs
+        self.saved = {}
+
+    def __enter__(self):
+        for name, value in self.attrs.items():
+            self.saved[name] = getattr(self.module, name)
+            setattr(self.module, name, value)
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self.saved.items():
+            setattr(self.module, name, value)
+        return False
+
+
+def _run_predict(app, model, video_path, decode_process, alerts):
+    def record_alert(job, frame_index, *args):
+        alerts.append(frame_index)
+
+    with _Patched(app, model=model, DECODE_PROCESS=decode_process, raise_alert=record_alert):
+        app.predict_video(video_path, {"cameraId": "benchmark", "location": "benchmark"})
+
+
+def run_case(name: str, model, video_path: str, decode_process: bool = False, warmup: int = 1) -> dict:
+    """
+    Benchmark predict_video on one video.
+
+    Args:
+        name (str): Case name, used to match the case against a baseline
+        model: Loaded model (see benchmarks.fixtures.load_model)
+        video_path (str): Video to process
+        decode_process (bool): Decode in a separate process through the frame ring
+        warmup (int): Unmeasured runs first, so model setup is not counted
+
+    Returns:
+        dict: fps, wall time, frame count, per-stage seconds, peak RSS and alert frames
+    """
+    app = import_service()
+    from metrics import FRAMES_PROCESSED, STAGE_SECONDS
+
+    for _ in range(warmup):
+        _run_predict(app, model, video_path, decode_process, [])
+
+    alerts = []
+    frames_before = FRAMES_PROCESSED.value()
+    stages_before = {stage: STAGE_SECONDS.total(stage=stage) for stage in FRAME_STAGES}
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        _run_predict(app, model, video_path, decode_process, alerts)
+        wall = time.perf_counter() - start
+    frames = int(FRAMES_PROCESSED.value() - frames_before)
+
+    return {
+        "name": name,
+        "video": video_path,
+        "decode_process": decode_process,
+        "frames": frames,
+        "wall_seconds": round(wall, 4),
+        "fps": round(frames / wall, 2) if wall else 0.0,
+        "stages": {
+            stage: round(STAGE_SECONDS.total(stage=stage) - stages_before[stage], 4)
+            for stage in FRAME_STAGES
+        },
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "alerts": alerts,
+    }
+
+
+def compare_to_baseline(cases: list, baseline: dict, tolerance: float) -> list:
+    """
+    Return a message for every case that regressed against the baseline.
+
+    Cases missing from either side are ignored, so adding a case does not fail
+    the comparison.
+    """
+    previous = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in cases:
+        old = previous.get(case["name"])
+        if old is None:
+            continue
+        if case["fps"] < old["fps"] * (1 - tolerance):
+            regressions.append(f"{case['name']}: {case['fps']:.1f} fps, baseline {old['fps']:.1f} fps")
+        if case["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{case['name']}: peak RSS {case['peak_rss_mb']:.0f} MB, baseline {old['peak_rss_mb']:.0f} MB"
+            )
+    return regressions
+
+
+def _model_label(spec: str) -> str:
+    return spec if spec in ("stub", "tiny") else os.path.splitext(os.path.basename(spec))[0]
+
+
+def _videos(args, work_dir) -> list:
+    """(label, path) for every input video, generating synthetic ones as needed."""
+    if args.video:
+        return [(os.path.splitext(os.path.basename(v))[0], v) for v in args.video]
+    videos = []
+    for resolution in args.resolution:
+        width, height = (int(x) for x in resolution.lower().split("x"))
+        label = f"synthetic-{width}x{height}-{args.seconds:g}s"
+        path = os.path.join(work_dir, f"{label}.mp4")
+        if not os.path.exists(path):
+            make_synthetic_video(path, args.seconds, width, height, args.fps)
+        videos.append((label, path))
+    return videos
+
+
+def _print_table(cases: list) -> None:
+    stage_header = "".join(f"{stage[:7]:>9}" for stage in FRAME_STAGES)
+    print(f"{'case':<40} {'frames':>7} {'fps':>8}{stage_header} {'rss MB':>8}")
+    for case in cases:
+        stages = "".join(f"{case['stages'][stage]:>9.2f}" for stage in FRAME_STAGES)
+        print(f"{case['name']:<40} {case['frames']:>7} {case['fps']:>8.1f}{stages} {case['peak_rss_mb']:>8.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["stub"], help='"stub", "tiny" or paths to weights')
+    parser.add_argument("--video", nargs="+", help="Local clips to use instead of synthetic videos")
+    parser.add_argument("--seconds", type=float, default=10, help="Length of the synthetic videos")
+    parser.add_argument("--resolution", nargs="+", default=["640x360"], help="Synthetic video sizes, WxH")
+    parser.add_argument("--fps", type=float, default=30, help="Frame rate of the synthetic videos")
+    parser.add_argument("--decode-process", action="store_true", help="Also run every case through the frame ring")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs before each case")
+    parser.add_argument("--work-dir", help="Where synthetic videos are written (default: a temporary directory)")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed FPS drop / memory growth (fraction)")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="crashalert-bench-")
+    import_service(work_dir)
+    videos = _videos(args, work_dir)
+    modes = [False, True] if args.decode_process else [False]
+
+    cases = []
+    for spec in args.models:
+        model = load_model(spec)
+        for label, path in videos:
+            for decode_process in modes:
+                name = f"{_model_label(spec)}/{label}" + ("/ring" if decode_process else "")
+                cases.append(run_case(name, model, path, decode_process, args.warmup))
+    _print_table(cases)
+
+    report = {
+        "created": datetime.now().isoformat(),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "baseline": args.baseline,
+        "cases": cases,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(cases, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if not regressions:
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return 1 if regressions else 0
+    print("No --baseline given: FPS and peak memory were not checked for regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
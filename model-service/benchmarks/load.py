@@ -0,0 +1,431 @@
+"""
+Load and replay harness: many cameras calling /run and /run-bbox at once.
+
+Starts a fake backend and a fake Drive API (benchmarks/stand_ins.py), then the
+service itself in a subprocess (benchmarks/serve.py) pointed at them, fires a
+pattern of concurrent requests and waits until every job and alert is done.
+
+Reports:
+    latency       request -> alert arrival at the backend: first alert of each
+                  request, and every alert (p50/p90/p99/max, seconds)
+    errors        failed requests, and requests that never produced an alert
+    resources     CPU (mean/peak %, 100 = one core) and peak RSS of the
+                  service and its child processes
+
+Patterns:
+    burst         every request at t=0
+    uniform       one request every 1/--rate seconds
+    poisson       exponential gaps with mean 1/--rate seconds
+    ramp          arrival rate grows linearly from 0 to --rate
+
+--replay takes a JSONL file with one request per line, and --record writes
+the generated schedule in the same format:
+    {"at": 0.25, "endpoint": "/run", "videoId": "cam-001_load", "cameraId": "cam-001", "location": "load"}
+
+Usage (from model-service/):
+    python -m benchmarks.load --requests 50 --pattern burst --model stub --detect-every 150
+    python -m benchmarks.load --replay morning_peak.jsonl --video-dir videos --model weights/best.pt
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import psutil
+import requests
+
+from benchmarks.fixtures import make_synthetic_video
+from benchmarks.stand_ins import FakeBackend, FakeDrive
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ("/run", "/run-bbox")
+
+logger = logging.getLogger("load")
+
+
+# ─────────────────────────────────────────────────────────────
+# Request schedules
+# ─────────────────────────────────────────────────────────────
+def build_schedule(pattern: str, count: int, rate: float, video_ids: list,
+                   bbox_ratio: float = 0.0, seed: int = 0) -> list:
+    """
+    Generate count requests, one camera each, spread over time by pattern.
+
+    Returns:
+        list: Requests sorted by "at" (seconds after the start of the run)
+    """
+    rng = random.Random(seed)
+    if pattern == "burst":
+        times = [0.0] * count
+    elif pattern == "uniform":
+        times = [i / rate for i in range(count)]
+    elif pattern == "poisson":
+        times, t = [], 0.0
+        for _ in range(count):
+            times.append(t)
+            t += rng.expovariate(rate)
+    elif pattern == "ramp":
+        # Rate rises linearly to `rate`, so the i-th arrival is at duration * sqrt(i / count)
+        duration = 2 * count / rate
+        times = [duration * (i / count) ** 0.5 for i in range(count)]
+    else:
+        raise ValueError(f"Unknown pattern {pattern}")
+
+    schedule = []
+    for i, at in enumerate(times):
+        schedule.append({
+            "at": round(at, 4),
+            "endpoint": "/run-bbox" if rng.random() < bbox_ratio else "/run",
+            "videoId": video_ids[i % len(video_ids)],
+            "cameraId": f"cam-{i:03d}",
+            "location": "load",
+        })
+    return schedule
+
+
+def load_replay(path: str) -> list:
+    """Read a JSONL request log, skipping lines that are not /run or /run-bbox requests."""
+    schedule = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("endpoint", "/run") not in ENDPOINTS or "videoId" not in entry:
+                logger.warning(f"{path}:{line_number}: not a /run or /run-bbox request, skipped")
+                continue
+            entry.setdefault("endpoint", "/run")
+            entry.setdefault("cameraId", f"cam-{line_number:03d}")
+            entry.setdefault("location", "replay")
+            entry["at"] = float(entry.get("at", 0.0))
+            schedule.append(entry)
+    return sorted(schedule, key=lambda e: e["at"])
+
+
+# ─────────────────────────────────────────────────────────────
+# Service under test
+# ─────────────────────────────────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_service(model: str, detect_every: int, env: dict, timeout: float = 120, port: int = None):
+    """Start benchmarks.serve in a subprocess and wait until /health answers."""
+    port = port or _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.serve", "--model", model,
+           "--detect-every", str(detect_every), "--port", str(port)]
+    process = subprocess.Popen(cmd, cwd=SERVICE_DIR, env={**os.environ, **env})
+    url = f"http://127.0.0.1:{port}"
+    wait_for_health(process, url, timeout)
+    return process, url
+
+
+def wait_for_health(process, url: str, timeout: float) -> None:
+    """Wait until a service started as process answers /health."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise TimeoutError(f"Service did not start within {timeout} s")
+
+
+def _queue_depths(url: str) -> dict:
+    """Read crashalert_queue_depth from /metrics."""
+    depths = {}
+    for line in requests.get(f"{url}/metrics", timeout=5).text.splitlines():
+        if line.startswith("crashalert_queue_depth{"):
+            labels, value = line.rsplit(" ", 1)
+            depths[labels.split('"')[1]] = float(value)
+    return depths
+
+
+def wait_until_idle(url: str, timeout: float, poll: float = 0.5) -> bool:
+    """Wait for every job and alert broadcast to finish."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        depths = _queue_depths(url)
+        if depths.get("jobs", 0) <= 0 and depths.get("broadcast", 0) <= 0:
+            return True
+        time.sleep(poll)
+    return False
+
+
+class ResourceSampler:
+    """Sample CPU and memory of a process tree in the background."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu_samples = []
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _tree(self) -> list:
+        try:
+            return [self.process] + self.process.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def _cpu_seconds(self) -> float:
+        total = 0.0
+        for p in self._tree():
+            try:
+                times = p.cpu_times()
+                total += times.user + times.system
+            except psutil.Error:
+                pass
+        return total
+
+    def _rss(self) -> int:
+        total = 0
+        for p in self._tree():
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self) -> None:
+        last_cpu, last_time = self._cpu_seconds(), time.perf_counter()
+        while not self._stop.wait(self.interval):
+            cpu, now = self._cpu_seconds(), time.perf_counter()
+            # Exited children take their CPU time with them; never report a negative rate
+            self.cpu_samples.append(max(0.0, (cpu - last_cpu) / (now - last_time) * 100))
+            last_cpu, last_time = cpu, now
+            self.peak_rss = max(self.peak_rss, self._rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def summary(self) -> dict:
+        return {
+            "cpu_percent_mean": round(float(np.mean(self.cpu_samples)), 1) if self.cpu_samples else 0.0,
+            "cpu_percent_peak": round(max(self.cpu_samples), 1) if self.cpu_samples else 0.0,
+            "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1),
+        }
+
+
+# ─────────────────────────────────────────────────────────────
+# Firing requests
+# ─────────────────────────────────────────────────────────────
+def fire(url: str, schedule: list, timeout: float = 30) -> list:
+    """
+    Send every request at its scheduled time, each from its own thread.
+
+    Returns:
+        list: One record per request with sent time (time.time()), status,
+        jobId and error
+    """
+    sent = [None] * len(schedule)
+    start = time.time()
+
+    def send(i, entry):
+        delay = start + entry["at"] - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        body = {k: entry[k] for k in ("videoId", "cameraId", "location")}
+        record = {"request": entry, "sent": time.time(), "status": None, "jobId": None, "error": None}
+        try:
+            response = requests.post(f"{url}{entry['endpoint']}", json=body, timeout=timeout)
+            record["status"] = response.status_code
+            if response.ok:
+                record["jobId"] = response.json().get("jobId")
+            else:
+                record["error"] = response.text[:200]
+        except requests.RequestException as e:
+            record["error"] = str(e)
+        record["responseSeconds"] = time.time() - record["sent"]
+        sent[i] = record
+
+    threads = [threading.Thread(target=send, args=(i, entry)) for i, entry in enumerate(schedule)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sent
+
+
+# ─────────────────────────────────────────────────────────────
+# Report
+# ─────────────────────────────────────────────────────────────
+def _distribution(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values)
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p90": round(float(np.percentile(values, 90)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def summarize(sent: list, alerts: list, expect_alerts: bool = True) -> dict:
+    """
+    Match backend alerts to the requests that caused them, by cameraId.
+
+    Args:
+        sent (list): Records returned by fire()
+        alerts (list): FakeBackend.received()
+        expect_alerts (bool): Count accepted requests without any alert as errors
+
+    Returns:
+        dict: Latency distributions, error counts and rates
+    """
+    by_camera = {}
+    for alert in alerts:
+        by_camera.setdefault(alert["doc"].get("cameraId"), []).append(alert["received"])
+
+    first_latencies, all_latencies = [], []
+    failed = missing = 0
+    for record in sent:
+        if record["error"] is not None:
+            failed += 1
+            continue
+        arrivals = sorted(t - record["sent"] for t in by_camera.get(record["request"]["cameraId"], []))
+        if not arrivals:
+            missing += expect_alerts
+            continue
+        first_latencies.append(arrivals[0])
+        all_latencies.extend(arrivals)
+
+    total = len(sent)
+    return {
+        "requests": total,
+        "alerts": len(alerts),
+        "failed_requests": failed,
+        "requests_without_alert": missing,
+        "error_rate": round((failed + missing) / total, 4) if total else 0.0,
+        "response_seconds": _distribution([r["responseSeconds"] for r in sent]),
+        "first_alert_latency": _distribution(first_latencies),
+        "alert_latency": _distribution(all_latencies),
+    }
+
+
+def _video_ids(args, work_dir) -> tuple:
+    """(VIDEO_DIR for the service, available video ids)"""
+    if args.video_dir:
+        ids = sorted(os.path.splitext(f)[0] for f in os.listdir(args.video_dir) if f.endswith(".mp4"))
+        return os.path.abspath(args.video_dir), ids
+    video_dir = os.path.join(work_dir, "videos")
+    ids = []
+    for i in range(args.videos):
+        video_id = f"synthetic{i}_load"
+        make_synthetic_video(os.path.join(video_dir, f"{video_id}.mp4"), args.seconds, seed=i)
+        ids.append(video_id)
+    return video_dir, ids
+
+
+def _print_report(report: dict) -> None:
+    summary, resources = report["summary"], report["resources"]
+    print(f"requests {summary['requests']}  alerts {summary['alerts']}  "
+          f"failed {summary['failed_requests']}  without alert {summary['requests_without_alert']}  "
+          f"error rate {summary['error_rate']:.1%}  wall {report['wall_seconds']:.1f} s")
+    for key in ("response_seconds", "first_alert_latency", "alert_latency"):
+        d = summary[key]
+        if d["count"]:
+            print(f"{key:<20} n={d['count']:<5} mean {d['mean']:>8.2f}  p50 {d['p50']:>8.2f}  "
+                  f"p90 {d['p90']:>8.2f}  p99 {d['p99']:>8.2f}  max {d['max']:>8.2f}")
+    print(f"service CPU mean {resources['cpu_percent_mean']:.0f}%  peak {resources['cpu_percent_peak']:.0f}%  "
+          f"peak RSS {resources['peak_rss_mb']:.0f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pattern", choices=("burst", "uniform", "poisson", "ramp"), default="burst")
+    parser.add_argument("--requests", type=int, default=50, help="Number of requests (one camera each)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests per second for uniform/poisson/ramp")
+    parser.add_argument("--bbox-ratio", type=float, default=0.0, help="Fraction of requests sent to /run-bbox")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="JSONL request log to replay instead of a generated pattern")
+    parser.add_argument("--record", help="Write the schedule as JSONL for later --replay")
+    parser.add_argument("--model", default="stub", help='"stub", "tiny" or a path to weights')
+    parser.add_argument("--detect-every", type=int, default=150, help="Stub only: one accident detection every N frames")
+    parser.add_argument("--video-dir", help="Serve these videos instead of generating synthetic ones")
+    parser.add_argument("--videos", type=int, default=4, help="Number of synthetic videos")
+    parser.add_argument("--seconds", type=float, default=20, help="Length of the synthetic videos")
+    parser.add_argument("--backend-status", type=int, default=201, help="Status the fake backend answers with")
+    parser.add_argument("--timeout", type=float, default=600, help="Give up waiting for jobs after this many seconds")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    work_dir = tempfile.mkdtemp(prefix="crashalert-load-")
+    video_dir, video_ids = _video_ids(args, work_dir)
+    if args.replay:
+        schedule = load_replay(args.replay)
+    else:
+        schedule = build_schedule(args.pattern, args.requests, args.rate, video_ids, args.bbox_ratio, args.seed)
+    if args.record:
+        with open(args.record, "w") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in schedule)
+
+    with FakeBackend(status=args.backend_status) as backend, FakeDrive() as drive:
+        env = {
+            "INTERNAL_BACKEND_URL": backend.alert_url,
+            "INTERNAL_SECRET": os.getenv("INTERNAL_SECRET", "load-test"),
+            "DRIVE_API_ENDPOINT": drive.url,
+            "VIDEO_DIR": video_dir,
+            "JOBS_DIR": os.path.join(work_dir, "jobs"),
+        }
+        process, url = start_service(args.model, args.detect_every, env)
+        try:
+            with ResourceSampler(process.pid) as sampler:
+                start = time.time()
+                sent = fire(url, schedule)
+                idle = wait_until_idle(url, args.timeout)
+                wall = time.time() - start
+            if not idle:
+                logger.warning(f"Jobs still running after {args.timeout} s; reporting what arrived so far")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        report = {
+            "pattern": "replay" if args.replay else args.pattern,
+            "model": args.model,
+            "completed": idle,
+            "wall_seconds": round(wall, 2),
+            "summary": summarize(sent, backend.received(), expect_alerts=args.model == "stub" and args.detect_every > 0),
+            "resources": sampler.summary(),
+            "uploads": len(drive.uploads),
+            "requests": sent,
+        }
+
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if idle else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
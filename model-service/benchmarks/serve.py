@@ -0,0 +1,32 @@
+"""
+Run the model service with a benchmark model instead of YOLO_WEIGHTS.
+
+Usage (from model-service/):
+    python -m benchmarks.serve --model stub --detect-every 150 --port 8000
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import load_model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="stub", help='"stub", "tiny" or a path to weights')
+    parser.add_argument("--detect-every", type=int, default=0, help="Stub only: one accident detection every N frames")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    import app
+
+    app.model = app.models.active.model = load_model(args.model, args.detect_every)
+    uvicorn.run(app.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
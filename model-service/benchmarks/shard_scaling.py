@@ -0,0 +1,96 @@
+"""
+Wall-clock time of sharded processing against shard count.
+
+Runs the same video through predict_video and through iter_sharded_detections
+with each shard count, checks that every sharded run raises the same alerts as
+predict_video and prints a table of wall time, speed-up over predict_video and
+time to the first merged shard.
+
+Usage (from model-service/):
+    python -m benchmarks.shard_scaling videos/long.mp4 --weights weights/best.pt --shards 2 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import import_service
+from detection_index import CooldownGate, extract_alerts
+from sharding import iter_sharded_detections, SHARD_OVERLAP_SECONDS
+
+THRESHOLD = 0.7
+COOLDOWN_SECONDS = 30
+ACCIDENT_CLASS_ID = 0
+
+
+def run_sequential(video_path, weights):
+    """Alerts and wall time of predict_video, the path sharded runs must match."""
+    app = import_service()
+    from benchmarks.inference import _Patched
+
+    events = []
+
+    def record_alert(job, frame_index, video_path, timestamp, metadata, confidence, last_alert_time):
+        events.append((frame_index, round(confidence, 4)))
+
+    with _Patched(app, model=app.load_model(weights), raise_alert=record_alert):
+        start = time.perf_counter()
+        app.predict_video(video_path, {"cameraId": "benchmark", "location": "benchmark"})
+    return {
+        "shards": 0,
+        "wall_seconds": time.perf_counter() - start,
+        "first_shard_seconds": None,
+        "events": events,
+    }
+
+
+def run_once(video_path, weights, shard_count, overlap_seconds):
+    app = import_service()
+
+    gate = CooldownGate(COOLDOWN_SECONDS)
+    events = []
+    first_shard_seconds = None
+    start = time.perf_counter()
+    for shard_index in iter_sharded_detections(video_path, weights, shard_count, THRESHOLD, overlap_seconds,
+                                               imgsz=app.IMGSZ):
+        if first_shard_seconds is None:
+            first_shard_seconds = time.perf_counter() - start
+        events.extend(extract_alerts(shard_index, THRESHOLD, COOLDOWN_SECONDS, [ACCIDENT_CLASS_ID], gate))
+    return {
+        "shards": shard_count,
+        "wall_seconds": time.perf_counter() - start,
+        "first_shard_seconds": first_shard_seconds,
+        "events": [(e["frame"], round(e["confidence"], 4)) for e in events],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Path to a multi-minute local video")
+    parser.add_argument("--weights", default=os.getenv("YOLO_WEIGHTS", "weights/best.pt"))
+    parser.add_argument("--shards", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--overlap", type=float, default=SHARD_OVERLAP_SECONDS, help="Warm-up seconds per shard")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    sequential = run_sequential(args.video, args.weights)
+    results = [sequential] + [run_once(args.video, args.weights, n, args.overlap) for n in sorted(set(args.shards))]
+
+    print(f"{'shards':>6} {'wall s':>9} {'speed-up':>9} {'first s':>9} {'events':>7} {'match':>6}")
+    for r in results:
+        r["speedup"] = sequential["wall_seconds"] / r["wall_seconds"]
+        r["matches_sequential"] = r["events"] == sequential["events"]
+        print(f"{r['shards'] or 'seq':>6} {r['wall_seconds']:>9.2f} {r['speedup']:>9.2f} "
+              f"{r['first_shard_seconds'] or 0:>9.2f} {len(r['events']):>7} {str(r['matches_sequential']):>6}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"video": args.video, "weights": args.weights, "results": results}, f, indent=2)
+    return 0 if all(r["matches_sequential"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Local HTTP stand-ins for the services the model service talks to.
+
+FakeBackend accepts the internal accident POST and records when each alert
+arrived; FakeDrive answers the few Drive v3 calls uploader.py makes. Point
+the service at them with INTERNAL_BACKEND_URL=<backend.url> and
+DRIVE_API_ENDPOINT=<drive.url>.
+"""
+import json
+import time
+import uuid
+import threading
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StandIn:
+    """An HTTP server running in a daemon thread on a free local port."""
+
+    def __init__(self, handler, host: str = "127.0.0.1", port: int = 0):
+        self.lock = threading.Lock()
+        handler_class = type(handler.__name__, (handler,), {"stand_in": self})
+        self.server = ThreadingHTTPServer((host, port), handler_class)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    stand_in = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _reply(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# ─────────────────────────────────────────────────────────────
+# Backend
+# ─────────────────────────────────────────────────────────────
+class _BackendHandler(_Handler):
+    def do_POST(self):
+        received = time.time()
+        try:
+            doc = json.loads(self._body() or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "invalid JSON"})
+            return
+        backend = self.stand_in
+        with backend.lock:
+            backend.alerts.append({"received": received, "path": self.path, "doc": doc,
+                                   "secret": self.headers.get("X-INTERNAL-SECRET")})
+        self._reply(backend.status, {"ok": backend.status == 201})
+
+
+class FakeBackend(_StandIn):
+    """Records every accident POST with its wall-clock arrival time (time.time())."""
+
+    def __init__(self, status: int = 201, **kwargs):
+        super().__init__(_BackendHandler, **kwargs)
+        self.status = status
+        self.alerts = []
+
+    @property
+    def alert_url(self) -> str:
+        return f"{self.url}/api/accidents/internal"
+
+    def received(self) -> list:
+        with self.lock:
+            return list(self.alerts)
+
+
+# ─────────────────────────────────────────────────────────────
+# Drive
+# ─────────────────────────────────────────────────────────────
+class _DriveHandler(_Handler):
+    def do_GET(self):
+        # files.list: no existing date folder, so every upload also creates one
+        if urlparse(self.path).path.endswith("/files"):
+            self._reply(200, {"files": []})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._body()
+        drive = self.stand_in
+        file_id = uuid.uuid4().hex
+        if path.endswith("/permissions"):
+            self._reply(200, {"id": "anyoneWithLink"})
+            return
+        with drive.lock:
+            if path.startswith("/upload/"):
+                drive.uploads.append({"id": file_id, "bytes": len(body), "received": time.time()})
+            else:
+                drive.folders += 1
+        self._reply(200, {"id": file_id})
+
+
+class FakeDrive(_StandIn):
+    """Accepts folder creation, multipart uploads and permission changes; keeps only sizes."""
+
+    def __init__(self, **kwargs):
+        super().__init__(_DriveHandler, **kwargs)
+        self.uploads = []
+        self.folders = 0
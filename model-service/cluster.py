@@ -0,0 +1,390 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+COORDINATOR_URL = os.getenv("COORDINATOR_URL")        # set on nodes that join a coordinator
+NODE_URL = os.getenv("NODE_URL", f"http://{socket.gethostname()}:8000")  # how the coordinator reaches this node
+NODE_ID = os.getenv("NODE_ID") or urlparse(NODE_URL).netloc
+NODE_MAX_JOBS = int(os.getenv("NODE_MAX_JOBS", str(max(1, (os.cpu_count() or 1) // 2))))
+HEARTBEAT_SECONDS = float(os.getenv("HEARTBEAT_SECONDS", "5"))
+NODE_TIMEOUT_SECONDS = float(os.getenv("NODE_TIMEOUT_SECONDS", "15"))
+DISPATCH_TIMEOUT_SECONDS = float(os.getenv("DISPATCH_TIMEOUT_SECONDS", "10"))
+
+SECRET_HEADER_NAME = "X-INTERNAL-SECRET"
+ENDPOINTS = {"run": "/run", "bbox": "/run-bbox"}
+
+
+class JobRejected(Exception):
+    """A node refused the job itself (4xx), so another node would refuse it too."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class NodeBusy(Exception):
+    """A node is up but cannot take new jobs right now (503, e.g. its scratch space is full)."""
+
+
+def checkpoint_of(snapshot: dict) -> dict:
+    """The part of a node's job snapshot (Job.to_dict) another node needs to resume it."""
+    return {
+        "frameOffset": snapshot.get("frameOffset", 0),
+        "lastAlertTime": snapshot.get("lastAlertTime"),
+        "events": snapshot.get("events", []),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Node side
+# ─────────────────────────────────────────────────────────────
+class NodeAgent:
+    """
+    Keep this node registered with the coordinator.
+
+    Every heartbeat carries the node's capacity, a snapshot of its running
+    jobs (the coordinator resumes them elsewhere from it if the node dies) and
+    the jobs finished since the last heartbeat that reached the coordinator.
+    accepting() says whether the node takes new jobs; a node that does not
+    keeps its running jobs but is given no new ones. The first heartbeat registers the node, so a restarted coordinator
+    relearns the cluster within one interval.
+    """
+
+    def __init__(self, coordinator_url: str, node_id: str, node_url: str, max_jobs: int,
+                 snapshot, secret: str, interval: float = HEARTBEAT_SECONDS, accepting=None):
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.node_id = node_id
+        self.node_url = node_url
+        self.max_jobs = max_jobs
+        self.snapshot = snapshot
+        self.secret = secret
+        self.interval = interval
+        self.accepting = accepting
+        self._finished = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="heartbeat", daemon=True)
+
+    def job_finished(self, job_id: str) -> None:
+        with self._lock:
+            self._finished.add(job_id)
+
+    def beat(self) -> bool:
+        with self._lock:
+            finished = sorted(self._finished)
+        body = {
+            "url": self.node_url,
+            "maxJobs": self.max_jobs,
+            "interval": self.interval,
+            "jobs": self.snapshot(),
+            "finished": finished,
+            "accepting": self.accepting() if self.accepting else True,
+        }
+        try:
+            response = requests.post(
+                f"{self.coordinator_url}/nodes/{self.node_id}/heartbeat",
+                json=body,
+                headers={SECRET_HEADER_NAME: self.secret},
+                timeout=self.interval,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f"Heartbeat to coordinator failed: {e}")
+            return False
+        # Keep finished jobs until the coordinator has heard about them
+        with self._lock:
+            self._finished.difference_update(finished)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            self.beat()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self) -> None:
+        logger.info(f"Joining coordinator {self.coordinator_url} as {self.node_id} ({self.max_jobs} jobs)")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# ─────────────────────────────────────────────────────────────
+# Coordinator side
+# ─────────────────────────────────────────────────────────────
+class Node:
+    def __init__(self, node_id: str, url: str, max_jobs: int, interval: float, now: float):
+        self.node_id = node_id
+        self.url = url.rstrip("/")
+        self.max_jobs = max_jobs
+        self.interval = interval
+        self.last_seen = now
+        self.alive = True
+        self.accepting = True
+        self.jobs = set()      # job ids assigned to this node
+
+    @property
+    def spare(self) -> int:
+        return self.max_jobs - len(self.jobs) if self.alive and self.accepting else 0
+
+
+class ClusterJob:
+    def __init__(self, job_id: str, kind: str, request: dict, checkpoint: dict = None):
+        self.job_id = job_id
+        self.kind = kind
+        self.request = request          # the /run body, forwarded as is
+        self.checkpoint = checkpoint    # latest progress reported by the node running it
+        self.node_id = None
+        self.dispatched_at = None
+
+    @property
+    def camera_id(self):
+        return self.request.get("cameraId")
+
+    def body(self) -> dict:
+        body = dict(self.request, jobId=self.job_id)
+        if self.checkpoint:
+            body["checkpoint"] = self.checkpoint
+        return body
+
+
+def post_job(node: Node, job: ClusterJob, secret: str = None, timeout: float = DISPATCH_TIMEOUT_SECONDS) -> dict:
+    """
+    Start a job on a node.
+
+    The node only takes the job id and checkpoint with the internal secret.
+
+    Raises:
+        JobRejected: If the node answers 4xx (e.g. the video does not exist)
+        NodeBusy: If the node answers 503
+        requests.RequestException: If the node is unreachable or failing
+    """
+    headers = {SECRET_HEADER_NAME: secret} if secret else None
+    response = requests.post(f"{node.url}{ENDPOINTS[job.kind]}", json=job.body(), headers=headers, timeout=timeout)
+    if 400 <= response.status_code < 500:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise JobRejected(response.status_code, detail)
+    if response.status_code == 503:
+        raise NodeBusy(response.text)
+    response.raise_for_status()
+    return response.json()
+
+
+class Coordinator:
+    """
+    Place jobs on nodes and move them when a node dies.
+
+    A job goes to the node that last ran its camera while that node has a
+    free slot (camera affinity), otherwise to the node with the most free
+    slots. With no free slot anywhere the job waits in a FIFO queue. A node
+    that fails a dispatch, or misses heartbeats for node_timeout seconds, is
+    marked dead and its jobs are queued again, ahead of new work, with the
+    checkpoint from its last heartbeat so the next node resumes them.
+
+    All bookkeeping is in memory; nodes report their running jobs in every
+    heartbeat, so a restarted coordinator adopts them again.
+    """
+
+    def __init__(self, dispatch=post_job, node_timeout: float = NODE_TIMEOUT_SECONDS, clock=time.time):
+        self.dispatch = dispatch
+        self.node_timeout = node_timeout
+        self.clock = clock
+        self.nodes = {}
+        self.jobs = {}
+        self.queue = deque()
+        self.affinity = {}       # cameraId -> node_id
+        self.completed = 0
+        self.reassigned = 0
+        self._lock = threading.RLock()
+
+    # Nodes ──────────────────────────────────────────────────
+    def heartbeat(self, node_id: str, url: str, max_jobs: int, jobs: list = (), finished: list = (),
+                  interval: float = HEARTBEAT_SECONDS, accepting: bool = True) -> None:
+        now = self.clock()
+        with self._lock:
+            node = self.nodes.get(node_id)
+            if node is None or not node.alive:
+                logger.info(f"Node {node_id} joined at {url} with {max_jobs} slots")
+                node = self.nodes[node_id] = Node(node_id, url, max_jobs, interval, now)
+            node.url, node.max_jobs, node.interval, node.last_seen = url.rstrip("/"), max_jobs, interval, now
+            if node.accepting != accepting:
+                logger.info(f"Node {node_id} {'accepts new jobs again' if accepting else 'stopped accepting new jobs'}")
+            node.accepting = accepting
+
+            for job_id in finished:
+                self._complete(job_id, node_id)
+
+            reported = {snapshot["jobId"]: snapshot for snapshot in jobs}
+            for job_id, snapshot in reported.items():
+                if job_id in finished:
+                    continue
+                job = self.jobs.get(job_id)
+                if job is None:
+                    # Running since before this coordinator started
+                    job = self.jobs[job_id] = ClusterJob(job_id, snapshot["kind"], self._request_of(snapshot))
+                    self._assign(job, node, now)
+                elif job.node_id is None:
+                    # Queued again while the node was unreachable, but it kept running
+                    self.queue.remove(job)
+                    self._assign(job, node, now)
+                elif job.node_id != node_id:
+                    logger.warning(f"Job {job_id} is reported by {node_id} but assigned to {job.node_id}")
+                    continue
+                job.checkpoint = checkpoint_of(snapshot)
+
+            # A job the node neither runs nor finished was lost, e.g. in a node restart.
+            # Jobs dispatched within the last heartbeat interval may not be in the snapshot yet.
+            for job_id in list(node.jobs):
+                job = self.jobs[job_id]
+                if job_id not in reported and job.dispatched_at < now - 2 * node.interval:
+                    logger.warning(f"Job {job_id} is no longer running on {node_id}; queueing it again")
+                    self._requeue(job)
+        self.dispatch_pending()
+
+    def check_nodes(self) -> None:
+        """Mark nodes that missed their heartbeats dead and queue their jobs again."""
+        now = self.clock()
+        with self._lock:
+            for node in self.nodes.values():
+                if node.alive and now - node.last_seen > self.node_timeout:
+                    logger.warning(f"Node {node.node_id} missed heartbeats for {now - node.last_seen:.0f} s")
+                    self._mark_dead(node)
+        self.dispatch_pending()
+
+    def _mark_dead(self, node: Node) -> None:
+        node.alive = False
+        # Keep the original order ahead of new work
+        for job_id in sorted(node.jobs, key=lambda j: self.jobs[j].dispatched_at or 0, reverse=True):
+            self._requeue(self.jobs[job_id])
+            self.reassigned += 1
+        self.affinity = {camera: n for camera, n in self.affinity.items() if n != node.node_id}
+
+    # Jobs ───────────────────────────────────────────────────
+    @staticmethod
+    def _request_of(snapshot: dict) -> dict:
+        metadata = snapshot.get("metadata", {})
+        video_id = os.path.splitext(os.path.basename(snapshot.get("videoPath", "")))[0]
+        return {"videoId": video_id, **metadata, **snapshot.get("options", {})}
+
+    def _assign(self, job: ClusterJob, node: Node, now: float) -> None:
+        job.node_id = node.node_id
+        job.dispatched_at = now
+        node.jobs.add(job.job_id)
+        if job.camera_id:
+            self.affinity[job.camera_id] = node.node_id
+
+    def _requeue(self, job: ClusterJob) -> None:
+        node = self.nodes.get(job.node_id)
+        if node:
+            node.jobs.discard(job.job_id)
+        job.node_id = None
+        job.dispatched_at = None
+        self.queue.appendleft(job)
+
+    def _complete(self, job_id: str, node_id: str) -> None:
+        job = self.jobs.get(job_id)
+        if job is None or job.node_id != node_id:
+            return
+        self.nodes[node_id].jobs.discard(job_id)
+        del self.jobs[job_id]
+        self.completed += 1
+
+    def _pick(self, job: ClusterJob):
+        preferred = self.nodes.get(self.affinity.get(job.camera_id))
+        if preferred and preferred.spare > 0:
+            return preferred
+        candidates = [n for n in self.nodes.values() if n.spare > 0]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda n: (n.spare, -len(n.jobs), n.node_id))
+
+    def submit(self, kind: str, request: dict) -> ClusterJob:
+        """
+        Queue a job and place it at once if a node has a free slot.
+
+        Raises:
+            JobRejected: If the node the job was placed on refused it
+        """
+        job = ClusterJob(uuid.uuid4().hex, kind, request)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self.queue.append(job)
+        self.dispatch_pending(raise_for=job)
+        return job
+
+    def dispatch_pending(self, raise_for: ClusterJob = None) -> None:
+        """Place queued jobs, in order, until the queue is empty or every node is full."""
+        while True:
+            with self._lock:
+                if not self.queue:
+                    return
+                job = self.queue[0]
+                node = self._pick(job)
+                if node is None:
+                    return
+                self.queue.popleft()
+                # Reserve the slot before the request so concurrent dispatches see it taken
+                self._assign(job, node, self.clock())
+
+            try:
+                self.dispatch(node, job)
+                logger.info(f"Job {job.job_id} ({job.camera_id}) -> {node.node_id}")
+            except JobRejected as e:
+                logger.warning(f"Node {node.node_id} rejected job {job.job_id}: {e.detail}")
+                with self._lock:
+                    node.jobs.discard(job.job_id)
+                    self.jobs.pop(job.job_id, None)
+                if job is raise_for:
+                    raise
+            except NodeBusy:
+                # Alive, but given nothing new until a heartbeat says it accepts jobs again
+                logger.warning(f"Node {node.node_id} is busy; requeueing job {job.job_id}")
+                with self._lock:
+                    node.jobs.discard(job.job_id)
+                    node.accepting = False
+                    job.node_id = None
+                    self.queue.appendleft(job)
+            except Exception as e:
+                logger.warning(f"Dispatching job {job.job_id} to {node.node_id} failed: {e}")
+                with self._lock:
+                    node.jobs.discard(job.job_id)
+                    self._mark_dead(node)
+                    job.node_id = None
+                    self.queue.appendleft(job)
+
+    def status(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            return {
+                "nodes": [{
+                    "nodeId": n.node_id,
+                    "url": n.url,
+                    "alive": n.alive,
+                    "accepting": n.accepting,
+                    "maxJobs": n.max_jobs,
+                    "jobs": sorted(n.jobs),
+                    "spare": n.spare,
+                    "lastSeenSeconds": round(now - n.last_seen, 1),
+                } for n in sorted(self.nodes.values(), key=lambda n: n.node_id)],
+                "queued": [job.job_id for job in self.queue],
+                "running": sum(len(n.jobs) for n in self.nodes.values()),
+                "completed": self.completed,
+                "reassigned": self.reassigned,
+            }
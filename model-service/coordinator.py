@@ -0,0 +1,122 @@
+"""
+Coordinator for running several model-service nodes as one service.
+
+Exposes the same /run and /run-bbox API as a node, so the backend only needs
+MODEL_SERVICE_URL pointed here. Nodes join by sending heartbeats (app.py does
+this when COORDINATOR_URL is set); see cluster.Coordinator for placement and
+failover.
+
+Usage (from model-service/):
+    INTERNAL_SECRET=... uvicorn coordinator:app --port 8100
+"""
+import os
+import hmac
+import logging
+import threading
+from functools import partial
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Depends, Header, HTTPException
+from pydantic import BaseModel
+
+from cluster import SECRET_HEADER_NAME, Coordinator, JobRejected, post_job
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+)
+logger = logging.getLogger("model-service")
+
+SECRET = os.environ["INTERNAL_SECRET"]
+CHECK_SECONDS = 1.0
+
+coordinator = Coordinator(dispatch=partial(post_job, secret=SECRET))
+_stop = threading.Event()
+
+
+def _monitor() -> None:
+    while not _stop.wait(CHECK_SECONDS):
+        try:
+            coordinator.check_nodes()
+        except Exception as e:
+            logger.error(f"Coordinator check failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    _stop.clear()
+    threading.Thread(target=_monitor, name="coordinator", daemon=True).start()
+    yield
+    _stop.set()
+
+app = FastAPI(title="CrashAlertAI-Model-Service-Coordinator", lifespan=lifespan)
+
+
+def require_internal_secret(secret: str = Header(None, alias=SECRET_HEADER_NAME)):
+    if not secret or not hmac.compare_digest(secret, SECRET):
+        raise HTTPException(401, detail="Invalid internal secret")
+
+
+class RunRequest(BaseModel):
+    videoId: str
+    cameraId: str
+    location: str
+    saveIndex: Optional[bool] = None
+    shards: Optional[int] = None
+    priority: Optional[str] = None
+
+
+class Heartbeat(BaseModel):
+    url: str
+    maxJobs: int
+    interval: float
+    jobs: List[dict] = []
+    finished: List[str] = []
+    accepting: bool = True
+
+
+def _submit(kind: str, req: RunRequest) -> dict:
+    request = {k: v for k, v in req.model_dump().items() if v is not None}
+    try:
+        job = coordinator.submit(kind, request)
+    except JobRejected as e:
+        raise HTTPException(e.status_code, detail=e.detail)
+    return {
+        "status": "processing_started" if job.node_id else "queued",
+        "video": req.videoId,
+        "jobId": job.job_id,
+        "node": job.node_id,
+    }
+
+
+@app.post("/run")
+def run(req: RunRequest):
+    return _submit("run", req)
+
+
+@app.post("/run-bbox")
+def run_bbox(req: RunRequest):
+    return _submit("bbox", req)
+
+
+@app.post("/nodes/{node_id}/heartbeat", dependencies=[Depends(require_internal_secret)])
+def heartbeat(node_id: str, beat: Heartbeat):
+    coordinator.heartbeat(node_id, beat.url, beat.maxJobs, beat.jobs, beat.finished, beat.interval,
+                          beat.accepting)
+    return {"status": "ok"}
+
+
+@app.get("/nodes")
+def nodes():
+    return coordinator.status()
+
+
+@app.get("/health")
+def health():
+    status = coordinator.status()
+    alive = sum(node["alive"] for node in status["nodes"])
+    return {"status": "healthy" if alive else "no_nodes", "nodes": alive, "queued": len(status["queued"])}
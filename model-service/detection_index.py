@@ -0,0 +1,191 @@
+import os
+import json
+import numpy as np
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+INDEX_MIN_CONF = float(os.getenv("INDEX_MIN_CONF", "0.25"))  # lowest confidence kept in the index
+
+_COLUMNS = ("frame", "cls", "conf", "xyxy")
+_META_FILE = "meta.json"
+
+
+# ─────────────────────────────────────────────────────────────
+# Alert extraction
+# ─────────────────────────────────────────────────────────────
+class CooldownGate:
+    """Allow at most one alert per cooldown window, measured in video time."""
+
+    def __init__(self, cooldown_seconds: float, last_alert_time: float = None):
+        self.cooldown_seconds = cooldown_seconds
+        self.last_alert_time = last_alert_time
+
+    def admit(self, video_time: float) -> bool:
+        """Return True (and start a new window) if an alert at video_time is allowed."""
+        if self.last_alert_time is None or (video_time - self.last_alert_time) > self.cooldown_seconds:
+            self.last_alert_time = video_time
+            return True
+        return False
+
+
+def format_timestamp(video_time: float) -> str:
+    """Format seconds into the MM:SS string used in alerts."""
+    minutes = int(video_time // 60)
+    seconds = int(video_time % 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def extract_alerts(index, threshold: float, cooldown_seconds: float, class_ids, gate: CooldownGate = None) -> list:
+    """
+    Re-run alert extraction over a detection index.
+
+    Produces the same events as the live loop in predict_video would for the
+    given settings: the first qualifying detection opens an alert and further
+    detections are ignored until the cooldown has elapsed in video time.
+
+    Args:
+        index (DetectionIndex): Raw detections of one video, ordered by frame
+        threshold (float): Minimum confidence for a detection to count
+        cooldown_seconds (float): Minimum video time between two alerts
+        class_ids (iterable): Class IDs that trigger an alert
+        gate (CooldownGate): Gate to continue from when the index is one piece of
+            a longer video; a fresh gate is used when omitted
+
+    Returns:
+        list: One dict per alert with frame, seconds, timestamp and confidence
+    """
+    gate = gate or CooldownGate(cooldown_seconds)
+    mask = np.isin(index.cls, np.asarray(list(class_ids))) & (index.conf >= threshold)
+    rows = np.flatnonzero(mask)
+    if rows.size == 0:
+        return []
+
+    times = index.frame[rows] / index.fps
+    events = []
+    i = 0 if gate.last_alert_time is None else _next_admitted(times, 0, gate)
+    # Jump straight to the first candidate past each cooldown window instead
+    # of visiting every row, so the cost scales with the number of alerts.
+    while i < rows.size:
+        row = rows[i]
+        video_time = float(times[i])
+        gate.admit(video_time)
+        events.append({
+            "frame": int(index.frame[row]),
+            "seconds": video_time,
+            "timestamp": format_timestamp(video_time),
+            "classId": int(index.cls[row]),
+            "confidence": float(index.conf[row]),
+        })
+        i = _next_admitted(times, i + 1, gate)
+    return events
+
+
+def _next_admitted(times, start: int, gate: CooldownGate) -> int:
+    """
+    Position of the first time from start on that gate.admit would accept.
+
+    The binary search on last + cooldown can land one row off the gate's own
+    test, (time - last) > cooldown, when the two round differently, so the
+    result is moved to where that test changes.
+    """
+    last, cooldown = gate.last_alert_time, gate.cooldown_seconds
+    i = max(start, int(np.searchsorted(times, last + cooldown, side="right")))
+    while i > start and times[i - 1] - last > cooldown:
+        i -= 1
+    while i < times.size and not times[i] - last > cooldown:
+        i += 1
+    return i
+
+
+# ─────────────────────────────────────────────────────────────
+# Storage
+# ─────────────────────────────────────────────────────────────
+class DetectionIndex:
+    """Columnar, memory-mapped view of every raw detection in one video."""
+
+    def __init__(self, frame, cls, conf, xyxy, meta):
+        self.frame = frame
+        self.cls = cls
+        self.conf = conf
+        self.xyxy = xyxy
+        self.meta = meta
+
+    @property
+    def fps(self) -> float:
+        return self.meta["fps"]
+
+    @property
+    def min_conf(self) -> float:
+        return self.meta["min_conf"]
+
+    def __len__(self):
+        return int(self.frame.shape[0])
+
+    @classmethod
+    def load(cls, index_dir: str) -> "DetectionIndex":
+        """Open an index written by DetectionIndexWriter without reading it into memory."""
+        with open(os.path.join(index_dir, _META_FILE)) as f:
+            meta = json.load(f)
+        columns = {}
+        for name in _COLUMNS:
+            path = os.path.join(index_dir, f"{name}.npy")
+            # np.load refuses to memory-map zero-length arrays
+            columns[name] = np.load(path, mmap_mode="r" if meta["count"] else None)
+        return cls(meta=meta, **columns)
+
+
+class DetectionIndexWriter:
+    """Accumulate detections frame by frame and persist them as .npy columns."""
+
+    def __init__(self, index_dir: str, fps: float, min_conf: float = INDEX_MIN_CONF):
+        self.index_dir = index_dir
+        self.fps = fps
+        self.min_conf = min_conf
+        self.frame_count = 0
+        self._frame = []
+        self._cls = []
+        self._conf = []
+        self._xyxy = []
+
+    def add(self, frame: int, cls_id: int, confidence: float, xyxy) -> None:
+        self._frame.append(frame)
+        self._cls.append(cls_id)
+        self._conf.append(confidence)
+        self._xyxy.append(xyxy)
+
+    def extend(self, index: DetectionIndex) -> None:
+        """Append every row of an in-memory index, e.g. one merged shard."""
+        self._frame.extend(index.frame.tolist())
+        self._cls.extend(index.cls.tolist())
+        self._conf.extend(index.conf.tolist())
+        self._xyxy.extend(index.xyxy.tolist())
+
+    def close(self, frame_count: int) -> str:
+        """Write the columns and metadata, replacing any previous index for the video."""
+        self.frame_count = frame_count
+        os.makedirs(self.index_dir, exist_ok=True)
+        meta_path = os.path.join(self.index_dir, _META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        columns = {
+            "frame": np.asarray(self._frame, dtype=np.int32),
+            "cls": np.asarray(self._cls, dtype=np.int16),
+            "conf": np.asarray(self._conf, dtype=np.float32),
+            "xyxy": np.asarray(self._xyxy, dtype=np.float32).reshape(-1, 4),
+        }
+        for name, values in columns.items():
+            np.save(os.path.join(self.index_dir, f"{name}.npy"), values)
+
+        meta = {
+            "fps": self.fps,
+            "min_conf": self.min_conf,
+            "frame_count": frame_count,
+            "count": len(self._frame),
+        }
+        tmp_path = os.path.join(self.index_dir, f"{_META_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        # meta.json is written last so a half-written index is never loaded
+        os.replace(tmp_path, meta_path)
+        return self.index_dir
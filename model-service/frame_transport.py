@@ -0,0 +1,264 @@
+import os
+import copy
+import time
+import queue
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+FRAME_RING_SLOTS = int(os.getenv("FRAME_RING_SLOTS", "8"))           # frames buffered between decoder and consumers
+FRAME_TIMEOUT_SECONDS = float(os.getenv("FRAME_TIMEOUT_SECONDS", "30"))
+
+_COUNTERS = ("frames_written", "frames_read", "frames_copied", "bytes_copied", "backpressure_waits")
+
+
+class FrameRing:
+    """
+    Fixed number of frame slots in shared memory, handed between processes by index.
+
+    The producer acquires a free slot, decodes straight into its NumPy view and
+    publishes the slot index; consumers receive the index and read the same
+    memory without copying. Only (slot, frame_index) pairs go through the
+    queues. A consumer hands the slot back with release(), and the producer
+    blocks in acquire() while every slot is in use, which is the backpressure.
+
+    Any number of consumer processes can share one ring; each frame is delivered
+    to exactly one of them. Pass the ring to child processes as a Process
+    argument so the queues and counters are inherited.
+    """
+
+    def __init__(self, shape, slots: int = FRAME_RING_SLOTS, consumers: int = 1, dtype=np.uint8, ctx=None):
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.consumers = consumers
+        self.frame_nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=self.frame_nbytes * slots)
+        self._owner = True
+        self._free = ctx.Queue()
+        self._free_count = ctx.Semaphore(slots)
+        self._filled = ctx.Queue()
+        self._counters = {name: ctx.Value("q", 0) for name in _COUNTERS}
+        self._started = ctx.Value("d", time.time())
+        for slot in range(slots):
+            self._free.put(slot)
+        self._views = self._make_views()
+
+    def _make_views(self):
+        return np.ndarray((self.slots,) + self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shm"] = self._shm.name
+        state["_owner"] = False
+        del state["_views"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=state["_shm"])
+        self._views = self._make_views()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        counter = self._counters[name]
+        with counter.get_lock():
+            counter.value += amount
+
+    # ── producer ────────────────────────────────────────────
+    def acquire(self, timeout: float = FRAME_TIMEOUT_SECONDS):
+        """Wait for a free slot and return (slot, writable view); raises queue.Empty on timeout."""
+        if not self._free_count.acquire(block=False):
+            self._count("backpressure_waits")
+            if not self._free_count.acquire(timeout=timeout):
+                raise queue.Empty
+        # The semaphore guarantees a slot index is in (or on its way into) the queue
+        slot = self._free.get()
+        return slot, self._views[slot]
+
+    def publish(self, slot: int, frame_index: int) -> None:
+        self._count("frames_written")
+        self._filled.put((slot, frame_index))
+
+    def write(self, frame: np.ndarray, frame_index: int, timeout: float = FRAME_TIMEOUT_SECONDS) -> None:
+        """Copy an already decoded frame into a slot, for producers that cannot decode in place."""
+        slot, view = self.acquire(timeout)
+        view[...] = frame
+        self._count("frames_copied")
+        self._count("bytes_copied", self.frame_nbytes)
+        self.publish(slot, frame_index)
+
+    def finish(self) -> None:
+        """Tell every consumer that no more frames will come."""
+        for _ in range(self.consumers):
+            self._filled.put(None)
+
+    # ── consumer ────────────────────────────────────────────
+    def get(self, timeout: float = FRAME_TIMEOUT_SECONDS):
+        """Return (slot, frame_index, read-only view), or None once the producer has finished."""
+        item = self._filled.get(timeout=timeout)
+        if item is None:
+            return None
+        slot, frame_index = item
+        self._count("frames_read")
+        view = self._views[slot]
+        view.flags.writeable = False
+        return slot, frame_index, view
+
+    def release(self, slot: int) -> None:
+        """Hand a slot back to the producer once its frame is no longer needed."""
+        self._free.put(slot)
+        self._free_count.release()
+
+    def frames(self, timeout: float = FRAME_TIMEOUT_SECONDS):
+        """
+        Iterate (frame_index, view) until the producer finishes.
+
+        A view is valid until the next iteration; its slot is released then.
+        """
+        while True:
+            item = self.get(timeout)
+            if item is None:
+                return
+            slot, frame_index, view = item
+            try:
+                yield frame_index, view
+            finally:
+                self.release(slot)
+
+    # ── housekeeping ────────────────────────────────────────
+    def stats(self) -> dict:
+        stats = {name: counter.value for name, counter in self._counters.items()}
+        elapsed = max(time.time() - self._started.value, 1e-9)
+        stats["read_fps"] = stats["frames_read"] / elapsed
+        stats["slots"] = self.slots
+        return stats
+
+    def close(self) -> None:
+        """Detach from the shared memory; the creating process also frees it."""
+        self._views = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a view; the mapping goes away with the last one
+            logger.debug(f"Frame ring {self._shm.name} closed while views are alive")
+        if self._owner:
+            self._shm.unlink()
+
+
+# ─────────────────────────────────────────────────────────────
+# Decoder
+# ─────────────────────────────────────────────────────────────
+def decode_to_ring(video_path: str, ring: FrameRing, start_frame: int = 0) -> None:
+    """Decode a video into the ring in place; meant to run in its own process."""
+    cap = cv2.VideoCapture(video_path)
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_index = start_frame
+    try:
+        while True:
+            slot, view = ring.acquire()
+            ok, frame = cap.read(view)
+            if not ok:
+                ring.release(slot)
+                break
+            if not np.shares_memory(frame, view):
+                # The decoder allocated a new buffer (e.g. unexpected frame size)
+                view[...] = frame
+                ring._count("frames_copied")
+                ring._count("bytes_copied", ring.frame_nbytes)
+            ring.publish(slot, frame_index)
+            frame_index += 1
+    finally:
+        view = frame = None
+        cap.release()
+        ring.finish()
+        ring.close()
+
+
+def start_decoder(video_path: str, start_frame: int = 0, slots: int = FRAME_RING_SLOTS, consumers: int = 1):
+    """
+    Start a decoder process for video_path.
+
+    Returns:
+        tuple: (FrameRing, Process) — consume frames from the ring, then join
+        the process and close the ring
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video file {video_path}")
+    shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    cap.release()
+
+    ctx = multiprocessing.get_context("spawn")
+    ring = FrameRing(shape, slots=slots, consumers=consumers, ctx=ctx)
+    decoder = ctx.Process(target=decode_to_ring, args=(video_path, ring, start_frame), daemon=True)
+    decoder.start()
+    return ring, decoder
+
+
+# ─────────────────────────────────────────────────────────────
+# Tracking over decoded frames
+# ─────────────────────────────────────────────────────────────
+def read_frames(cap, first: int = 0, end: int = None):
+    """Yield (frame_index, frame) from an open capture positioned at frame first."""
+    frame_index = first
+    while end is None or frame_index < end:
+        ok, frame = cap.read()
+        if not ok:
+            return
+        yield frame_index, frame
+        frame_index += 1
+
+
+def tracking_copy(model):
+    """
+    A copy of a YOLO model with a predictor, and so a tracker, of its own.
+
+    ultralytics keeps one predictor per model, holding the tracker and the
+    conf and imgsz of the last call, and locks it only for the length of one
+    call. Jobs feeding frames one by one through a shared model would mix
+    their cameras in one tracker and race on each other's settings. The copy
+    shares the weights, so it only costs a predictor. Anything that is not an
+    ultralytics model (test doubles, the benchmark stub) is returned as is.
+    """
+    from ultralytics.engine.model import Model
+    from ultralytics.utils import callbacks
+
+    if not isinstance(model, Model):
+        return model
+    job_model = copy.copy(model)
+    job_model.predictor = None
+    job_model.overrides = dict(model.overrides)
+    job_model.callbacks = callbacks.get_default_callbacks()   # the tracker registers its callbacks here
+    return job_model
+
+
+def track_frames(model, frames, conf: float, imgsz: int = 640):
+    """
+    Run model.track on individually supplied frames, keeping tracks between them.
+
+    The frames are tracked on a tracking_copy of model, so every call starts
+    with a new tracker and concurrent calls do not share one.
+
+    Args:
+        model: YOLO model
+        frames: Iterable of (frame_index, BGR frame)
+        conf (float): Confidence passed to the model
+        imgsz (int or callable): Inference image size, or a function returning
+            the size to use for each frame
+
+    Yields:
+        tuple: (frame_index, Results) for each frame
+    """
+    model = tracking_copy(model)
+    for frame_index, frame in frames:
+        size = imgsz() if callable(imgsz) else imgsz
+        yield frame_index, model.track(frame, persist=True, conf=conf, imgsz=size, verbose=False)[0]
@@ -0,0 +1,313 @@
+import gc
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from metrics import MODEL_JOBS
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+MODEL_WARMUP_FRAMES = int(os.getenv("MODEL_WARMUP_FRAMES", "3"))
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_QUEUE_FRAMES = 8
+
+LOADING = "loading"
+WARMING = "warming"
+SHADOW = "shadow"
+FAILED = "failed"
+
+
+class SwapInProgress(Exception):
+    """A candidate model is already loading or being shadowed."""
+
+
+class NoCandidate(Exception):
+    """There is no loaded candidate model to promote."""
+
+
+class ModelVersion:
+    """A loaded model and the jobs that are still running on it."""
+
+    def __init__(self, version: int, weights: str, model):
+        self.version = version
+        self.weights = weights
+        self.model = model
+        self.loaded_at = datetime.now().isoformat()
+        self.jobs = 0
+        self.retired = False
+
+    def to_dict(self) -> dict:
+        return {"version": self.version, "weights": self.weights, "loadedAt": self.loaded_at, "jobs": self.jobs}
+
+
+def warm_up(model, imgsz: int, frames: int) -> float:
+    """Run a few blank frames through a freshly loaded model; returns the last frame's milliseconds."""
+    blank = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    elapsed_ms = 0.0
+    for _ in range(frames):
+        start = time.perf_counter()
+        model.predict(blank, imgsz=imgsz, verbose=False)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    return elapsed_ms
+
+
+def accident_confidence(boxes, class_id: int, threshold: float):
+    """Highest confidence of the class at or above threshold in one frame, or None."""
+    best = None
+    for box in boxes:
+        confidence = box.conf.item()
+        if int(box.cls.item()) == class_id and confidence >= threshold and (best is None or confidence > best):
+            best = confidence
+    return best
+
+
+class ShadowComparison:
+    """
+    Run a candidate model on a sample of the frames live jobs process.
+
+    Frames are handed to a single background thread through a short queue and
+    dropped when it is full, so shadowing never slows the live jobs down beyond
+    the CPU the candidate itself uses. Only frames of jobs running on the model
+    the candidate would replace are compared.
+    """
+
+    def __init__(self, baseline: ModelVersion, candidate: ModelVersion, conf: float, imgsz: int,
+                 class_id: int, sample_rate: float = SHADOW_SAMPLE_RATE):
+        self.baseline = baseline
+        self.candidate = candidate
+        self.conf = conf
+        self.imgsz = imgsz
+        self.class_id = class_id
+        self.every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self.offered = 0
+        self.dropped = 0
+        self.active_ms = []
+        self.candidate_ms = []
+        self.outcomes = {"both": 0, "activeOnly": 0, "candidateOnly": 0, "neither": 0}
+        self.confidence_deltas = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=SHADOW_QUEUE_FRAMES)
+        self._thread = threading.Thread(target=self._run, name="shadow", daemon=True)
+        self._thread.start()
+
+    def offer(self, results, version: ModelVersion) -> None:
+        """Queue every sample_rate-th frame of a job running on the baseline model."""
+        if version is not self.baseline or not self.every:
+            return
+        self.offered += 1
+        if self.offered % self.every:
+            return
+        frame = getattr(results, "orig_img", None)
+        if frame is None:
+            return
+        active = accident_confidence(results.boxes, self.class_id, self.conf)
+        try:
+            # The decoder reuses its ring slots, so the queued frame must be a copy
+            self._queue.put_nowait((frame.copy(), active, results.speed.get("inference")))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            frame, active, active_ms = item
+            try:
+                result = self.candidate.model.predict(frame, conf=self.conf, imgsz=self.imgsz, verbose=False)[0]
+            except Exception as e:
+                logger.warning(f"Shadow inference failed: {e}")
+                continue
+            candidate = accident_confidence(result.boxes, self.class_id, self.conf)
+            with self._lock:
+                if active_ms is not None:
+                    self.active_ms.append(active_ms)
+                self.candidate_ms.append(result.speed.get("inference", 0.0))
+                key = ("both" if candidate is not None else "activeOnly") if active is not None \
+                    else ("candidateOnly" if candidate is not None else "neither")
+                self.outcomes[key] += 1
+                if active is not None and candidate is not None:
+                    self.confidence_deltas.append(candidate - active)
+
+    def stop(self) -> None:
+        self._queue.put(None)
+
+    def summary(self) -> dict:
+        with self._lock:
+            compared = sum(self.outcomes.values())
+            active_ms = float(np.mean(self.active_ms)) if self.active_ms else None
+            candidate_ms = float(np.mean(self.candidate_ms)) if self.candidate_ms else None
+            return {
+                "framesCompared": compared,
+                "framesDropped": self.dropped,
+                "activeInferenceMs": round(active_ms, 2) if active_ms is not None else None,
+                "candidateInferenceMs": round(candidate_ms, 2) if candidate_ms is not None else None,
+                "latencyRatio": round(candidate_ms / active_ms, 3) if active_ms and candidate_ms is not None else None,
+                "detections": dict(self.outcomes),
+                "agreement": round((self.outcomes["both"] + self.outcomes["neither"]) / compared, 4) if compared else None,
+                "meanConfidenceDelta": round(float(np.mean(self.confidence_deltas)), 4) if self.confidence_deltas else None,
+            }
+
+
+class ModelManager:
+    """
+    Swap the model in a running service.
+
+    Jobs lease the active model for their whole run, so a swap only affects
+    jobs that start after it. stage() loads and warms up new weights in a
+    background thread and then swaps them in, or, with shadow=True, keeps them
+    as a candidate that runs alongside the active model on a sample of frames
+    until promote() or discard(). A replaced model stays loaded until its last
+    job has finished, then its memory is released.
+    """
+
+    def __init__(self, model, weights: str, loader, conf: float, imgsz: int, class_id: int, on_swap=None):
+        self.loader = loader
+        self.conf = conf
+        self.imgsz = imgsz
+        self.class_id = class_id
+        self.on_swap = on_swap
+        self.active = ModelVersion(1, weights, model)
+        self.candidate = None      # {"weights", "state", "shadow", "sampleRate", "error", "version", ...}
+        self.shadow = None
+        self.draining = []
+        self._versions = 1
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self):
+        """Pin the active model for the duration of a job."""
+        with self._lock:
+            version = self.active
+            version.jobs += 1
+        MODEL_JOBS.inc(version=str(version.version))
+        try:
+            yield version
+        finally:
+            MODEL_JOBS.dec(version=str(version.version))
+            with self._lock:
+                version.jobs -= 1
+                drained = version.retired and version.jobs == 0 and version in self.draining
+                if drained:
+                    self.draining.remove(version)
+            if drained:
+                self._release(version)
+
+    def stage(self, weights: str, shadow: bool = False, sample_rate: float = SHADOW_SAMPLE_RATE,
+              warmup_frames: int = MODEL_WARMUP_FRAMES) -> dict:
+        """
+        Start loading weights in the background.
+
+        Raises:
+            SwapInProgress: If another candidate is loading or being shadowed
+        """
+        with self._lock:
+            if self.candidate and self.candidate["state"] != FAILED:
+                raise SwapInProgress()
+            candidate = self.candidate = {
+                "weights": weights, "state": LOADING, "shadow": shadow, "sampleRate": sample_rate,
+                "error": None, "version": None, "warmupMs": None, "started": datetime.now().isoformat(),
+            }
+        status = self._candidate_status(candidate)
+        threading.Thread(target=self._load, args=(candidate, warmup_frames), name="model-load", daemon=True).start()
+        return status
+
+    def _load(self, candidate: dict, warmup_frames: int) -> None:
+        logger.info(f"Loading candidate model {candidate['weights']}")
+        try:
+            model = self.loader(candidate["weights"])
+            candidate["state"] = WARMING
+            candidate["warmupMs"] = round(warm_up(model, self.imgsz, warmup_frames), 2)
+        except Exception as e:
+            logger.error(f"Loading candidate model {candidate['weights']} failed: {e}")
+            candidate["state"] = FAILED
+            candidate["error"] = str(e)
+            return
+
+        with self._lock:
+            if self.candidate is not candidate:
+                return  # discarded while loading
+            self._versions += 1
+            candidate["version"] = ModelVersion(self._versions, candidate["weights"], model)
+            if candidate["shadow"]:
+                candidate["state"] = SHADOW
+                self.shadow = ShadowComparison(self.active, candidate["version"], self.conf, self.imgsz,
+                                               self.class_id, candidate["sampleRate"])
+                logger.info(f"Shadowing model v{self._versions} ({candidate['weights']}) on live frames")
+                return
+        try:
+            self.promote()
+        except NoCandidate:
+            pass  # discarded in the meantime
+
+    def promote(self) -> ModelVersion:
+        """
+        Make the loaded candidate the model for new jobs.
+
+        Raises:
+            NoCandidate: If no candidate has finished loading
+        """
+        with self._lock:
+            candidate = self.candidate
+            if not candidate or candidate["version"] is None:
+                raise NoCandidate()
+            old, self.active = self.active, candidate["version"]
+            shadow, self.shadow = self.shadow, None
+            self.candidate = None
+            old.retired = True
+            # Decided under the lock: once old is draining, its last lease releases it
+            running = old.jobs
+            if running:
+                self.draining.append(old)
+        if shadow:
+            shadow.stop()
+        logger.info(f"Swapped in model v{self.active.version} ({self.active.weights}); "
+                    f"v{old.version} finishes {running} running job(s)")
+        if self.on_swap:
+            self.on_swap(self.active)
+        if not running:
+            self._release(old)
+        return self.active
+
+    def discard(self) -> bool:
+        """Drop the candidate (also one that is still loading); returns whether there was one."""
+        with self._lock:
+            candidate, self.candidate = self.candidate, None
+            shadow, self.shadow = self.shadow, None
+        if shadow:
+            shadow.stop()
+        if candidate:
+            logger.info(f"Discarded candidate model {candidate['weights']}")
+        return candidate is not None
+
+    def _release(self, version: ModelVersion) -> None:
+        version.model = None
+        MODEL_JOBS.remove(version=str(version.version))
+        gc.collect()
+        logger.info(f"Released model v{version.version} ({version.weights})")
+
+    def _candidate_status(self, candidate: dict) -> dict:
+        status = {k: v for k, v in candidate.items() if k != "version"}
+        if candidate["version"] is not None:
+            status["version"] = candidate["version"].version
+        return status
+
+    def status(self) -> dict:
+        with self._lock:
+            candidate = self._candidate_status(self.candidate) if self.candidate else None
+            if candidate and self.shadow:
+                candidate["comparison"] = self.shadow.summary()
+            return {
+                "active": self.active.to_dict(),
+                "candidate": candidate,
+                "draining": [version.to_dict() for version in self.draining],
+            }
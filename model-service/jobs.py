@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import uuid
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+CHECKPOINT_EVERY_FRAMES = int(os.getenv("CHECKPOINT_EVERY_FRAMES", "300"))
+
+# Job ids name checkpoint files and scratch directories
+JOB_ID_PATTERN = r"^[A-Za-z0-9_-]+$"
+
+RUNNING = "running"
+COMPLETED = "completed"
+
+EVENT_PENDING = "pending"  # alert raised, backend has not acknowledged it yet
+EVENT_SENT = "sent"
+EVENT_FAILED = "failed"
+
+
+class Job:
+    """A video processing job and the progress needed to resume it."""
+
+    def __init__(self, job_id, kind, video_path, metadata, options=None, status=RUNNING,
+                 frame_offset=0, last_alert_time=None, events=None, created=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.video_path = video_path
+        self.metadata = metadata
+        self.options = options or {}
+        self.status = status
+        self.frame_offset = frame_offset          # first frame not processed yet
+        self.last_alert_time = last_alert_time    # cooldown state, in video seconds
+        self.events = events or []                # alerts raised so far
+        self.created = created or datetime.now().isoformat()
+        self.deleted = False
+        self.lock = threading.RLock()
+
+    def to_dict(self) -> dict:
+        return {
+            "jobId": self.job_id,
+            "kind": self.kind,
+            "videoPath": self.video_path,
+            "metadata": self.metadata,
+            "options": self.options,
+            "status": self.status,
+            "frameOffset": self.frame_offset,
+            "lastAlertTime": self.last_alert_time,
+            "events": self.events,
+            "created": self.created,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        return cls(
+            job_id=data["jobId"],
+            kind=data["kind"],
+            video_path=data["videoPath"],
+            metadata=data["metadata"],
+            options=data.get("options"),
+            status=data.get("status", RUNNING),
+            frame_offset=data.get("frameOffset", 0),
+            last_alert_time=data.get("lastAlertTime"),
+            events=data.get("events"),
+            created=data.get("created"),
+        )
+
+    def find_event(self, frame: int):
+        for event in self.events:
+            if event["frame"] == frame:
+                return event
+        return None
+
+    def pending_events(self) -> list:
+        return [e for e in self.events if e["status"] == EVENT_PENDING]
+
+
+class JobStore:
+    """
+    Persist jobs as one JSON checkpoint file each.
+
+    Files are replaced atomically, so a crash mid-write leaves the previous
+    checkpoint in place. A job's file is removed once it has completed and
+    every alert it raised has been acknowledged or has failed.
+    """
+
+    def __init__(self, root: str, checkpoint_every_frames: int = CHECKPOINT_EVERY_FRAMES):
+        self.root = Path(root)
+        self.checkpoint_every_frames = checkpoint_every_frames
+
+    def _path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.json"
+
+    def create(self, kind: str, video_path: str, metadata: dict, options: dict = None, job_id: str = None,
+               checkpoint: dict = None) -> Job:
+        """
+        Create a job, optionally resuming from a checkpoint (frameOffset, lastAlertTime, events).
+
+        Raises:
+            ValueError: If job_id is not a plain name (letters, digits, "_" and "-")
+        """
+        if job_id is not None and not re.match(JOB_ID_PATTERN, job_id):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        checkpoint = checkpoint or {}
+        job = Job(job_id or uuid.uuid4().hex, kind, video_path, metadata, options,
+                  frame_offset=checkpoint.get("frameOffset", 0),
+                  last_alert_time=checkpoint.get("lastAlertTime"),
+                  events=checkpoint.get("events"))
+        self.save(job)
+        return job
+
+    def save(self, job: Job) -> None:
+        # File operations run under the job lock so a late save from a
+        # broadcast thread can never resurrect a deleted job
+        with job.lock:
+            if job.deleted:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            path = self._path(job.job_id)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(job.to_dict()))
+            os.replace(tmp_path, path)
+
+    def delete(self, job: Job) -> None:
+        with job.lock:
+            job.deleted = True
+            self._path(job.job_id).unlink(missing_ok=True)
+
+    def load_all(self) -> list:
+        jobs = []
+        for path in sorted(self.root.glob("*.json")):
+            try:
+                jobs.append(Job.from_dict(json.loads(path.read_text())))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable job checkpoint {path}: {e}")
+        return jobs
+
+    def interrupted(self) -> list:
+        """Jobs that were still running, or still had unacknowledged alerts, when the service stopped."""
+        return [job for job in self.load_all() if job.status == RUNNING or job.pending_events()]
+
+    def due(self, frames_processed: int, since: int = None) -> bool:
+        """Whether a checkpoint falls on frames_processed, or after since up to it when frames are skipped."""
+        if self.checkpoint_every_frames <= 0:
+            return False
+        if since is None:
+            return frames_processed % self.checkpoint_every_frames == 0
+        return frames_processed // self.checkpoint_every_frames > since // self.checkpoint_every_frames
+
+    def checkpoint(self, job: Job, frame_offset: int, last_alert_time: float = None) -> None:
+        with job.lock:
+            job.frame_offset = frame_offset
+            job.last_alert_time = last_alert_time
+        self.save(job)
+
+    def record_event(self, job: Job, frame: int, timestamp: str, confidence: float, last_alert_time: float) -> dict:
+        """
+        Persist an alert before it is dispatched.
+
+        The frame offset moves past the alert's frame together with the cooldown
+        state, so a resumed job can neither lose nor repeat the alert.
+        """
+        event = {
+            "frame": frame,
+            "timestamp": timestamp,
+            "confidence": confidence,
+            "status": EVENT_PENDING,
+        }
+        with job.lock:
+            job.events.append(event)
+            job.frame_offset = max(job.frame_offset, frame + 1)
+            job.last_alert_time = last_alert_time
+        self.save(job)
+        return event
+
+    def mark_event(self, job: Job, event: dict, sent: bool) -> None:
+        with job.lock:
+            event["status"] = EVENT_SENT if sent else EVENT_FAILED
+            if job.status == COMPLETED and not job.pending_events():
+                self.delete(job)
+            else:
+                self.save(job)
+
+    def finish(self, job: Job) -> None:
+        with job.lock:
+            job.status = COMPLETED
+            if not job.pending_events():
+                self.delete(job)
+            else:
+                self.save(job)
@@ -0,0 +1,256 @@
+import time
+import bisect
+import threading
+
+# ─────────────────────────────────────────────────────────────
+# Minimal Prometheus-compatible registry
+# ─────────────────────────────────────────────────────────────
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def remove(self, **labels) -> None:
+        """Drop one labelled series, e.g. the per-job gauge of a finished job."""
+        with self._lock:
+            self._series.pop(self._key(labels), None)
+
+    def _render_series(self, key, value) -> list:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[:-1]) if series else 0
+
+    def total(self, **labels) -> float:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0.0
+
+    def _render_series(self, key, series) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+            cumulative += count
+            le = ("le", _format_value(bound) if bound != float("inf") else "+Inf")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()) -> Gauge:
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ─────────────────────────────────────────────────────────────
+# Service metrics
+# ─────────────────────────────────────────────────────────────
+STAGE_SECONDS = REGISTRY.histogram(
+    "crashalert_stage_seconds",
+    "Time spent in each pipeline stage (decode, preprocess, inference, postprocess, "
+    "clip_trim, storage_upload, backend_post)",
+    labels=("stage",),
+)
+FRAMES_PROCESSED = REGISTRY.counter("crashalert_frames_processed_total", "Frames run through the model")
+FRAMES_SKIPPED = REGISTRY.counter(
+    "crashalert_frames_skipped_total", "Decoded frames not run through the model, by reason", labels=("reason",)
+)
+JOB_FPS = REGISTRY.gauge("crashalert_job_fps", "Frames per second of each running job", labels=("job",))
+QUEUE_DEPTH = REGISTRY.gauge("crashalert_queue_depth", "Items waiting or in flight per queue", labels=("queue",))
+DETECTION_TO_ACK_SECONDS = REGISTRY.histogram(
+    "crashalert_detection_to_ack_seconds",
+    "Time from an accident detection to the backend acknowledging the alert",
+)
+ALERTS = REGISTRY.counter("crashalert_alerts_total", "Alerts by backend outcome", labels=("outcome",))
+MODEL_JOBS = REGISTRY.gauge("crashalert_model_jobs", "Running jobs per loaded model version", labels=("version",))
+SCRATCH_BYTES = REGISTRY.gauge("crashalert_scratch_bytes", "Bytes used in each scratch area", labels=("area",))
+SCRATCH_FREE_BYTES = REGISTRY.gauge(
+    "crashalert_scratch_free_bytes", "Free bytes on the filesystem of each scratch area", labels=("area",)
+)
+SCRATCH_QUOTA_BYTES = REGISTRY.gauge("crashalert_scratch_quota_bytes", "Scratch quota; new jobs are refused above it")
+SCRATCH_WORKSPACES = REGISTRY.gauge("crashalert_scratch_workspaces", "Job workspaces in use")
+SCRATCH_REJECTED_JOBS = REGISTRY.counter("crashalert_scratch_rejected_jobs_total", "Jobs refused because scratch space was full")
+JOB_LAG_SECONDS = REGISTRY.gauge("crashalert_job_lag_seconds", "How far each running job is behind real time", labels=("job",))
+WORKER_CPU_RATIO = REGISTRY.gauge("crashalert_worker_cpu_ratio", "CPU used by the service and its workers, as a fraction of all cores")
+OVERLOAD_LEVEL = REGISTRY.gauge("crashalert_overload_level", "Degradation level of the overload controller (0 = full quality)")
+OVERLOAD_STRIDE = REGISTRY.gauge("crashalert_overload_stride", "Frames per inference at the current overload level")
+OVERLOAD_IMGSZ = REGISTRY.gauge("crashalert_overload_imgsz", "Inference image size at the current overload level")
+OVERLOAD_PAUSED_JOBS = REGISTRY.gauge("crashalert_overload_paused_jobs", "Archive jobs paused by the overload controller")
+OVERLOAD_STEPS = REGISTRY.counter(
+    "crashalert_overload_steps_total", "Overload level changes by direction (down = degrade)", labels=("direction",)
+)
+
+
+class timed:
+    """
+    Time a block and record it as a pipeline stage.
+
+        with timed("inference"):
+            ...
+
+    A plain class rather than @contextmanager keeps the per-call cost to two
+    perf_counter reads and one histogram update.
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class JobRate:
+    """Track a job's frames per second, publishing the gauge every few frames."""
+
+    def __init__(self, job_id: str, every: int = 30):
+        self.job_id = job_id
+        self.every = every
+        self.frames = 0
+        self.window_start = time.perf_counter()
+
+    def tick(self, frames: int = 1) -> None:
+        self.frames += frames
+        FRAMES_PROCESSED.inc(frames)
+        if self.frames >= self.every:
+            now = time.perf_counter()
+            JOB_FPS.set(round(self.frames / max(now - self.window_start, 1e-9), 2), job=self.job_id)
+            self.frames = 0
+            self.window_start = now
+
+    def close(self) -> None:
+        JOB_FPS.remove(job=self.job_id)
+
+
+def observe_frame(results, waited: float) -> None:
+    """
+    Split the time spent waiting for one YOLO result into pipeline stages.
+
+    YOLO reports preprocess/inference/postprocess in milliseconds on each
+    result; whatever remains of the wait is decoding (plus tracking).
+    """
+    speed = getattr(results, "speed", None)
+    if not isinstance(speed, dict):
+        return
+    model_seconds = 0.0
+    for stage in ("preprocess", "inference", "postprocess"):
+        seconds = (speed.get(stage) or 0.0) / 1000
+        model_seconds += seconds
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    STAGE_SECONDS.observe(max(0.0, waited - model_seconds), stage="decode")
@@ -0,0 +1,272 @@
+import os
+import time
+import logging
+import threading
+
+from metrics import (
+    FRAMES_SKIPPED, JOB_LAG_SECONDS, OVERLOAD_IMGSZ, OVERLOAD_LEVEL, OVERLOAD_PAUSED_JOBS, OVERLOAD_STEPS, OVERLOAD_STRIDE,
+    WORKER_CPU_RATIO,
+)
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+OVERLOAD_CONTROL = os.getenv("OVERLOAD_CONTROL", "false").lower() == "true"
+ALERT_LAG_SLO_SECONDS = float(os.getenv("ALERT_LAG_SLO_SECONDS", "30"))
+OVERLOAD_CPU_HIGH = float(os.getenv("OVERLOAD_CPU_HIGH", "0.9"))
+OVERLOAD_INTERVAL_SECONDS = float(os.getenv("OVERLOAD_INTERVAL_SECONDS", "2"))
+OVERLOAD_HOLD_SECONDS = float(os.getenv("OVERLOAD_HOLD_SECONDS", "10"))
+OVERLOAD_RECOVER_SECONDS = float(os.getenv("OVERLOAD_RECOVER_SECONDS", "30"))
+OVERLOAD_MAX_STRIDE = int(os.getenv("OVERLOAD_MAX_STRIDE", "4"))
+OVERLOAD_MIN_IMGSZ = int(os.getenv("OVERLOAD_MIN_IMGSZ", "320"))
+
+LIVE = "live"
+ARCHIVE = "archive"
+
+
+class Level:
+    """One step of degradation: every stride-th frame at imgsz, archive jobs paused or not."""
+
+    def __init__(self, stride: int, imgsz: int, pause_archive: bool = False):
+        self.stride = stride
+        self.imgsz = imgsz
+        self.pause_archive = pause_archive
+
+    def to_dict(self) -> dict:
+        return {"stride": self.stride, "imgsz": self.imgsz, "pauseArchive": self.pause_archive}
+
+    def __repr__(self):
+        return f"stride={self.stride} imgsz={self.imgsz}" + (" archive paused" if self.pause_archive else "")
+
+
+def build_levels(imgsz: int, max_stride: int = OVERLOAD_MAX_STRIDE, min_imgsz: int = OVERLOAD_MIN_IMGSZ) -> list:
+    """
+    The ladder the controller steps down: full quality, then doubling the frame
+    stride up to max_stride, then shrinking the image size by a quarter (in
+    multiples of 32) down to min_imgsz, then pausing archive jobs.
+    """
+    stride = 1
+    levels = [Level(stride, imgsz)]
+    while stride * 2 <= max_stride:
+        stride *= 2
+        levels.append(Level(stride, imgsz))
+    size = imgsz
+    while size > min_imgsz:
+        size = max(min_imgsz, int(size * 0.75) // 32 * 32)
+        levels.append(Level(stride, size))
+    levels.append(Level(stride, size, pause_archive=True))
+    return levels
+
+
+class CpuMeter:
+    """CPU used by this process and its finished workers, as a fraction of all cores."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._last = self._sample()
+
+    def _sample(self):
+        times = os.times()
+        return self.clock(), times.user + times.system + times.children_user + times.children_system
+
+    def read(self) -> float:
+        now, used = self._sample()
+        last_now, last_used = self._last
+        self._last = now, used
+        if now <= last_now:
+            return 0.0
+        return (used - last_used) / ((now - last_now) * (os.cpu_count() or 1))
+
+
+class JobLoad:
+    """
+    How far one job is behind real time.
+
+    The job's video is treated like a live feed: a frame cannot be processed
+    before its time, so a job that runs faster than real time has no lag and
+    builds up no lead to spend later.
+    """
+
+    def __init__(self, job_id: str, fps: float, priority: str, start_frame: int, now: float):
+        self.job_id = job_id
+        self.fps = fps or 30.0
+        self.priority = priority
+        self.start_frame = start_frame
+        self.origin = now            # wall time at which start_frame was "live"
+        self.covered = 0.0           # video seconds processed since start_frame
+        self.paused = False
+
+    def advance(self, frame_index: int, now: float) -> None:
+        self.covered = (frame_index + 1 - self.start_frame) / self.fps
+        if now - self.origin < self.covered:
+            self.origin = now - self.covered
+
+    def lag(self, now: float) -> float:
+        return max(0.0, now - self.origin - self.covered)
+
+
+class OverloadController:
+    """
+    Trade inference quality for keeping live jobs close to real time.
+
+    Every interval the controller looks at the lag of live jobs and at the
+    CPU used by the workers. It steps one level down the ladder (see
+    build_levels) when a live job is more than lag_slo seconds behind, or
+    already half that while the CPU is saturated and the lag is still growing.
+    After a change it waits hold_seconds before stepping further down, so the
+    new level has time to show an effect. It steps one level back up once
+    every live job has stayed within a quarter of lag_slo for
+    recover_seconds. Jobs read the current level for every frame, so changes
+    apply to running jobs at once.
+    """
+
+    def __init__(self, levels: list, lag_slo: float = ALERT_LAG_SLO_SECONDS, cpu_high: float = OVERLOAD_CPU_HIGH,
+                 hold_seconds: float = OVERLOAD_HOLD_SECONDS, recover_seconds: float = OVERLOAD_RECOVER_SECONDS,
+                 interval: float = OVERLOAD_INTERVAL_SECONDS, clock=time.monotonic, cpu=None):
+        self.levels = levels
+        self.lag_slo = lag_slo
+        self.cpu_high = cpu_high
+        self.hold_seconds = hold_seconds
+        self.recover_seconds = recover_seconds
+        self.interval = interval
+        self.clock = clock
+        self.cpu = cpu or CpuMeter(clock).read
+        self.index = 0
+        self.jobs = {}
+        self.changed_at = clock()
+        self.calm_since = None
+        self._last_lag = 0.0
+        self._last_cpu = 0.0
+        self._resume = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._publish()
+
+    @property
+    def level(self) -> Level:
+        return self.levels[self.index]
+
+    # Jobs ───────────────────────────────────────────────────
+    def register(self, job_id: str, fps: float, priority: str = LIVE, start_frame: int = 0) -> JobLoad:
+        load = JobLoad(job_id, fps, priority, start_frame, self.clock())
+        with self._resume:
+            self.jobs[job_id] = load
+        return load
+
+    def unregister(self, load: JobLoad) -> None:
+        with self._resume:
+            self.jobs.pop(load.job_id, None)
+        JOB_LAG_SECONDS.remove(job=load.job_id)
+
+    def throttle(self, load: JobLoad, frames):
+        """
+        Pass on the frames a job should run inference on at the current level.
+
+        Skips stride - 1 frames after each one it passes on, and blocks while
+        the job is an archive job and archive jobs are paused.
+        """
+        skipped = 0
+        for frame_index, frame in frames:
+            if skipped < self.level.stride - 1:
+                skipped += 1
+                FRAMES_SKIPPED.inc(reason="overload")
+                continue
+            skipped = 0
+            if load.priority == ARCHIVE:
+                self._wait_while_paused(load)
+            yield frame_index, frame
+            load.advance(frame_index, self.clock())
+
+    def _wait_while_paused(self, load: JobLoad) -> None:
+        with self._resume:
+            while self.level.pause_archive and not self._stop.is_set():
+                if not load.paused:
+                    load.paused = True
+                    logger.info(f"Pausing archive job {load.job_id}")
+                    self._publish()
+                self._resume.wait()
+            if load.paused:
+                load.paused = False
+                logger.info(f"Resuming archive job {load.job_id}")
+                self._publish()
+
+    # Control ────────────────────────────────────────────────
+    def evaluate(self) -> Level:
+        """Take one control step; returns the level in force afterwards."""
+        now = self.clock()
+        cpu = self.cpu()
+        with self._resume:
+            live = [job for job in self.jobs.values() if job.priority != ARCHIVE]
+            lags = {job.job_id: job.lag(now) for job in self.jobs.values()}
+        lag = max((lags[job.job_id] for job in live), default=0.0)
+        for job_id, job_lag in lags.items():
+            JOB_LAG_SECONDS.set(round(job_lag, 2), job=job_id)
+        WORKER_CPU_RATIO.set(round(cpu, 3))
+
+        growing = lag > self._last_lag
+        self._last_lag, self._last_cpu = lag, cpu
+        pressure = lag > self.lag_slo or (cpu >= self.cpu_high and lag > self.lag_slo / 2 and growing)
+        if lag <= self.lag_slo / 4:
+            self.calm_since = self.calm_since if self.calm_since is not None else now
+        else:
+            self.calm_since = None
+
+        if pressure and self.index < len(self.levels) - 1 and now - self.changed_at >= self.hold_seconds:
+            self._step(+1, f"live lag {lag:.1f} s (SLO {self.lag_slo:g} s), CPU {cpu:.0%}")
+        elif self.index > 0 and self.calm_since is not None and now - max(self.calm_since, self.changed_at) >= self.recover_seconds:
+            self._step(-1, f"live lag {lag:.1f} s for {self.recover_seconds:g} s, CPU {cpu:.0%}")
+        return self.level
+
+    def _step(self, direction: int, reason: str) -> None:
+        with self._resume:
+            old = self.level
+            self.index += direction
+            self.changed_at = self.clock()
+            self._resume.notify_all()
+        OVERLOAD_STEPS.inc(direction="down" if direction > 0 else "up")
+        logger.warning(f"Overload level {self.index - direction} -> {self.index} ({old!r} -> {self.level!r}): {reason}")
+        self._publish()
+
+    def _publish(self) -> None:
+        OVERLOAD_LEVEL.set(self.index)
+        OVERLOAD_STRIDE.set(self.level.stride)
+        OVERLOAD_IMGSZ.set(self.level.imgsz)
+        OVERLOAD_PAUSED_JOBS.set(sum(job.paused for job in self.jobs.values()))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.evaluate()
+            except Exception as e:
+                logger.error(f"Overload controller step failed: {e}")
+
+    def start(self) -> None:
+        logger.info(f"Overload control on: alert lag SLO {self.lag_slo:g} s, levels {self.levels}")
+        self._thread = threading.Thread(target=self._run, name="overload", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop controlling and let paused jobs run."""
+        self._stop.set()
+        with self._resume:
+            self._resume.notify_all()
+
+    def status(self) -> dict:
+        now = self.clock()
+        with self._resume:
+            jobs = [{
+                "jobId": job.job_id,
+                "priority": job.priority,
+                "lagSeconds": round(job.lag(now), 2),
+                "paused": job.paused,
+            } for job in self.jobs.values()]
+        return {
+            "level": self.index,
+            **self.level.to_dict(),
+            "levels": [level.to_dict() for level in self.levels],
+            "lagSloSeconds": self.lag_slo,
+            "cpu": round(self._last_cpu, 3),
+            "jobs": jobs,
+        }
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Leaf frames of threads that are blocked rather than working
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+# Thread ident -> (job_id, role); written by the job threads themselves
+_thread_tags = {}
+_running = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already being taken."""
+
+
+def tag_thread(job_id, role: str) -> None:
+    """
+    Label the calling thread so its samples are attributed to a job.
+
+    This is a single dict assignment, so job threads can call it
+    unconditionally; nothing else runs unless a profile is being taken.
+    """
+    _thread_tags[threading.get_ident()] = (job_id, role)
+
+
+def untag_thread() -> None:
+    _thread_tags.pop(threading.get_ident(), None)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _walk(frame) -> list:
+    """Code objects from the outermost call to frame."""
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return codes
+
+
+def _is_idle(code) -> bool:
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+def _thread_group(name: str) -> str:
+    """Drop per-thread numbering so e.g. every "Thread-12 (broadcast)" aggregates together."""
+    head, _, tail = name.partition(" (")
+    head = head.rstrip("0123456789").rstrip("-_ ")
+    return f"{head} ({tail}" if tail else head
+
+
+def sample(seconds: float, interval: float = 0.01, include_idle: bool = False) -> dict:
+    """
+    Sample the Python stacks of every thread for a while.
+
+    Sampling runs in the calling thread, which is left out of the samples.
+    Stacks are rooted at the thread's role when the thread is tagged
+    (see tag_thread), otherwise at its name.
+
+    Args:
+        seconds (float): How long to sample
+        interval (float): Time between samples
+        include_idle (bool): Keep threads that are blocked in wait/select/get
+
+    Returns:
+        dict: samples taken, a Counter of collapsed stacks, and per job
+        {job_id: {role: Counter}}
+
+    Raises:
+        ProfilerBusy: If another profile is running
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        jobs = {}
+        labels = {}
+        rounds = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                codes = _walk(frame)
+                if not codes or (not include_idle and _is_idle(codes[-1])):
+                    continue
+                job_id, role = _thread_tags.get(ident, (None, None))
+                root = role or _thread_group(names.get(ident, "unknown"))
+                # Code objects are stable, so labels are formatted once per function
+                path = ";".join(labels.get(c) or labels.setdefault(c, _frame_label(c)) for c in codes)
+                stack = f"{root};{path}"
+                stacks[stack] += 1
+                if job_id is not None:
+                    jobs.setdefault(job_id, {}).setdefault(role, Counter())[stack] += 1
+            frame = None
+            rounds += 1
+            time.sleep(interval)
+    finally:
+        _running.release()
+    return {"seconds": seconds, "intervalMs": interval * 1000, "samples": rounds, "stacks": stacks, "jobs": jobs}
+
+
+def collapse(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed format ("a;b;c count"), ready for flamegraph.pl or speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
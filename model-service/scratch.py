@@ -0,0 +1,193 @@
+import os
+import re
+import glob
+import uuid
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+
+from metrics import SCRATCH_BYTES, SCRATCH_FREE_BYTES, SCRATCH_QUOTA_BYTES, SCRATCH_WORKSPACES
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+SCRATCH_QUOTA_MB = float(os.getenv("SCRATCH_QUOTA_MB", "10240"))
+CLIP_DIR = os.getenv("CLIP_DIR")   # e.g. a tmpfs mount; clips go to the job workspace when unset
+
+# Workspace keys become directory names under the scratch roots
+KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def node_dir(root: str, node_id: str) -> str:
+    """A node's own directory under a scratch root that several cluster nodes share."""
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9_-]", "_", node_id))
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _tree_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass  # removed while walking
+    return total
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path) and not os.path.islink(path):
+        return _tree_size(path)
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _inside(path: str, root: str) -> bool:
+    """Whether path resolves to somewhere below root."""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return path != root and os.path.commonpath([path, root]) == root
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class Workspace:
+    """Scratch directories of one job: inference output under path, trimmed clips under clip_dir."""
+
+    def __init__(self, path: str, clip_dir: str):
+        self.path = path
+        self.clip_dir = clip_dir
+        self.holders = 0
+
+    def clip_path(self, prefix: str = "clip") -> str:
+        os.makedirs(self.clip_dir, exist_ok=True)
+        return os.path.join(self.clip_dir, f"{prefix}_{uuid.uuid4().hex}.mp4")
+
+    def subdir(self, *parts) -> str:
+        path = os.path.join(self.path, *parts)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def discard(path: str) -> None:
+        """Delete a clip as soon as it has been uploaded rather than when the job ends."""
+        _remove(path)
+
+
+class ScratchSpace:
+    """
+    Temporary files of running jobs, removed however the job ends.
+
+    Each job gets a workspace under root (and under clip_root for clips, when
+    clips live on a separate tmpfs). The job and each of its alert broadcasts
+    hold the workspace while they use it; it is deleted when the last holder
+    lets go, on success or failure. New jobs are refused while the space used
+    is at quota_bytes (0 = no quota).
+    """
+
+    def __init__(self, root: str, clip_root: str = None, quota_bytes: int = 0):
+        self.root = root
+        self.clip_root = clip_root
+        self.quota_bytes = quota_bytes
+        self._workspaces = {}
+        self._lock = threading.Lock()
+        SCRATCH_QUOTA_BYTES.set(quota_bytes)
+
+    @contextmanager
+    def workspace(self, key: str = None):
+        """
+        Hold the workspace of a job (key = job id; a new one-off workspace without a key).
+
+        Raises:
+            ValueError: If key is not a plain name (letters, digits, "_" and "-")
+        """
+        key = key or f"adhoc-{uuid.uuid4().hex}"
+        if not KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid scratch workspace key: {key!r}")
+        with self._lock:
+            workspace = self._workspaces.get(key)
+            if workspace is None:
+                clip_dir = os.path.join(self.clip_root, key) if self.clip_root else os.path.join(self.root, key, "clips")
+                workspace = self._workspaces[key] = Workspace(os.path.join(self.root, key), clip_dir)
+            workspace.holders += 1
+            SCRATCH_WORKSPACES.set(len(self._workspaces))
+        try:
+            yield workspace
+        finally:
+            with self._lock:
+                workspace.holders -= 1
+                done = workspace.holders == 0
+                if done:
+                    del self._workspaces[key]
+                    SCRATCH_WORKSPACES.set(len(self._workspaces))
+            if done:
+                self._discard(workspace.path)
+                self._discard(workspace.clip_dir)
+
+    def _discard(self, path: str) -> None:
+        """Remove a workspace directory, refusing anything that resolves outside the scratch roots."""
+        if not any(_inside(path, root) for root in filter(None, (self.root, self.clip_root))):
+            logger.error(f"Refusing to remove {path}: outside the scratch space")
+            return
+        _remove(path)
+
+    def usage(self) -> dict:
+        """Bytes used per area, also published as metrics."""
+        areas = {"workspace": self.root}
+        if self.clip_root:
+            areas["clips"] = self.clip_root
+        usage = {}
+        for area, path in areas.items():
+            usage[area] = _tree_size(path)
+            SCRATCH_BYTES.set(usage[area], area=area)
+            try:
+                SCRATCH_FREE_BYTES.set(shutil.disk_usage(path).free, area=area)
+            except OSError:
+                pass  # not created yet
+        return usage
+
+    def full(self) -> bool:
+        return bool(self.quota_bytes) and sum(self.usage().values()) >= self.quota_bytes
+
+    def sweep(self, patterns=()) -> int:
+        """
+        Delete everything left in the scratch areas, plus files matching patterns.
+
+        Only call this before any job starts: at that point every workspace is
+        a leftover from a run that crashed or was killed.
+
+        Returns:
+            int: Bytes freed
+        """
+        paths = []
+        for root in filter(None, (self.root, self.clip_root)):
+            if os.path.isdir(root):
+                paths.extend(os.path.join(root, name) for name in os.listdir(root))
+        for pattern in patterns:
+            paths.extend(glob.glob(pattern))
+
+        freed = 0
+        for path in paths:
+            freed += _size(path)
+            _remove(path)
+        if paths:
+            logger.info(f"Scratch sweep removed {len(paths)} leftover item(s), {freed / 1e6:.1f} MB")
+        self.usage()
+        return freed
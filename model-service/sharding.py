@@ -0,0 +1,213 @@
+import os
+import logging
+import subprocess
+import multiprocessing
+import cv2
+import numpy as np
+from detection_index import DetectionIndex
+from frame_transport import read_frames, track_frames
+
+logger = logging.getLogger("model-service")
+
+# ─────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────
+SHARD_OVERLAP_SECONDS = float(os.getenv("SHARD_OVERLAP_SECONDS", "2"))  # tracker warm-up before each shard
+
+_worker_model = None
+
+
+class Shard:
+    """A range of frames [start, end) owned by one worker, decoded from warmup_start; end None reads to EOF."""
+
+    def __init__(self, shard_id: int, start: int, end: int, warmup_start: int):
+        self.shard_id = shard_id
+        self.start = start
+        self.end = end
+        self.warmup_start = warmup_start
+
+    def __repr__(self):
+        return f"Shard({self.shard_id}, start={self.start}, end={self.end}, warmup_start={self.warmup_start})"
+
+
+# ─────────────────────────────────────────────────────────────
+# Planning
+# ─────────────────────────────────────────────────────────────
+def probe_keyframes(video_path: str, fps: float) -> list:
+    """Return the frame indices of the video's keyframes, or [] if ffprobe is unavailable."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-skip_frame", "nokey",
+        "-show_entries", "frame=pts_time",
+        "-of", "csv=p=0",
+        video_path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not probe keyframes of {video_path}: {e}")
+        return []
+    times = [float(line.strip(",")) for line in out.split() if line.strip(",")]
+    return sorted({int(round(t * fps)) for t in times})
+
+
+def _snap_down(frame: int, keyframes: list) -> int:
+    """Closest keyframe at or before frame (frame itself if no keyframes are known)."""
+    if not keyframes:
+        return frame
+    i = int(np.searchsorted(keyframes, frame, side="right")) - 1
+    return keyframes[i] if i >= 0 else 0
+
+
+def plan_shards(frame_count: int, shard_count: int, overlap_frames: int, keyframes=None, start_frame: int = 0) -> list:
+    """
+    Split a video into contiguous shards.
+
+    Shard boundaries are snapped to keyframes so every worker seeks to a frame
+    the decoder can start from directly. Each shard also decodes overlap_frames
+    before its start so the tracker is warmed up by the time it reaches frames
+    it owns; detections in the warm-up are dropped when merging.
+
+    The frame count a container reports is only an estimate, so the last
+    shard is open-ended and reads until the decoder runs out of frames.
+
+    Args:
+        frame_count (int): Estimated number of frames in the video
+        shard_count (int): Desired number of shards
+        overlap_frames (int): Warm-up frames decoded before each shard start
+        keyframes (list): Sorted keyframe indices, if known
+        start_frame (int): First frame to cover, e.g. when resuming a job
+
+    Returns:
+        list: Shards covering start_frame to the end of the video without gaps or overlap in ownership
+    """
+    keyframes = sorted(keyframes or [])
+    remaining = max(0, frame_count - start_frame)
+    shard_count = max(1, min(shard_count, remaining))
+    boundaries = [start_frame]
+    for i in range(1, shard_count):
+        boundary = _snap_down(start_frame + round(i * remaining / shard_count), keyframes)
+        if boundary > boundaries[-1]:
+            boundaries.append(boundary)
+    boundaries.append(None)
+
+    shards = []
+    for i, (start, end) in enumerate(zip(boundaries, boundaries[1:])):
+        warmup_start = _snap_down(max(0, start - overlap_frames), keyframes)
+        shards.append(Shard(i, start, end, warmup_start))
+    return shards
+
+
+# ─────────────────────────────────────────────────────────────
+# Workers
+# ─────────────────────────────────────────────────────────────
+def _init_worker(weights: str, torch_threads: int) -> None:
+    """Load one model per worker process."""
+    global _worker_model
+    import torch
+    from ultralytics import YOLO
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = YOLO(weights)
+    if weights.endswith(".pt"):
+        _worker_model = _worker_model.to("cpu")
+
+
+def process_shard(video_path: str, shard: Shard, conf: float, model=None, imgsz: int = 640) -> DetectionIndex:
+    """
+    Run detection + tracking over one shard and keep only the frames it owns.
+
+    Args:
+        video_path (str): Path to the video file
+        shard (Shard): Frame range to process
+        conf (float): Confidence passed to the model
+        model: Model to use; defaults to the worker's model
+        imgsz (int): Inference image size
+
+    Returns:
+        DetectionIndex: In-memory detections for frames in [shard.start, shard.end)
+    """
+    model = model or _worker_model
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if shard.warmup_start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, shard.warmup_start)
+
+    frames, classes, confs, boxes = [], [], [], []
+    end = shard.start   # also when the video ends before the shard starts
+    try:
+        for frame_index, results in track_frames(model, read_frames(cap, shard.warmup_start, shard.end), conf, imgsz):
+            end = max(end, frame_index + 1)
+            if frame_index >= shard.start and len(results.boxes):
+                n = len(results.boxes)
+                frames.append(np.full(n, frame_index, dtype=np.int32))
+                classes.append(results.boxes.cls.cpu().numpy().astype(np.int16))
+                confs.append(results.boxes.conf.cpu().numpy().astype(np.float32))
+                boxes.append(results.boxes.xyxy.cpu().numpy().astype(np.float32))
+    finally:
+        cap.release()
+
+    meta = {"fps": fps, "min_conf": conf, "shard": shard.shard_id, "start": shard.start, "end": end}
+    return _concat(frames, classes, confs, boxes, meta)
+
+
+def _process_shard_task(args):
+    return process_shard(*args)
+
+
+def _concat(frames, classes, confs, boxes, meta) -> DetectionIndex:
+    if not frames:
+        return DetectionIndex(
+            np.empty(0, np.int32), np.empty(0, np.int16),
+            np.empty(0, np.float32), np.empty((0, 4), np.float32), meta,
+        )
+    return DetectionIndex(
+        np.concatenate(frames), np.concatenate(classes),
+        np.concatenate(confs), np.concatenate(boxes).reshape(-1, 4), meta,
+    )
+
+
+def iter_sharded_detections(video_path: str, weights: str, shard_count: int, conf: float,
+                            overlap_seconds: float = SHARD_OVERLAP_SECONDS, start_frame: int = 0,
+                            imgsz: int = 640):
+    """
+    Process a video in parallel time shards and yield merged detections in order.
+
+    Shards are yielded in video order as soon as they and every shard before
+    them are done, so callers can raise alerts for the start of the video while
+    later shards are still running.
+
+    Args:
+        video_path (str): Path to the video file
+        weights (str): Model weights each worker loads
+        shard_count (int): Number of shards (and worker processes)
+        conf (float): Confidence passed to the model
+        overlap_seconds (float): Tracker warm-up decoded before each shard
+        start_frame (int): First frame to process, e.g. when resuming a job
+        imgsz (int): Inference image size
+
+    Yields:
+        DetectionIndex: Detections of one shard's owned frames
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video file {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    keyframes = probe_keyframes(video_path, fps)
+    shards = plan_shards(frame_count, shard_count, int(round(overlap_seconds * fps)), keyframes, start_frame)
+    workers = len(shards)
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    logger.info(f"Processing {video_path} in {workers} shards with {torch_threads} threads each")
+
+    # spawn: forking a process that already runs torch threads can deadlock
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(weights, torch_threads)) as pool:
+        tasks = [(video_path, shard, conf, None, imgsz) for shard in shards]
+        for index in pool.imap(_process_shard_task, tasks):
+            yield index
@@ -9,6 +9,10 @@ from fastapi.testclient import TestClient
 # Add the parent directory to sys.path so we can import our app
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+def pytest_configure(config):
+    # tests/pytest.ini is not picked up when pytest runs from model-service/
+    config.addinivalue_line("markers", "slow: marks tests as slow (deselect with '-m \"not slow\"')")
+
 @pytest.fixture
 def client():
     """Create a test client for the FastAPI app."""
@@ -16,6 +16,7 @@ class TestAPIEndpoints:
         assert response_data["status"] == "healthy"
         assert "model_loaded" in response_data
         assert isinstance(response_data["model_loaded"], bool)
+        assert "inference_profile" in response_data
     
     @patch('app.VIDEO_DIR', '/tmp/test_videos')
     @patch('os.listdir')
@@ -100,4 +101,83 @@ class TestAPIEndpoints:
         }
         
         response = client.post("/run", json=request_data)
-        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY  
\ No newline at end of file
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_rethreshold_success(self, client, tmp_path):
+        """Test re-extracting alerts from a saved detection index."""
+        from detection_index import DetectionIndexWriter
+
+        writer = DetectionIndexWriter(str(tmp_path / "test123"), fps=10.0)
+        writer.add(10, 0, 0.9, [0, 0, 1, 1])
+        writer.add(50, 0, 0.6, [0, 0, 1, 1])
+        writer.close(frame_count=100)
+
+        with patch('app.INDEX_DIR', str(tmp_path)):
+            response = client.post("/rethreshold", json={"videoId": "test123", "threshold": 0.5})
+        assert response.status_code == status.HTTP_200_OK
+        response_data = response.json()
+        assert response_data["video"] == "test123"
+        assert [e["frame"] for e in response_data["events"]] == [10]
+        assert "elapsedMs" in response_data
+
+    def test_rethreshold_index_not_found(self, client, tmp_path):
+        """Test re-thresholding a video that has no detection index."""
+        with patch('app.INDEX_DIR', str(tmp_path)):
+            response = client.post("/rethreshold", json={"videoId": "missing"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert "Detection index not found" in response.json()["detail"]
+
+    def test_rethreshold_below_index_minimum(self, client, tmp_path):
+        """Test re-thresholding below the confidence the index was recorded at."""
+        from detection_index import DetectionIndexWriter
+
+        DetectionIndexWriter(str(tmp_path / "test123"), fps=10.0, min_conf=0.25).close(frame_count=0)
+
+        with patch('app.INDEX_DIR', str(tmp_path)):
+            response = client.post("/rethreshold", json={"videoId": "test123", "threshold": 0.1})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_metrics_endpoint(self, client):
+        """Test the Prometheus scrape endpoint."""
+        from metrics import timed
+
+        with timed("backend_post"):
+            pass
+
+        response = client.get("/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE crashalert_stage_seconds histogram" in response.text
+        assert 'crashalert_stage_seconds_count{stage="backend_post"}' in response.text
+
+    def test_profile_requires_internal_secret(self, client):
+        """Test that the profiler endpoint rejects requests without the secret."""
+        response = client.post("/admin/profile", params={"seconds": 0.01})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        response = client.post("/admin/profile", params={"seconds": 0.01}, headers={"X-INTERNAL-SECRET": "wrong"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_profile_returns_collapsed_stacks(self, client):
+        """Test profiling with the secret, as collapsed stacks and per job."""
+        import app
+
+        headers = {"X-INTERNAL-SECRET": app.SECRET}
+        response = client.post("/admin/profile", params={"seconds": 0.05, "includeIdle": True}, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
+
+        response = client.post("/admin/profile", params={"seconds": 0.05, "byJob": True}, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert {"samples", "collapsed", "jobs"} <= set(response.json())
+
+    @patch('app.sample')
+    def test_profile_already_running(self, mock_sample, client):
+        """Test that concurrent profiles are refused."""
+        import app
+        from profiler import ProfilerBusy
+
+        mock_sample.side_effect = ProfilerBusy()
+        response = client.post("/admin/profile", headers={"X-INTERNAL-SECRET": app.SECRET})
+        assert response.status_code == status.HTTP_409_CONFLICT
@@ -0,0 +1,154 @@
+import os
+import json
+from unittest.mock import patch, Mock
+import pytest
+
+
+def _fake_measure(model, frames, imgsz, threshold, class_id):
+    """Smaller images and fewer threads are faster here; 416 px and below miss accidents."""
+    import torch
+
+    fps = 1000 / imgsz + {4: 2.0, 2: 1.0, 1: 0.0}[torch.get_num_threads()]
+    positives = {10, 20} if imgsz >= 512 else {10} if imgsz == 416 else set()
+    return fps, positives
+
+
+class TestRecall:
+    """Test suite for recall against reference frames."""
+
+    def test_nearby_frames_count_as_recalled(self):
+        """A detection a few frames off still recalls the reference frame."""
+        from autotune import recall
+
+        assert recall({12, 50}, {10, 30}, tolerance=3) == 0.5
+        assert recall({12, 50}, {10, 30}, tolerance=1) == 0.0
+        assert recall(set(), set()) == 1.0
+
+
+class TestTune:
+    """Test suite for choosing the fastest setting that keeps recall."""
+
+    @pytest.fixture(autouse=True)
+    def _restore_threads(self):
+        import torch
+
+        threads = torch.get_num_threads()
+        yield
+        torch.set_num_threads(threads)
+
+    def _tune(self, tmp_path, **kwargs):
+        from autotune import tune
+
+        weights = tmp_path / "best.pt"
+        weights.write_bytes(b"weights")
+        with patch('autotune.os.cpu_count', return_value=4), \
+             patch('autotune.read_calibration_frames', return_value=[None] * 30), \
+             patch('autotune.measure', side_effect=_fake_measure), \
+             patch('autotune.YOLO', return_value=Mock()):
+            return tune(str(weights), str(tmp_path / "clip.mp4"), str(tmp_path / "profiles"),
+                        min_recall=0.9, threads=[4, 2, 1], backends=["pytorch"], **kwargs)
+
+    def test_picks_fastest_setting_meeting_recall(self, tmp_path):
+        """416 px is faster but misses accidents, so 512 px wins."""
+        profile = self._tune(tmp_path)
+
+        assert profile["imgsz"] == 512
+        assert profile["torchThreads"] == 4
+        assert profile["backend"] == "pytorch"
+        assert profile["recall"] == 1.0
+        assert profile["fps"] > profile["defaultFps"]
+        assert {c["imgsz"] for c in profile["candidates"]} == {640, 512, 416, 320}
+
+    def test_labels_replace_default_detections_as_reference(self, tmp_path):
+        """With labels, recall is measured against them instead of the default setting."""
+        (tmp_path / "clip.json").write_text(json.dumps({"accidentFrames": [10]}))
+
+        profile = self._tune(tmp_path)
+        assert profile["labelled"] is True
+        assert profile["imgsz"] == 416
+
+    def test_clip_without_accidents_keeps_default_image_size(self, tmp_path):
+        """Recall cannot be checked without accidents, so only threads and backend are tuned."""
+        from autotune import tune
+
+        weights = tmp_path / "best.pt"
+        weights.write_bytes(b"weights")
+        with patch('autotune.read_calibration_frames', return_value=[None] * 30), \
+             patch('autotune.measure', return_value=(10.0, set())), \
+             patch('autotune.YOLO', return_value=Mock()):
+            profile = tune(str(weights), str(tmp_path / "clip.mp4"), str(tmp_path),
+                           threads=[1], backends=["pytorch"])
+        assert profile["imgsz"] == 640
+        assert {c["imgsz"] for c in profile["candidates"]} == {640}
+
+    def test_thread_count_is_restored_when_tuning_fails(self, tmp_path):
+        """A failed sweep does not leave the service on the last candidate's thread count."""
+        import torch
+
+        from autotune import tune
+
+        torch.set_num_threads(3)
+        with patch('autotune.os.cpu_count', return_value=4), \
+             patch('autotune.read_calibration_frames', return_value=[None] * 30), \
+             patch('autotune.measure', side_effect=[(10.0, {10}), RuntimeError("out of memory")]), \
+             patch('autotune.YOLO', return_value=Mock()):
+            with pytest.raises(RuntimeError):
+                tune(str(tmp_path / "best.pt"), str(tmp_path / "clip.mp4"), str(tmp_path / "profiles"),
+                     threads=[4, 2], backends=["pytorch"])
+        assert torch.get_num_threads() == 3
+
+
+class TestProfiles:
+    """Test suite for saving and reusing per-host profiles."""
+
+    def _profile(self, weights, model_path):
+        from autotune import _weights_signature
+
+        return {"weights": _weights_signature(weights), "cpuCount": os.cpu_count() or 1,
+                "modelPath": model_path, "imgsz": 512, "torchThreads": 1}
+
+    def test_saved_profile_is_reused(self, tmp_path):
+        """A valid profile for these weights is loaded without tuning."""
+        from autotune import load_or_tune, profile_path, save_profile
+
+        weights = tmp_path / "best.pt"
+        weights.write_bytes(b"weights")
+        clip = tmp_path / "clip.mp4"
+        clip.write_bytes(b"clip")
+        save_profile(self._profile(str(weights), str(weights)), profile_path(str(tmp_path)))
+
+        with patch('autotune.tune') as mock_tune:
+            profile = load_or_tune(str(weights), str(clip), str(tmp_path))
+        mock_tune.assert_not_called()
+        assert profile["imgsz"] == 512
+
+    def test_changed_weights_are_tuned_again(self, tmp_path):
+        """A profile tuned for other weights is replaced."""
+        from autotune import load_or_tune, profile_path, save_profile
+
+        weights = tmp_path / "best.pt"
+        weights.write_bytes(b"weights")
+        clip = tmp_path / "clip.mp4"
+        clip.write_bytes(b"clip")
+        save_profile(self._profile(str(weights), str(weights)), profile_path(str(tmp_path)))
+        weights.write_bytes(b"new weights")
+
+        fresh = self._profile(str(weights), str(weights))
+        with patch('autotune.tune', return_value=fresh) as mock_tune:
+            profile = load_or_tune(str(weights), str(clip), str(tmp_path))
+        mock_tune.assert_called_once()
+        assert profile == fresh
+        assert json.loads(open(profile_path(str(tmp_path))).read()) == fresh
+
+    def test_missing_clip_or_failure_falls_back_to_defaults(self, tmp_path):
+        """Autotune never stops the service from starting."""
+        from autotune import load_or_tune
+
+        weights = tmp_path / "best.pt"
+        weights.write_bytes(b"weights")
+        assert load_or_tune(str(weights), str(tmp_path / "missing.mp4"), str(tmp_path)) is None
+
+        clip = tmp_path / "clip.mp4"
+        clip.write_bytes(b"clip")
+        with patch('autotune.tune', side_effect=IOError("Could not open calibration clip")):
+            assert load_or_tune(str(weights), str(clip), str(tmp_path)) is None
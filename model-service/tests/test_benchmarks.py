@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import subprocess
+import cv2
+import pytest
+
+
+class TestBaselineComparison:
+    """Test suite for comparing benchmark results with a stored baseline."""
+
+    def _case(self, name, fps, rss):
+        return {"name": name, "fps": fps, "peak_rss_mb": rss}
+
+    def test_flags_fps_and_memory_regressions(self):
+        """Cases slower or larger than the tolerance allows are reported."""
+        from benchmarks.inference import compare_to_baseline
+
+        baseline = {"cases": [self._case("a", 100.0, 500.0), self._case("b", 100.0, 500.0)]}
+        cases = [self._case("a", 80.0, 500.0), self._case("b", 95.0, 600.0)]
+
+        regressions = compare_to_baseline(cases, baseline, tolerance=0.1)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("a:")
+        assert "peak RSS" in regressions[1]
+
+    def test_ignores_cases_missing_from_baseline(self):
+        """A new case does not fail the comparison."""
+        from benchmarks.inference import compare_to_baseline
+
+        assert compare_to_baseline([self._case("new", 1.0, 9999.0)], {"cases": []}, tolerance=0.1) == []
+
+
+@pytest.mark.slow
+class TestInferenceBenchmark:
+    """End-to-end run of the benchmark CLI with the stub model."""
+
+    def _frames(self, path):
+        cap = cv2.VideoCapture(path)
+        frames = []
+        ok, frame = cap.read()
+        while ok:
+            frames.append(frame)
+            ok, frame = cap.read()
+        cap.release()
+        return frames
+
+    def test_synthetic_video_is_reproducible(self, tmp_path):
+        """The generator writes the requested frames and size, and the same frames every time."""
+        from benchmarks.fixtures import make_synthetic_video
+
+        args = dict(seconds=1, width=160, height=96, fps=10)
+        first = self._frames(make_synthetic_video(str(tmp_path / "first.mp4"), **args))
+        second = self._frames(make_synthetic_video(str(tmp_path / "second.mp4"), **args))
+
+        assert len(first) == 10
+        assert first[0].shape == (96, 160, 3)
+        assert all((a == b).all() for a, b in zip(first, second)) and len(second) == len(first)
+
+    def test_stub_run_writes_results_and_checks_baseline(self, tmp_path, capsys):
+        """The CLI reports FPS, stages and memory, and fails against a faster baseline."""
+        from benchmarks.inference import main, FRAME_STAGES
+
+        output = tmp_path / "bench.json"
+        args = ["--models", "stub", "--seconds", "1", "--resolution", "160x96", "--fps", "10",
+                "--warmup", "0", "--work-dir", str(tmp_path)]
+        assert main(args + ["--output", str(output)]) == 0
+        assert "No --baseline given" in capsys.readouterr().out
+
+        report = json.loads(output.read_text())
+        case = report["cases"][0]
+        assert case["name"] == "stub/synthetic-160x96-1s"
+        assert case["frames"] == 10
+        assert case["fps"] > 0
+        assert set(case["stages"]) == set(FRAME_STAGES)
+        assert case["peak_rss_mb"] > 0
+
+        case["fps"] *= 100
+        output.write_text(json.dumps(report))
+        assert main(args + ["--baseline", str(output)]) == 1
+
+    def test_service_imports_without_its_environment(self, tmp_path):
+        """The benchmarks run app in-process on a machine that has none of the service's settings."""
+        service_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {k: v for k, v in os.environ.items()
+               if k not in ("INTERNAL_SECRET", "VIDEO_DIR", "JOBS_DIR", "SCRATCH_DIR", "YOLO_WEIGHTS")}
+        script = "from benchmarks.fixtures import import_service; print(import_service(%r).VIDEO_DIR)" % str(tmp_path)
+
+        result = subprocess.run([sys.executable, "-c", script], cwd=service_dir, env=env,
+                                capture_output=True, text=True, timeout=300)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().endswith(str(tmp_path / "service"))
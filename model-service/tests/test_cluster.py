@@ -0,0 +1,302 @@
+import json
+from unittest.mock import patch, Mock
+import pytest
+from fastapi import status
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _coordinator(fail=(), reject=()):
+    """A Coordinator whose dispatches are recorded instead of sent."""
+    from cluster import Coordinator, JobRejected
+
+    dispatched = []
+
+    def dispatch(node, job):
+        if node.node_id in fail:
+            raise ConnectionError("node down")
+        if job.request["videoId"] in reject:
+            raise JobRejected(404, "Video file not found")
+        dispatched.append((node.node_id, job.body()))
+
+    clock = FakeClock()
+    return Coordinator(dispatch=dispatch, node_timeout=15, clock=clock), dispatched, clock
+
+
+def _request(camera, video="v1"):
+    return {"videoId": video, "cameraId": camera, "location": "x"}
+
+
+def _snapshot(body, frame_offset):
+    """What a node reports for a running job in its heartbeat (Job.to_dict)."""
+    return {"jobId": body["jobId"], "kind": "run", "videoPath": f"/videos/{body['videoId']}.mp4",
+            "metadata": {"cameraId": body["cameraId"], "location": body["location"]},
+            "options": {}, "status": "running", "frameOffset": frame_offset,
+            "lastAlertTime": 2.0, "events": []}
+
+
+class TestPlacement:
+    """Test suite for placing jobs on nodes."""
+
+    def test_camera_affinity_and_spare_capacity(self):
+        """A camera's jobs stay on its node while it has a free slot, otherwise go to the emptiest node."""
+        coordinator, dispatched, _ = _coordinator()
+        coordinator.heartbeat("a", "http://a", 2)
+        coordinator.heartbeat("b", "http://b", 2)
+
+        coordinator.submit("run", _request("cam1"))
+        coordinator.submit("run", _request("cam2"))
+        coordinator.submit("run", _request("cam1"))
+        coordinator.submit("run", _request("cam1"))
+
+        assert [node for node, _ in dispatched] == ["b", "a", "b", "a"]
+        assert coordinator.affinity["cam1"] == "a"
+
+    def test_jobs_wait_for_a_free_slot(self):
+        """With every slot taken jobs are queued, and placed when a node reports one finished."""
+        coordinator, dispatched, _ = _coordinator()
+        coordinator.heartbeat("a", "http://a", 1)
+        first = coordinator.submit("run", _request("cam1"))
+        second = coordinator.submit("run", _request("cam2"))
+
+        assert second.node_id is None
+        assert [job.job_id for job in coordinator.queue] == [second.job_id]
+
+        coordinator.heartbeat("a", "http://a", 1, finished=[first.job_id])
+        assert second.node_id == "a"
+        assert coordinator.completed == 1
+
+    def test_failed_dispatch_fails_over(self):
+        """A node that cannot take a job is marked dead and the job goes to the next node."""
+        coordinator, dispatched, _ = _coordinator(fail={"a"})
+        coordinator.heartbeat("a", "http://a", 4)
+        coordinator.heartbeat("b", "http://b", 1)
+
+        job = coordinator.submit("run", _request("cam1"))
+        assert job.node_id == "b"
+        assert coordinator.nodes["a"].alive is False
+
+    def test_rejected_job_is_not_retried(self):
+        """A 4xx from the node is the caller's error and is raised, not failed over."""
+        from cluster import JobRejected
+
+        coordinator, dispatched, _ = _coordinator(reject={"missing"})
+        coordinator.heartbeat("a", "http://a", 1)
+        coordinator.heartbeat("b", "http://b", 1)
+
+        with pytest.raises(JobRejected):
+            coordinator.submit("run", _request("cam1", video="missing"))
+        assert coordinator.jobs == {}
+        assert all(node.alive for node in coordinator.nodes.values())
+
+
+class TestFailover:
+    """Test suite for moving jobs off dead nodes."""
+
+    def test_dead_node_jobs_resume_elsewhere_from_last_heartbeat(self):
+        """Jobs of a node that stops sending heartbeats restart on another node from their checkpoint."""
+        coordinator, dispatched, clock = _coordinator()
+        coordinator.heartbeat("a", "http://a", 1)
+        job = coordinator.submit("run", _request("cam1"))
+        coordinator.heartbeat("b", "http://b", 1)
+
+        clock.now += 5
+        coordinator.heartbeat("a", "http://a", 1, jobs=[_snapshot(dispatched[0][1], 600)])
+        coordinator.heartbeat("b", "http://b", 1)
+        clock.now += 16
+        coordinator.heartbeat("b", "http://b", 1)
+        coordinator.check_nodes()
+
+        assert job.node_id == "b"
+        assert coordinator.reassigned == 1
+        node, body = dispatched[-1]
+        assert body["jobId"] == job.job_id
+        assert body["checkpoint"] == {"frameOffset": 600, "lastAlertTime": 2.0, "events": []}
+        assert coordinator.affinity["cam1"] == "b"
+
+    def test_job_missing_from_heartbeat_is_queued_again(self):
+        """A job the node neither runs nor reports finished (e.g. it restarted) is lost and placed again."""
+        coordinator, dispatched, clock = _coordinator()
+        coordinator.heartbeat("a", "http://a", 1)
+        job = coordinator.submit("run", _request("cam1"))
+
+        coordinator.heartbeat("a", "http://a", 1)   # just dispatched: not lost yet
+        assert len(dispatched) == 1
+        clock.now += 11
+        coordinator.heartbeat("a", "http://a", 1)
+
+        assert len(dispatched) == 2
+        assert job.node_id == "a"
+
+    def test_restarted_coordinator_adopts_running_jobs(self):
+        """Jobs reported by a node but unknown to the coordinator are tracked, not started again."""
+        coordinator, dispatched, _ = _coordinator()
+        body = {"jobId": "j1", **_request("cam1")}
+
+        coordinator.heartbeat("a", "http://a", 1, jobs=[_snapshot(body, 300)])
+
+        assert dispatched == []
+        assert coordinator.jobs["j1"].node_id == "a"
+        assert coordinator.jobs["j1"].request["videoId"] == "v1"
+        assert coordinator.affinity["cam1"] == "a"
+
+
+class TestNodeAgent:
+    """Test suite for the node's heartbeats."""
+
+    @patch('cluster.requests.post')
+    def test_finished_jobs_are_kept_until_delivered(self, mock_post):
+        """Finished jobs are re-sent with the next heartbeat if the coordinator was unreachable."""
+        import requests
+        from cluster import NodeAgent
+
+        agent = NodeAgent("http://coord/", "a", "http://a", 2, lambda: [{"jobId": "j2"}], "secret")
+        agent.job_finished("j1")
+
+        mock_post.side_effect = requests.ConnectionError("down")
+        assert agent.beat() is False
+        mock_post.side_effect = None
+        mock_post.return_value = Mock(status_code=200)
+        assert agent.beat() is True
+        assert agent.beat() is True
+
+        bodies = [c[1]['json'] for c in mock_post.call_args_list]
+        assert [b["finished"] for b in bodies] == [["j1"], ["j1"], []]
+        assert bodies[0]["jobs"] == [{"jobId": "j2"}]
+        assert mock_post.call_args[0][0] == "http://coord/nodes/a/heartbeat"
+        assert mock_post.call_args[1]['headers'] == {"X-INTERNAL-SECRET": "secret"}
+
+
+class TestCoordinatorAPI:
+    """Test suite for the coordinator's HTTP API."""
+
+    @pytest.fixture
+    def coordinator_client(self):
+        from fastapi.testclient import TestClient
+        import coordinator
+
+        with patch('coordinator.coordinator', _coordinator(reject={"missing"})[0]):
+            yield TestClient(coordinator.app), coordinator
+
+    def test_heartbeat_requires_internal_secret(self, coordinator_client):
+        client, _ = coordinator_client
+        response = client.post("/nodes/a/heartbeat", json={"url": "http://a", "maxJobs": 1, "interval": 5})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_run_is_placed_or_queued(self, coordinator_client):
+        """/run answers like a node, with the node the job went to."""
+        client, module = coordinator_client
+        headers = {"X-INTERNAL-SECRET": module.SECRET}
+        request_data = {"videoId": "v1", "cameraId": "cam_001", "location": "Main Street Intersection"}
+
+        response = client.post("/run", json=request_data)
+        assert response.json()["status"] == "queued"
+
+        response = client.post("/nodes/a/heartbeat", json={"url": "http://a", "maxJobs": 1, "interval": 5},
+                               headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        nodes = client.get("/nodes").json()
+        assert nodes["nodes"][0]["jobs"] and nodes["queued"] == []
+
+    def test_rejected_run_keeps_the_node_status(self, coordinator_client):
+        client, module = coordinator_client
+        module.coordinator.heartbeat("a", "http://a", 1)
+
+        response = client.post("/run-bbox", json={"videoId": "missing", "cameraId": "c", "location": "x"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()["detail"] == "Video file not found"
+
+
+class TestNodeEndpoints:
+    """Test suite for jobs the coordinator starts on a node."""
+
+    @patch('app.threading')
+    @patch('app.run_job')
+    def test_run_resumes_from_checkpoint(self, mock_run_job, mock_threading, client, tmp_path):
+        """A failed-over job keeps its id and progress, and its unacknowledged alerts are sent again."""
+        import app
+        from jobs import JobStore
+
+        (tmp_path / "v1.mp4").write_bytes(b"video")
+        checkpoint = {"frameOffset": 600, "lastAlertTime": 12.0, "events": [
+            {"frame": 360, "timestamp": "00:12", "confidence": 0.9, "status": "pending"},
+        ]}
+        with patch('app.VIDEO_DIR', str(tmp_path)), patch('app.job_store', JobStore(str(tmp_path / "jobs"))):
+            response = client.post("/run", json={"videoId": "v1", "cameraId": "c", "location": "x",
+                                                 "jobId": "j1", "checkpoint": checkpoint},
+                                   headers={"X-INTERNAL-SECRET": app.SECRET})
+
+        assert response.json()["jobId"] == "j1"
+        job = mock_run_job.call_args[0][0]
+        assert (job.frame_offset, job.last_alert_time) == (600, 12.0)
+        assert mock_threading.Thread.call_args[1]['target'] == app.broadcast
+
+    @patch('app.run_job')
+    def test_coordinator_fields_require_the_secret(self, mock_run_job, client, tmp_path):
+        """Only the coordinator may choose a job id or hand over a checkpoint with alerts to re-send."""
+        import app
+
+        (tmp_path / "v1.mp4").write_bytes(b"video")
+        request_data = {"videoId": "v1", "cameraId": "c", "location": "x"}
+        with patch('app.VIDEO_DIR', str(tmp_path)):
+            for extra in ({"jobId": "j1"}, {"checkpoint": {"events": []}}):
+                for endpoint in ("/run", "/run-bbox"):
+                    response = client.post(endpoint, json={**request_data, **extra},
+                                           headers={"X-INTERNAL-SECRET": "wrong"})
+                    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+            response = client.post("/run", json={**request_data, "jobId": "../../etc/x"},
+                                   headers={"X-INTERNAL-SECRET": app.SECRET})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        mock_run_job.assert_not_called()
+
+    @patch('cluster.requests.post')
+    def test_dispatch_sends_the_secret(self, mock_post):
+        from cluster import ClusterJob, Node, post_job
+
+        mock_post.return_value = Mock(status_code=200, json=lambda: {"status": "processing_started"})
+        post_job(Node("a", "http://a", 1, 5, 0), ClusterJob("j1", "run", _request("cam1")), secret="secret")
+        assert mock_post.call_args[0][0] == "http://a/run"
+        assert mock_post.call_args[1]['headers'] == {"X-INTERNAL-SECRET": "secret"}
+
+    @patch('app.threading')
+    def test_cluster_node_leaves_running_jobs_to_coordinator(self, mock_threading, tmp_path):
+        """On a node, running jobs are dropped at startup; completed jobs still re-send their alerts."""
+        import app
+        from jobs import JobStore
+
+        store = JobStore(str(tmp_path))
+        store.create("run", "/fake/a.mp4", {"cameraId": "cam_001"})
+        done = store.create("run", "/fake/b.mp4", {"cameraId": "cam_002"})
+        store.record_event(done, 10, "00:01", 0.9, 1.0)
+        store.finish(done)
+
+        with patch('app.job_store', store):
+            app.resume_interrupted_jobs(resume_running=False)
+
+        targets = [c[1]['target'] for c in mock_threading.Thread.call_args_list]
+        assert targets == [app.broadcast]
+        assert [job.job_id for job in store.load_all()] == [done.job_id]
+
+
+@pytest.mark.slow
+class TestLocalCluster:
+    """End-to-end run of a coordinator and two nodes on local ports."""
+
+    def test_jobs_finish_when_a_node_is_killed(self, tmp_path):
+        """Every job completes on the surviving node."""
+        from benchmarks.cluster_scaling import main
+
+        output = tmp_path / "cluster.json"
+        main(["--nodes", "2", "--jobs", "4", "--slots", "1", "--seconds", "2", "--videos", "1",
+              "--kill-after", "0.5", "--timeout", "120", "--output", str(output)])
+
+        result = json.loads(output.read_text())[0]
+        assert result["drained"] is True
+        assert result["completed"] == 4
+        assert result["failed_requests"] == 0
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+
+class TestCooldownGate:
+    """Test suite for the video-time cooldown gate."""
+
+    def test_admit_respects_cooldown(self):
+        """Only one alert is admitted per cooldown window."""
+        from detection_index import CooldownGate
+
+        gate = CooldownGate(30)
+        assert gate.admit(1.0) is True
+        assert gate.admit(20.0) is False
+        assert gate.admit(31.0) is False
+        assert gate.admit(31.5) is True
+
+    def test_format_timestamp(self):
+        """Seconds are formatted as MM:SS."""
+        from detection_index import format_timestamp
+
+        assert format_timestamp(0) == "00:00"
+        assert format_timestamp(90.9) == "01:30"
+
+
+class TestDetectionIndex:
+    """Test suite for writing, loading and re-thresholding detection indexes."""
+
+    def _write_index(self, index_dir):
+        from detection_index import DetectionIndexWriter
+
+        writer = DetectionIndexWriter(index_dir, fps=10.0, min_conf=0.25)
+        # frame, class, confidence
+        rows = [
+            (0, 1, 0.9),    # wrong class
+            (5, 0, 0.5),    # low confidence accident
+            (10, 0, 0.8),   # first alert at 1.0s
+            (11, 0, 0.95),  # inside cooldown
+            (200, 0, 0.75), # second alert at 20.0s
+            (250, 0, 0.3),
+        ]
+        for frame, cls_id, conf in rows:
+            writer.add(frame, cls_id, conf, [0.0, 0.0, 10.0, 10.0])
+        writer.close(frame_count=300)
+
+    def test_roundtrip(self, tmp_path):
+        """A written index loads back as memory-mapped columns."""
+        from detection_index import DetectionIndex
+
+        index_dir = str(tmp_path / "video")
+        self._write_index(index_dir)
+        index = DetectionIndex.load(index_dir)
+
+        assert len(index) == 6
+        assert index.fps == 10.0
+        assert index.min_conf == 0.25
+        assert index.meta["frame_count"] == 300
+        assert isinstance(index.conf, np.memmap)
+        assert index.xyxy.shape == (6, 4)
+
+    def test_extract_alerts_matches_live_cooldown(self, tmp_path):
+        """Alerts follow the same threshold and cooldown rules as predict_video."""
+        from detection_index import DetectionIndex, extract_alerts
+
+        index_dir = str(tmp_path / "video")
+        self._write_index(index_dir)
+        index = DetectionIndex.load(index_dir)
+
+        events = extract_alerts(index, threshold=0.7, cooldown_seconds=15, class_ids=[0])
+        assert [e["frame"] for e in events] == [10, 200]
+        assert events[0]["timestamp"] == "00:01"
+        assert events[1]["confidence"] == pytest.approx(0.75)
+
+        events = extract_alerts(index, threshold=0.7, cooldown_seconds=30, class_ids=[0])
+        assert [e["frame"] for e in events] == [10]
+
+        events = extract_alerts(index, threshold=0.3, cooldown_seconds=0, class_ids=[0, 1])
+        assert [e["frame"] for e in events] == [0, 5, 10, 11, 200, 250]
+
+    @pytest.mark.parametrize("fps", [25.0, 29.97, 30.0])
+    def test_replay_matches_the_live_gate_at_any_fps(self, tmp_path, fps):
+        """Replay admits exactly the frames the live gate does, also where cooldown + last rounds differently."""
+        from detection_index import CooldownGate, DetectionIndex, DetectionIndexWriter, extract_alerts
+
+        index_dir = str(tmp_path / "video")
+        writer = DetectionIndexWriter(index_dir, fps=fps)
+        frames = sorted({55, 805} | set(np.random.default_rng(7).integers(0, 20000, 400).tolist()))
+        for frame in frames:
+            writer.add(frame, 0, 0.9, [0.0, 0.0, 10.0, 10.0])
+        writer.close(frame_count=20000)
+
+        gate = CooldownGate(30)
+        live = [frame for frame in frames if gate.admit(frame / fps)]
+        replay = [e["frame"] for e in extract_alerts(DetectionIndex.load(index_dir), 0.7, 30, [0])]
+
+        assert replay == live
+        if fps == 25.0:
+            assert live[:2] == [55, 805]   # 32.2 - 2.2 > 30, but 2.2 + 30 == 32.2
+
+    def test_extract_alerts_empty(self, tmp_path):
+        """An index without qualifying detections yields no alerts."""
+        from detection_index import DetectionIndex, DetectionIndexWriter, extract_alerts
+
+        index_dir = str(tmp_path / "empty")
+        DetectionIndexWriter(index_dir, fps=30.0).close(frame_count=10)
+        index = DetectionIndex.load(index_dir)
+
+        assert len(index) == 0
+        assert extract_alerts(index, 0.7, 30, [0]) == []
+
+    def test_load_missing_index(self, tmp_path):
+        """Loading a missing index raises FileNotFoundError."""
+        from detection_index import DetectionIndex
+
+        with pytest.raises(FileNotFoundError):
+            DetectionIndex.load(str(tmp_path / "missing"))
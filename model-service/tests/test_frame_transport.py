@@ -0,0 +1,156 @@
+import queue
+import multiprocessing
+import numpy as np
+import cv2
+import pytest
+from unittest.mock import patch, Mock
+
+
+def _write_video(path, frames=12, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 10, dtype=np.uint8))
+    writer.release()
+
+
+def _consume(ring, results):
+    """Consumer process: report every frame index and its mean pixel value."""
+    for frame_index, frame in ring.frames():
+        results.put((frame_index, int(frame.mean())))
+    results.put(None)
+    ring.close()
+
+
+class TestFrameRing:
+    """Test suite for the shared-memory frame ring."""
+
+    def test_consumer_reads_without_copying(self):
+        """Frames come back as views of the shared slots, with counters updated."""
+        from frame_transport import FrameRing
+
+        ring = FrameRing((4, 4, 3), slots=2)
+        try:
+            slot, view = ring.acquire()
+            view[...] = 7
+            ring.publish(slot, 0)
+            ring.finish()
+
+            frames = []
+            for frame_index, frame in ring.frames():
+                assert np.shares_memory(frame, ring._views)
+                assert not frame.flags.writeable
+                frames.append((frame_index, int(frame[0, 0, 0])))
+                del frame
+            assert frames == [(0, 7)]
+
+            stats = ring.stats()
+            assert stats["frames_written"] == 1
+            assert stats["frames_read"] == 1
+            assert stats["frames_copied"] == 0
+        finally:
+            ring.close()
+
+    def test_backpressure_and_recycling(self):
+        """The producer waits while every slot is in use and reuses released slots."""
+        from frame_transport import FrameRing
+
+        ring = FrameRing((4, 4, 3), slots=2)
+        try:
+            ring.write(np.zeros((4, 4, 3), np.uint8), 0)
+            ring.write(np.ones((4, 4, 3), np.uint8), 1)
+            with pytest.raises(queue.Empty):
+                ring.acquire(timeout=0.05)
+            assert ring.stats()["backpressure_waits"] == 1
+
+            slot, frame_index, view = ring.get()
+            ring.release(slot)
+            assert ring.acquire(timeout=1)[0] == slot
+            assert ring.stats()["frames_copied"] == 2
+        finally:
+            ring.close()
+
+    def test_multiple_consumer_processes(self, tmp_path):
+        """Every decoded frame reaches exactly one consumer process, decoded in place."""
+        from frame_transport import start_decoder
+
+        video_path = str(tmp_path / "synthetic.avi")
+        _write_video(video_path, frames=12)
+
+        ring, decoder = start_decoder(video_path, slots=3, consumers=2)
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        consumers = [ctx.Process(target=_consume, args=(ring, results)) for _ in range(2)]
+        for p in consumers:
+            p.start()
+        try:
+            seen, finished = [], 0
+            while finished < 2:
+                item = results.get(timeout=30)
+                if item is None:
+                    finished += 1
+                else:
+                    seen.append(item)
+            for p in consumers + [decoder]:
+                p.join(timeout=10)
+
+            assert sorted(i for i, _ in seen) == list(range(12))
+            assert dict(seen)[3] == 30
+            stats = ring.stats()
+            assert stats["frames_read"] == 12
+            assert stats["frames_copied"] == 0
+        finally:
+            ring.close()
+
+
+class TestDecodeProcess:
+    """Test suite for predict_video with the decoder in a separate process."""
+
+    @patch('app.DECODE_PROCESS', True)
+    @patch('app.model')
+    @patch('app.threading')
+    def test_predict_video_uses_frame_ring(self, mock_threading, mock_model, tmp_path):
+        """Frames from the decoder process are tracked one by one."""
+        from app import predict_video
+
+        video_path = str(tmp_path / "synthetic.avi")
+        _write_video(video_path, frames=5)
+
+        detection = Mock()
+        detection.cls.item.return_value = 0
+        detection.conf.item.return_value = 0.9
+        mock_model.predictor = None
+        mock_model.track.return_value = [Mock(boxes=[detection])]
+
+        predict_video(video_path, {"cameraId": "cam_001"})
+
+        assert mock_model.track.call_count == 5
+        assert mock_model.track.call_args[1]['persist'] is True
+        # app.threading is replaced as a whole: patching threading.Thread would
+        # also stop the multiprocessing queue feeder threads
+        assert mock_threading.Thread.call_count == 1
+
+
+class TestTrackFrames:
+    """Test suite for tracking frames of several jobs through one model."""
+
+    def test_interleaved_jobs_keep_their_own_tracker_and_settings(self):
+        """Two jobs tracking through the same model share its weights but not its predictor."""
+        from ultralytics import YOLO
+        import frame_transport
+
+        model = YOLO("yolo11n.yaml")
+        frames = [(i, np.zeros((64, 64, 3), dtype=np.uint8)) for i in range(2)]
+        copies = []
+        make_copy = frame_transport.tracking_copy
+        with patch('frame_transport.tracking_copy', side_effect=lambda m: copies.append(make_copy(m)) or copies[-1]):
+            first = frame_transport.track_frames(model, iter(frames), conf=0.25, imgsz=64)
+            second = frame_transport.track_frames(model, iter(frames), conf=0.7, imgsz=96)
+            for job in (first, second, first, second):
+                next(job)
+
+        first_predictor, second_predictor = (copy.predictor for copy in copies)
+        assert first_predictor is not second_predictor
+        assert first_predictor.trackers[0] is not second_predictor.trackers[0]
+        assert (first_predictor.args.conf, second_predictor.args.conf) == (0.25, 0.7)
+        assert first_predictor.model.model is second_predictor.model.model is model.model
+        assert model.predictor is None
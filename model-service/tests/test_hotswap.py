@@ -0,0 +1,202 @@
+import time
+import threading
+from unittest.mock import patch, Mock, PropertyMock
+import numpy as np
+import pytest
+from fastapi import status
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def _box(cls_id, conf):
+    box = Mock()
+    box.cls.item.return_value = cls_id
+    box.conf.item.return_value = conf
+    return box
+
+
+def _model(confidence=None, inference_ms=10.0):
+    """A model whose predict() finds one accident at confidence (or nothing)."""
+    model = Mock()
+    boxes = [_box(0, confidence)] if confidence is not None else []
+    model.predict.return_value = [Mock(boxes=boxes, speed={"inference": inference_ms})]
+    return model
+
+
+def _manager(loader):
+    from hotswap import ModelManager
+
+    return ModelManager(_model(), "v1.pt", loader, conf=0.7, imgsz=320, class_id=0)
+
+
+class TestModelManager:
+    """Test suite for swapping models while jobs run."""
+
+    def test_running_jobs_finish_on_the_old_model(self):
+        """A swap affects new jobs only; the old model is released after its last job."""
+        new_model = _model()
+        manager = _manager(lambda weights: new_model)
+        old = manager.active
+
+        with manager.lease() as leased:
+            manager.stage("v2.pt", warmup_frames=2)
+            _wait_for(lambda: manager.active.weights == "v2.pt")
+
+            assert leased is old and leased.model is not None
+            assert manager.status()["draining"] == [old.to_dict()]
+            with manager.lease() as second:
+                assert second.model is new_model
+
+        assert old.model is None
+        assert manager.status()["draining"] == []
+        assert new_model.predict.call_count == 2   # warm-up frames
+
+    def test_old_model_is_released_once(self):
+        """A job that ends while the swap is logged does not make promote release the old model again."""
+        manager = _manager(lambda weights: _model())
+        old = manager.active
+        lease = manager.lease()
+        lease.__enter__()
+        manager.on_swap = lambda version: lease.__exit__(None, None, None)
+
+        manager.stage("v2.pt", shadow=True, warmup_frames=0)
+        _wait_for(lambda: manager.shadow is not None)
+        with patch.object(manager, "_release", wraps=manager._release) as release:
+            manager.promote()
+
+        release.assert_called_once_with(old)
+
+    def test_failed_load_keeps_the_active_model(self):
+        """A load error is reported and does not block the next attempt."""
+        def loader(weights):
+            raise RuntimeError("bad weights")
+
+        manager = _manager(loader)
+        manager.stage("broken.pt")
+        _wait_for(lambda: manager.candidate["state"] == "failed")
+
+        assert manager.active.weights == "v1.pt"
+        assert manager.status()["candidate"]["error"] == "bad weights"
+        manager.loader = lambda weights: _model()
+        manager.stage("v2.pt")
+        _wait_for(lambda: manager.active.weights == "v2.pt")
+
+    def test_one_candidate_at_a_time(self):
+        from hotswap import SwapInProgress
+
+        loading = threading.Event()
+        manager = _manager(lambda weights: loading.wait() and _model())
+        manager.stage("v2.pt")
+        with pytest.raises(SwapInProgress):
+            manager.stage("v3.pt")
+        manager.discard()
+        loading.set()
+        time.sleep(0.05)
+        assert manager.active.weights == "v1.pt"
+
+    def test_shadow_compares_then_promotes(self):
+        """In shadow mode the candidate only runs on sampled frames until it is promoted."""
+        from hotswap import NoCandidate
+
+        candidate_model = _model(confidence=0.8, inference_ms=5.0)
+        manager = _manager(lambda weights: candidate_model)
+        with pytest.raises(NoCandidate):
+            manager.promote()
+
+        manager.stage("v2.pt", shadow=True, sample_rate=0.5, warmup_frames=0)
+        _wait_for(lambda: manager.shadow is not None)
+        baseline = manager.active
+
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        for i in range(4):
+            boxes = [_box(0, 0.9)] if i < 2 else []
+            manager.shadow.offer(Mock(orig_img=frame, boxes=boxes, speed={"inference": 10.0}), baseline)
+        manager.shadow.offer(Mock(orig_img=frame, boxes=[], speed={"inference": 10.0}), None)
+        _wait_for(lambda: manager.status()["candidate"]["comparison"]["framesCompared"] == 2)
+
+        comparison = manager.status()["candidate"]["comparison"]
+        assert comparison["detections"] == {"both": 1, "activeOnly": 0, "candidateOnly": 1, "neither": 0}
+        assert comparison["latencyRatio"] == 0.5
+        assert comparison["meanConfidenceDelta"] == pytest.approx(-0.1)
+        assert manager.active is baseline
+
+        promoted = manager.promote()
+        assert promoted.weights == "v2.pt"
+        assert manager.shadow is None and manager.candidate is None
+        assert baseline.model is None
+
+    def test_shadow_keeps_its_own_copy_of_the_frame(self):
+        """The decoder may overwrite a frame's ring slot before the shadow thread gets to it."""
+        from hotswap import ModelVersion, ShadowComparison
+
+        seen = []
+        resume = threading.Event()
+
+        def predict(frame, **kwargs):
+            resume.wait()
+            seen.append(int(frame[0, 0, 0]))
+            return [Mock(boxes=[], speed={"inference": 1.0})]
+
+        baseline = ModelVersion(1, "v1.pt", _model())
+        candidate = ModelVersion(2, "v2.pt", Mock(predict=Mock(side_effect=predict)))
+        shadow = ShadowComparison(baseline, candidate, conf=0.7, imgsz=320, class_id=0, sample_rate=1)
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        shadow.offer(Mock(orig_img=frame, boxes=[], speed={"inference": 1.0}), baseline)
+        frame[:] = 255   # slot reused for the next frame
+        resume.set()
+        _wait_for(lambda: seen)
+        shadow.stop()
+
+        assert seen == [0]
+
+    @patch('app.cv2.VideoCapture')
+    def test_job_survives_the_shadow_going_away(self, mock_capture):
+        """A promote or discard between two frames of a job does not break the job."""
+        import app
+
+        mock_capture.return_value = Mock(**{"isOpened.return_value": True, "get.return_value": 10.0})
+        shadow = Mock()
+        manager = Mock()
+        type(manager).shadow = PropertyMock(side_effect=[shadow, None, None, None])
+        frames = [(0, Mock(boxes=[], speed={})), (1, Mock(boxes=[], speed={}))]
+
+        with patch('app.models', manager), patch('app.iter_video_results', return_value=iter(frames)):
+            app.predict_video("/fake/video.mp4", {"cameraId": "c"})
+
+        shadow.offer.assert_called_once()
+
+
+class TestModelAdminAPI:
+    """Test suite for the model admin endpoints."""
+
+    def test_requires_internal_secret(self, client):
+        response = client.post("/admin/model", json={"weights": "x.pt"}, headers={"X-INTERNAL-SECRET": "wrong"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_swap_and_status(self, client, tmp_path):
+        """Weights are loaded in the background and show up as the active model."""
+        import app
+
+        weights = tmp_path / "v2.pt"
+        weights.write_bytes(b"weights")
+        headers = {"X-INTERNAL-SECRET": app.SECRET}
+        manager = _manager(lambda path: _model())
+
+        with patch('app.models', manager):
+            response = client.post("/admin/model", json={"weights": str(tmp_path / "missing.pt")}, headers=headers)
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+            response = client.post("/admin/model", json={"weights": str(weights), "warmupFrames": 1}, headers=headers)
+            assert response.status_code == status.HTTP_202_ACCEPTED
+            assert response.json()["state"] == "loading"
+            _wait_for(lambda: manager.active.weights == str(weights))
+
+            response = client.get("/admin/model", headers=headers)
+            assert response.json()["active"]["version"] == 2
+            response = client.post("/admin/model/promote", headers=headers)
+            assert response.status_code == status.HTTP_409_CONFLICT
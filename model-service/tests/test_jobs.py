@@ -0,0 +1,152 @@
+from unittest.mock import patch, Mock
+import pytest
+
+
+def _results(*confidences):
+    """Results for one frame with one accident detection per confidence."""
+    detections = []
+    for conf in confidences:
+        detection = Mock()
+        detection.cls.item.return_value = 0
+        detection.conf.item.return_value = conf
+        detections.append(detection)
+    return Mock(boxes=detections)
+
+
+class TestJobStore:
+    """Test suite for job checkpoint persistence."""
+
+    def test_roundtrip_and_interrupted(self, tmp_path):
+        """A running job is persisted and reported as interrupted after a restart."""
+        from jobs import JobStore
+
+        store = JobStore(str(tmp_path))
+        job = store.create("run", "/videos/a.mp4", {"cameraId": "cam_001"}, {"shards": 1})
+        store.checkpoint(job, 120, 3.5)
+
+        restarted = JobStore(str(tmp_path)).interrupted()
+        assert len(restarted) == 1
+        assert restarted[0].job_id == job.job_id
+        assert restarted[0].frame_offset == 120
+        assert restarted[0].last_alert_time == 3.5
+        assert restarted[0].metadata == {"cameraId": "cam_001"}
+
+    def test_finish_waits_for_pending_alerts(self, tmp_path):
+        """A finished job is kept until its last alert is acknowledged."""
+        from jobs import JobStore, COMPLETED
+
+        store = JobStore(str(tmp_path))
+        job = store.create("run", "/videos/a.mp4", {})
+        event = store.record_event(job, 30, "00:01", 0.9, 1.0)
+        assert job.frame_offset == 31
+
+        store.finish(job)
+        assert [j.status for j in store.interrupted()] == [COMPLETED]
+
+        store.mark_event(job, event, sent=True)
+        assert store.load_all() == []
+
+        # A late save after deletion must not bring the job back
+        store.save(job)
+        assert store.load_all() == []
+
+    def test_job_id_must_be_a_plain_name(self, tmp_path):
+        """A given job id names the checkpoint file, so it cannot leave the jobs directory."""
+        from jobs import JobStore
+
+        store = JobStore(str(tmp_path / "jobs"))
+        with pytest.raises(ValueError):
+            store.create("run", "/videos/a.mp4", {}, job_id="../outside")
+        assert store.create("run", "/videos/a.mp4", {}, job_id="coordinator-job_1").job_id == "coordinator-job_1"
+        assert not (tmp_path / "outside.json").exists()
+
+    def test_unreadable_checkpoint_is_ignored(self, tmp_path):
+        """A corrupt checkpoint file does not stop the other jobs from loading."""
+        from jobs import JobStore
+
+        (tmp_path / "broken.json").write_text("{not json")
+        store = JobStore(str(tmp_path))
+        store.create("run", "/videos/a.mp4", {})
+        assert len(store.load_all()) == 1
+
+
+class TestResume:
+    """Test suite for resuming jobs in the app."""
+
+    @patch('app.cv2.VideoCapture')
+    @patch('app.threading')
+    def test_resume_continues_without_duplicate_alerts(self, mock_threading, mock_cv2, tmp_path):
+        """A resumed job starts at its frame offset with its cooldown state restored."""
+        from app import predict_video
+        from jobs import JobStore
+
+        mock_cap = Mock()
+        mock_cap.isOpened.return_value = True
+        mock_cap.get.return_value = 10.0
+        mock_cv2.return_value = mock_cap
+
+        store = JobStore(str(tmp_path), checkpoint_every_frames=2)
+        job = store.create("run", "/fake/video.mp4", {"cameraId": "cam_001"})
+        store.record_event(job, 10, "00:01", 0.9, 1.0)
+
+        # Frame 100 (10s) is inside the 30s cooldown of the alert at 1s, frame 400 is not
+        frames = [(100, _results(0.9)), (101, _results()), (400, _results(0.8))]
+        with patch('app.job_store', store), \
+             patch('app.iter_video_results', return_value=iter(frames)) as mock_iter:
+            predict_video("/fake/video.mp4", job.metadata, job=job)
+
+        assert mock_iter.call_args[0][2] == 11
+        assert mock_threading.Thread.call_count == 1
+        assert mock_threading.Thread.call_args[1]['args'][1] == "00:40"
+        assert [e["frame"] for e in job.events] == [10, 400]
+        assert JobStore(str(tmp_path)).load_all()[0].frame_offset == 401
+
+    @patch('app.threading')
+    def test_startup_resumes_jobs_and_resends_pending_alerts(self, mock_threading, tmp_path):
+        """Interrupted jobs are restarted and unacknowledged alerts are sent again."""
+        import app
+        from jobs import JobStore
+
+        store = JobStore(str(tmp_path))
+        job = store.create("run", "/fake/video.mp4", {"cameraId": "cam_001"})
+        store.record_event(job, 10, "00:01", 0.9, 1.0)
+
+        with patch('app.job_store', store):
+            app.resume_interrupted_jobs()
+
+        targets = [c[1]['target'] for c in mock_threading.Thread.call_args_list]
+        assert targets == [app.broadcast, app.run_job]
+
+    def test_failed_job_keeps_its_checkpoint(self, tmp_path):
+        """A job that fails is resumed later: on the next start, or by the coordinator on another node."""
+        import app
+        from jobs import JobStore, RUNNING
+
+        store = JobStore(str(tmp_path))
+        job = store.create("run", "/fake/video.mp4", {"cameraId": "cam_001"})
+        with patch('app.job_store', store), patch('app.predict_video', side_effect=RuntimeError("decoder died")):
+            app.run_job(job)
+            assert [j.status for j in JobStore(str(tmp_path)).load_all()] == [RUNNING]
+
+            node_agent = Mock()
+            with patch('app.node_agent', node_agent):
+                app.run_job(job)
+        assert JobStore(str(tmp_path)).load_all() == []   # left out of heartbeats, so the coordinator requeues it
+        node_agent.job_finished.assert_not_called()
+
+    @patch('app.trim_video_ffmpeg')
+    @patch('app.upload_to_drive')
+    @patch('app.requests.post')
+    def test_broadcast_records_outcome(self, mock_post, mock_upload, mock_trim, tmp_path):
+        """The backend's answer is stored on the job's event."""
+        from app import broadcast
+        from jobs import JobStore, EVENT_SENT
+
+        mock_post.return_value = Mock(status_code=201)
+        store = JobStore(str(tmp_path))
+        job = store.create("run", "/fake/video.mp4", {})
+        event = store.record_event(job, 10, "00:01", 0.9, 1.0)
+
+        with patch('app.job_store', store):
+            assert broadcast("/fake/video.mp4", "00:01", {}, 0.9, job=job, event=event) is True
+        assert event["status"] == EVENT_SENT
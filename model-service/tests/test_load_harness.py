@@ -0,0 +1,86 @@
+import json
+import requests
+import pytest
+
+
+class TestSchedules:
+    """Test suite for generated and replayed request schedules."""
+
+    def test_burst_sends_everything_at_once(self):
+        """A burst schedules every camera at t=0, cycling through the videos."""
+        from benchmarks.load import build_schedule
+
+        schedule = build_schedule("burst", 5, rate=1.0, video_ids=["a", "b"])
+        assert [e["at"] for e in schedule] == [0.0] * 5
+        assert [e["videoId"] for e in schedule] == ["a", "b", "a", "b", "a"]
+        assert len({e["cameraId"] for e in schedule}) == 5
+
+    @pytest.mark.parametrize("pattern", ["uniform", "poisson", "ramp"])
+    def test_spread_patterns_are_ordered_and_reproducible(self, pattern):
+        """Spread patterns are sorted in time and depend only on the seed."""
+        from benchmarks.load import build_schedule
+
+        first = build_schedule(pattern, 20, rate=10.0, video_ids=["a"], bbox_ratio=0.5, seed=3)
+        second = build_schedule(pattern, 20, rate=10.0, video_ids=["a"], bbox_ratio=0.5, seed=3)
+        assert first == second
+        times = [e["at"] for e in first]
+        assert times == sorted(times)
+        assert {e["endpoint"] for e in first} == {"/run", "/run-bbox"}
+
+    def test_replay_skips_lines_that_are_not_requests(self, tmp_path):
+        """Replay files may contain other records; only /run and /run-bbox requests are kept."""
+        from benchmarks.load import load_replay
+
+        path = tmp_path / "replay.jsonl"
+        path.write_text("\n".join([
+            json.dumps({"at": 2, "endpoint": "/run-bbox", "videoId": "v2", "cameraId": "c2", "location": "x"}),
+            json.dumps({"request_id": "user-001", "title": "not a request"}),
+            json.dumps({"at": 1, "videoId": "v1"}),
+        ]))
+
+        schedule = load_replay(str(path))
+        assert [e["videoId"] for e in schedule] == ["v1", "v2"]
+        assert schedule[0]["endpoint"] == "/run"
+        assert schedule[0]["cameraId"] == "cam-003"
+
+
+class TestReport:
+    """Test suite for matching alerts to requests."""
+
+    def _sent(self, camera, sent, error=None):
+        return {"request": {"cameraId": camera}, "sent": sent, "error": error, "responseSeconds": 0.1}
+
+    def test_latency_and_error_rate(self):
+        """Latency is measured from each request to its camera's alerts."""
+        from benchmarks.load import summarize
+
+        sent = [self._sent("c1", 100.0), self._sent("c2", 100.0), self._sent("c3", 100.0, error="500")]
+        alerts = [
+            {"doc": {"cameraId": "c1"}, "received": 103.0},
+            {"doc": {"cameraId": "c1"}, "received": 101.0},
+        ]
+
+        summary = summarize(sent, alerts)
+        assert summary["failed_requests"] == 1
+        assert summary["requests_without_alert"] == 1
+        assert summary["error_rate"] == pytest.approx(2 / 3, abs=1e-3)
+        assert summary["first_alert_latency"]["max"] == 1.0
+        assert summary["alert_latency"]["count"] == 2
+
+
+class TestStandIns:
+    """Test suite for the local backend and Drive stand-ins."""
+
+    def test_backend_records_alerts(self):
+        """The fake backend answers 201 and keeps the alert with its arrival time."""
+        from benchmarks.stand_ins import FakeBackend
+
+        with FakeBackend() as backend:
+            response = requests.post(backend.alert_url, json={"cameraId": "c1"},
+                                     headers={"X-INTERNAL-SECRET": "s"}, timeout=5)
+            alerts = backend.received()
+
+        assert response.status_code == 201
+        assert alerts[0]["doc"] == {"cameraId": "c1"}
+        assert alerts[0]["secret"] == "s"
+        assert alerts[0]["received"] > 0
@@ -0,0 +1,107 @@
+from unittest.mock import patch, Mock
+
+
+class TestRegistry:
+    """Test suite for the Prometheus text rendering."""
+
+    def test_counter_and_gauge_render(self):
+        """Labelled series are rendered with HELP/TYPE headers."""
+        from metrics import Registry
+
+        registry = Registry()
+        alerts = registry.counter("alerts_total", "Alerts", labels=("outcome",))
+        depth = registry.gauge("queue_depth", "Depth", labels=("queue",))
+        alerts.inc(outcome="sent")
+        alerts.inc(2, outcome="sent")
+        depth.inc(queue="jobs")
+        depth.dec(queue="jobs")
+
+        text = registry.render()
+        assert "# TYPE alerts_total counter" in text
+        assert 'alerts_total{outcome="sent"} 3' in text
+        assert 'queue_depth{queue="jobs"} 0' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Bucket counts accumulate and end with +Inf, _sum and _count."""
+        from metrics import Registry
+
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            latency.observe(value)
+
+        lines = registry.render().splitlines()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+        assert "latency_seconds_sum 6.05" in lines
+        assert "latency_seconds_count 4" in lines
+
+    def test_label_values_are_escaped(self):
+        """Quotes in label values do not break the exposition format."""
+        from metrics import Registry
+
+        registry = Registry()
+        fps = registry.gauge("fps", "FPS", labels=("job",))
+        fps.set(1, job='a"b')
+        assert 'fps{job="a\\"b"} 1' in registry.render()
+
+
+class TestStageTiming:
+    """Test suite for the per-stage helpers."""
+
+    def test_timed_records_stage(self):
+        """A timed block is observed under its stage label."""
+        from metrics import STAGE_SECONDS, timed
+
+        before = STAGE_SECONDS.count(stage="test_stage")
+        with timed("test_stage"):
+            pass
+        assert STAGE_SECONDS.count(stage="test_stage") == before + 1
+
+    def test_observe_frame_splits_yolo_speed(self):
+        """YOLO's speed dict becomes model stages and the rest of the wait is decode."""
+        from metrics import STAGE_SECONDS, observe_frame
+
+        before = STAGE_SECONDS.count(stage="decode")
+        results = Mock(speed={"preprocess": 1.0, "inference": 10.0, "postprocess": 1.0})
+        observe_frame(results, waited=0.02)
+        assert STAGE_SECONDS.count(stage="decode") == before + 1
+        assert STAGE_SECONDS.count(stage="inference") >= 1
+
+    def test_observe_frame_ignores_results_without_speed(self):
+        """Results without timings (e.g. mocks) are skipped."""
+        from metrics import STAGE_SECONDS, observe_frame
+
+        before = STAGE_SECONDS.count(stage="decode")
+        observe_frame(Mock(speed=None), waited=0.02)
+        assert STAGE_SECONDS.count(stage="decode") == before
+
+    def test_job_rate_publishes_and_clears_gauge(self):
+        """The per-job FPS gauge is set every few frames and removed on close."""
+        from metrics import JOB_FPS, JobRate
+
+        rate = JobRate("job-1", every=2)
+        rate.tick()
+        rate.tick()
+        assert JOB_FPS.value(job="job-1") > 0
+        rate.close()
+        assert 'job="job-1"' not in "\n".join(JOB_FPS.render())
+
+    @patch('app.cv2.VideoCapture')
+    def test_bbox_job_reports_frames_and_stages(self, mock_capture):
+        """/run-bbox jobs count their frames and stage timings like /run jobs do."""
+        import app
+        from metrics import FRAMES_PROCESSED, STAGE_SECONDS
+
+        mock_capture.return_value = Mock(**{"isOpened.return_value": True, "get.return_value": 30.0})
+        yolo = Mock()
+        yolo.track.return_value = [Mock(boxes=[], speed={"inference": 5.0}) for _ in range(3)]
+        frames = FRAMES_PROCESSED.value()
+        inference = STAGE_SECONDS.count(stage="inference")
+
+        with patch('app.model', yolo), patch('app.get_latest_inference_bbox_dir', return_value=None):
+            app.predict_video_with_bbox("/fake/video.mp4", {"cameraId": "c"})
+
+        assert FRAMES_PROCESSED.value() == frames + 3
+        assert STAGE_SECONDS.count(stage="inference") == inference + 3
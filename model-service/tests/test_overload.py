@@ -0,0 +1,173 @@
+import time
+import threading
+from unittest.mock import patch, Mock
+import pytest
+from fastapi import status
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _controller(cpu=0.5, **kwargs):
+    from overload import OverloadController, build_levels
+
+    clock = FakeClock()
+    controller = OverloadController(build_levels(640, max_stride=2, min_imgsz=480), lag_slo=10,
+                                    hold_seconds=5, recover_seconds=20, clock=clock, cpu=lambda: cpu, **kwargs)
+    return controller, clock
+
+
+def _fall_behind(clock, load, seconds, fps=30):
+    """Let wall time pass while the job covers only half of it."""
+    clock.now += seconds
+    load.advance(load.start_frame + int(seconds / 2 * fps) - 1, clock.now)
+
+
+class TestLevels:
+    def test_stride_then_image_size_then_pause(self):
+        from overload import build_levels
+
+        levels = [(l.stride, l.imgsz, l.pause_archive) for l in build_levels(640, max_stride=4, min_imgsz=320)]
+        assert levels == [(1, 640, False), (2, 640, False), (4, 640, False), (4, 480, False),
+                          (4, 352, False), (4, 320, False), (4, 320, True)]
+
+    def test_fixed_image_size(self):
+        """Exported models keep their image size; only stride and pausing are left."""
+        from overload import build_levels
+
+        levels = [(l.stride, l.imgsz) for l in build_levels(320, max_stride=2, min_imgsz=320)]
+        assert levels == [(1, 320), (2, 320), (2, 320)]
+
+
+class TestOverloadController:
+    """Test suite for the feedback loop between job lag and inference quality."""
+
+    def test_job_ahead_of_real_time_has_no_lag(self):
+        """A job cannot bank a lead: frames of a live feed do not arrive early."""
+        controller, clock = _controller()
+        load = controller.register("j1", fps=10)
+
+        clock.now += 1
+        load.advance(99, clock.now)     # 10 s of video in 1 s
+        assert load.lag(clock.now) == 0
+        clock.now += 5
+        assert load.lag(clock.now) == 5
+
+    def test_steps_down_under_lag_and_back_up(self):
+        """One step per hold period while behind the SLO, one step up per calm recovery period."""
+        controller, clock = _controller()
+        load = controller.register("j1", fps=30)
+
+        _fall_behind(clock, load, 30)
+        assert controller.evaluate().stride == 2
+        clock.now += 1
+        assert controller.index == 1 and controller.evaluate().stride == 2   # held
+        clock.now += 5
+        controller.evaluate()
+        assert controller.level.imgsz == 480
+
+        controller.unregister(load)   # load gone
+        controller.evaluate()
+        clock.now += 20
+        controller.evaluate()
+        assert controller.index == 1
+        clock.now += 20
+        controller.evaluate()
+        assert controller.index == 0
+
+    def test_saturated_cpu_steps_down_before_the_slo(self):
+        controller, clock = _controller(cpu=0.95)
+        load = controller.register("j1", fps=30)
+        _fall_behind(clock, load, 12)   # 6 s behind and growing
+
+        assert controller.evaluate().stride == 2
+
+    def test_archive_lag_is_ignored_and_archive_jobs_pause(self):
+        """Only live jobs drive the controller; archive jobs are paused last and resumed on the way up."""
+        from overload import ARCHIVE
+
+        controller, clock = _controller()
+        archive = controller.register("archive", fps=30, priority=ARCHIVE)
+        _fall_behind(clock, archive, 60)
+        controller.evaluate()
+        assert controller.index == 0
+
+        controller.index = len(controller.levels) - 1
+        delivered = []
+        worker = threading.Thread(
+            target=lambda: delivered.extend(controller.throttle(archive, [(i, None) for i in range(4)])),
+        )
+        worker.start()
+        time.sleep(0.05)
+        assert delivered == [] and archive.paused
+
+        controller._step(-1, "test")
+        worker.join(timeout=5)
+        assert [frame_index for frame_index, _ in delivered] == [1, 3]   # stride 2
+        assert archive.paused is False
+
+    def test_level_changes_are_published(self):
+        from metrics import OVERLOAD_IMGSZ, OVERLOAD_LEVEL, OVERLOAD_STEPS, JOB_LAG_SECONDS
+
+        steps = OVERLOAD_STEPS.value(direction="down")
+        controller, clock = _controller()
+        load = controller.register("j1", fps=30)
+        _fall_behind(clock, load, 30)
+        controller.evaluate()
+
+        assert OVERLOAD_LEVEL.value() == 1 and OVERLOAD_IMGSZ.value() == 640
+        assert OVERLOAD_STEPS.value(direction="down") == steps + 1
+        assert JOB_LAG_SECONDS.value(job="j1") == pytest.approx(15)
+        controller.unregister(load)
+        assert 'job="j1"' not in "\n".join(JOB_LAG_SECONDS.render())
+
+
+class TestControlledJobs:
+    """Test suite for jobs running under the overload controller."""
+
+    @patch('app.cv2.VideoCapture')
+    def test_predict_video_follows_the_level(self, mock_capture):
+        """Skipped frames are not tracked, the image size is read per frame and checkpoints still land."""
+        import app
+        from jobs import JobStore
+        from metrics import FRAMES_SKIPPED
+
+        skipped = FRAMES_SKIPPED.value(reason="overload")
+        cap = Mock()
+        cap.isOpened.return_value = True
+        cap.get.return_value = 30.0
+        cap.read.side_effect = [(True, f"frame{i}") for i in range(8)] + [(False, None)]
+        mock_capture.return_value = cap
+        controller, _ = _controller()
+        controller.index = 2           # stride 2, imgsz 480
+
+        store = Mock(spec=JobStore)
+        store.due.side_effect = JobStore("/tmp/unused", checkpoint_every_frames=3).due
+        job = Mock(job_id="j1", options={}, frame_offset=0, last_alert_time=None)
+        yolo = Mock(predictor=None)
+        yolo.track.return_value = [Mock(boxes=[], speed={})]
+        with patch('app.overload', controller), patch('app.job_store', store), patch('app.model', yolo):
+            app.predict_video("/fake/video.mp4", {"cameraId": "c"}, job=job)
+
+        frames = [c[0][0] for c in yolo.track.call_args_list]
+        assert frames == ["frame1", "frame3", "frame5", "frame7"]
+        assert {c[1]['imgsz'] for c in yolo.track.call_args_list} == {480}
+        assert [c[0][1] for c in store.checkpoint.call_args_list] == [4, 6]
+        assert FRAMES_SKIPPED.value(reason="overload") == skipped + 4
+        assert controller.jobs == {}
+
+    def test_overload_status_endpoint(self, client):
+        import app
+
+        headers = {"X-INTERNAL-SECRET": app.SECRET}
+        with patch('app.overload', None):
+            assert client.get("/admin/overload", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+        with patch('app.overload', _controller()[0]):
+            response = client.get("/admin/overload", headers=headers)
+        assert response.json()["level"] == 0
+        assert response.json()["levels"][-1] == {"stride": 2, "imgsz": 480, "pauseArchive": True}
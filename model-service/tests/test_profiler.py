@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import Counter
+import pytest
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _spin_tagged(stop, job_id):
+    from profiler import tag_thread, untag_thread
+
+    tag_thread(job_id, "predict_video")
+    try:
+        _spin(stop)
+    finally:
+        untag_thread()
+
+
+class TestSampler:
+    """Test suite for the sampling profiler."""
+
+    def test_samples_are_attributed_to_tagged_jobs(self):
+        """Stacks of a tagged thread are rooted at its role and listed under its job."""
+        from profiler import sample
+
+        stop = threading.Event()
+        worker = threading.Thread(target=_spin_tagged, args=(stop, "job-1"))
+        worker.start()
+        try:
+            profile = sample(0.2, interval=0.005)
+        finally:
+            stop.set()
+            worker.join()
+
+        assert profile["samples"] > 0
+        job_stacks = profile["jobs"]["job-1"]["predict_video"]
+        assert any("_spin (test_profiler.py" in stack for stack in job_stacks)
+        assert all(stack.startswith("predict_video;") for stack in job_stacks)
+
+    def test_idle_threads_are_skipped_by_default(self):
+        """Threads blocked in Event.wait only show up with include_idle."""
+        from profiler import sample
+
+        stop = threading.Event()
+        waiter = threading.Thread(target=stop.wait, name="waiter-7")
+        waiter.start()
+        try:
+            busy = sample(0.05, interval=0.005)
+            idle = sample(0.05, interval=0.005, include_idle=True)
+        finally:
+            stop.set()
+            waiter.join()
+
+        assert not any(stack.startswith("waiter;") for stack in busy["stacks"])
+        assert any(stack.startswith("waiter;") for stack in idle["stacks"])
+
+    def test_only_one_profile_at_a_time(self):
+        """A second profile while one is running is refused."""
+        from profiler import ProfilerBusy, sample
+
+        runner = threading.Thread(target=sample, args=(0.3,))
+        runner.start()
+        time.sleep(0.05)
+        try:
+            with pytest.raises(ProfilerBusy):
+                sample(0.01)
+        finally:
+            runner.join()
+
+    def test_collapse_and_thread_groups(self):
+        """Collapsed output has one "stack count" line per stack; thread numbers are dropped."""
+        from profiler import _thread_group, collapse
+
+        assert collapse(Counter({"b;c": 2, "a": 1})) == "a 1\nb;c 2\n"
+        assert _thread_group("Thread-12 (broadcast)") == "Thread (broadcast)"
+        assert _thread_group("MainThread") == "MainThread"
@@ -0,0 +1,155 @@
+import os
+from unittest.mock import patch, Mock
+import pytest
+from fastapi import status
+
+
+def _write(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+
+
+class TestScratchSpace:
+    """Test suite for per-job scratch workspaces."""
+
+    def test_workspace_is_removed_after_its_last_holder(self, tmp_path):
+        """A job's broadcasts share its workspace; it goes when the last of them is done."""
+        from scratch import ScratchSpace
+
+        scratch = ScratchSpace(str(tmp_path / "scratch"), str(tmp_path / "clips"))
+        with scratch.workspace("job1") as job_workspace:
+            runs = job_workspace.subdir("runs", "track")
+            with scratch.workspace("job1") as broadcast_workspace:
+                clip = broadcast_workspace.clip_path()
+                _write(clip, 10)
+                assert broadcast_workspace is job_workspace
+                assert clip.startswith(str(tmp_path / "clips" / "job1"))
+            assert os.path.exists(clip)
+
+        assert not os.path.exists(runs)
+        assert not os.path.exists(os.path.dirname(clip))
+
+    def test_workspace_is_removed_when_the_job_fails(self, tmp_path):
+        from scratch import ScratchSpace
+
+        scratch = ScratchSpace(str(tmp_path / "scratch"))
+        with pytest.raises(RuntimeError):
+            with scratch.workspace() as workspace:
+                _write(workspace.clip_path(), 10)
+                raise RuntimeError("inference failed")
+
+        assert os.listdir(tmp_path / "scratch") == []
+
+    def test_key_must_be_a_plain_name(self, tmp_path):
+        """A job id cannot point the workspace, and its removal, outside the scratch space."""
+        from scratch import ScratchSpace
+
+        victim = tmp_path / "victim"
+        victim.mkdir()
+        (tmp_path / "scratch").mkdir()
+        scratch = ScratchSpace(str(tmp_path / "scratch"))
+        for key in ("../victim", "../../victim", "/", "a/b", "."):
+            with pytest.raises(ValueError):
+                with scratch.workspace(key):
+                    pass
+        assert victim.exists()
+
+    def test_removal_stays_inside_the_roots(self, tmp_path):
+        """A workspace directory that resolves elsewhere (e.g. a symlink) is left alone."""
+        from scratch import ScratchSpace
+
+        victim = tmp_path / "victim"
+        victim.mkdir()
+        (tmp_path / "scratch").mkdir()
+        (tmp_path / "scratch" / "job1").symlink_to(victim)
+        scratch = ScratchSpace(str(tmp_path / "scratch"))
+        with scratch.workspace("job1"):
+            pass
+        assert victim.exists()
+
+    def test_quota(self, tmp_path):
+        """The space is full once the workspaces and clips together reach the quota."""
+        from scratch import ScratchSpace
+        from metrics import SCRATCH_BYTES
+
+        scratch = ScratchSpace(str(tmp_path / "scratch"), str(tmp_path / "clips"), quota_bytes=100)
+        with scratch.workspace("job1") as workspace:
+            _write(os.path.join(workspace.subdir("runs"), "out.avi"), 60)
+            assert scratch.full() is False
+            _write(workspace.clip_path(), 40)
+            assert scratch.full() is True
+            assert SCRATCH_BYTES.value(area="clips") == 40
+
+        assert scratch.full() is False
+        assert ScratchSpace(str(tmp_path / "scratch")).full() is False   # no quota
+
+    def test_startup_sweep(self, tmp_path):
+        """Leftovers of a crashed run are deleted, also the ones outside the scratch directory."""
+        from scratch import ScratchSpace
+
+        scratch = ScratchSpace(str(tmp_path / "scratch"))
+        _write(str(tmp_path / "scratch" / "job1" / "runs" / "out.avi"), 30)
+        _write(str(tmp_path / "clip_abc.mp4"), 20)
+        _write(str(tmp_path / "keep.mp4"), 5)
+
+        freed = scratch.sweep([str(tmp_path / "clip_*.mp4")])
+
+        assert freed == 50
+        assert os.listdir(tmp_path / "scratch") == []
+        assert sorted(os.listdir(tmp_path)) == ["keep.mp4", "scratch"]
+
+    def test_nodes_sharing_a_root_keep_to_their_own_directory(self, tmp_path):
+        """A cluster node restarting does not sweep, or count against its quota, another node's jobs."""
+        from scratch import ScratchSpace, node_dir
+
+        node1 = ScratchSpace(node_dir(str(tmp_path), "host:8001"), quota_bytes=100)
+        node2 = ScratchSpace(node_dir(str(tmp_path), "host:8002"), quota_bytes=100)
+        assert node1.root == str(tmp_path / "host_8001")
+
+        with node2.workspace("job2") as workspace:
+            _write(workspace.clip_path(), 100)
+            node1.sweep()
+            assert node1.full() is False
+            assert os.path.exists(workspace.path) and node2.full() is True
+
+
+class TestScratchQuotaAPI:
+    """Test suite for refusing jobs while scratch space is full."""
+
+    def test_run_is_refused_when_full(self, client, tmp_path):
+        (tmp_path / "v1.mp4").write_bytes(b"video")
+        full = Mock()
+        full.full.return_value = True
+        request_data = {"videoId": "v1", "cameraId": "c", "location": "x"}
+
+        with patch('app.VIDEO_DIR', str(tmp_path)), patch('app.scratch', full):
+            for endpoint in ("/run", "/run-bbox"):
+                response = client.post(endpoint, json=request_data)
+                assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+                assert response.headers["Retry-After"] == "30"
+
+    @patch('cluster.requests.post')
+    def test_full_node_stops_accepting_cluster_jobs(self, mock_post):
+        """A node over quota says so in its heartbeat, and a 503 keeps it alive but busy."""
+        from cluster import Coordinator, NodeAgent, NodeBusy
+
+        mock_post.return_value = Mock(status_code=200)
+        NodeAgent("http://coord", "a", "http://a", 1, lambda: [], "secret", accepting=lambda: False).beat()
+        assert mock_post.call_args[1]['json']["accepting"] is False
+
+        busy = {"a"}
+
+        def dispatch(node, job):
+            if node.node_id in busy:
+                raise NodeBusy("Scratch space is full")
+
+        coordinator = Coordinator(dispatch=dispatch)
+        coordinator.heartbeat("a", "http://a", 1)
+        job = coordinator.submit("run", {"videoId": "v1", "cameraId": "cam1", "location": "x"})
+
+        assert job.node_id is None
+        assert coordinator.nodes["a"].alive is True and coordinator.nodes["a"].accepting is False
+        busy.clear()
+        coordinator.heartbeat("a", "http://a", 1)
+        assert job.node_id == "a"
@@ -0,0 +1,192 @@
+import numpy as np
+import cv2
+import pytest
+from unittest.mock import patch, Mock, MagicMock
+
+
+def _write_video(path, frames):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+
+
+def _detecting_model():
+    """A model that finds one accident in every frame."""
+    boxes = Mock()
+    boxes.__len__ = Mock(return_value=1)
+    boxes.cls.cpu.return_value.numpy.return_value = np.array([0.0])
+    boxes.conf.cpu.return_value.numpy.return_value = np.array([0.9])
+    boxes.xyxy.cpu.return_value.numpy.return_value = np.array([[1.0, 2.0, 3.0, 4.0]])
+    model = Mock(predictor=None)
+    model.track.return_value = [Mock(boxes=boxes)]
+    return model
+
+
+def _index(frames, confs, end, fps=10.0):
+    from detection_index import DetectionIndex
+
+    n = len(frames)
+    return DetectionIndex(
+        np.asarray(frames, dtype=np.int32), np.zeros(n, dtype=np.int16),
+        np.asarray(confs, dtype=np.float32), np.zeros((n, 4), dtype=np.float32),
+        {"fps": fps, "min_conf": 0.7, "end": end},
+    )
+
+
+class TestPlanShards:
+    """Test suite for splitting a video into shards."""
+
+    def test_even_split_without_keyframes(self):
+        """Shards cover the video contiguously with warm-up before each start."""
+        from sharding import plan_shards
+
+        shards = plan_shards(frame_count=100, shard_count=4, overlap_frames=5)
+        assert [(s.start, s.end) for s in shards] == [(0, 25), (25, 50), (50, 75), (75, None)]
+        assert [s.warmup_start for s in shards] == [0, 20, 45, 70]
+
+    def test_boundaries_snap_to_keyframes(self):
+        """Shard starts and warm-up starts land on keyframes."""
+        from sharding import plan_shards
+
+        shards = plan_shards(frame_count=100, shard_count=2, overlap_frames=5, keyframes=[0, 30, 48, 90])
+        assert [(s.start, s.end) for s in shards] == [(0, 48), (48, None)]
+        assert shards[1].warmup_start == 30
+
+    def test_resume_from_start_frame(self):
+        """A resumed job only plans shards for the frames it has not processed."""
+        from sharding import plan_shards
+
+        shards = plan_shards(frame_count=100, shard_count=2, overlap_frames=5, start_frame=60)
+        assert [(s.start, s.end) for s in shards] == [(60, 80), (80, None)]
+        assert shards[0].warmup_start == 55
+
+    def test_last_shard_reads_to_the_end(self):
+        """The frame count is an estimate, so frames past it still belong to the last shard."""
+        from sharding import plan_shards
+
+        for frame_count in (100, 0):
+            shards = plan_shards(frame_count=frame_count, shard_count=2, overlap_frames=5, start_frame=100)
+            assert [(s.start, s.end) for s in shards] == [(100, None)]
+
+    def test_collapsing_shards(self):
+        """Too few keyframes or frames collapse into fewer shards."""
+        from sharding import plan_shards
+
+        assert len(plan_shards(frame_count=100, shard_count=4, overlap_frames=0, keyframes=[0])) == 1
+        assert len(plan_shards(frame_count=2, shard_count=8, overlap_frames=0)) == 2
+
+
+class TestProcessShard:
+    """Test suite for processing a single shard."""
+
+    def test_warmup_detections_are_dropped(self, tmp_path):
+        """Only frames the shard owns are kept, but warm-up frames are still tracked."""
+        from sharding import Shard, process_shard
+
+        video_path = str(tmp_path / "synthetic.avi")
+        _write_video(video_path, 20)
+        model = _detecting_model()
+
+        index = process_shard(video_path, Shard(1, start=10, end=15, warmup_start=5), conf=0.7, model=model)
+
+        assert model.track.call_count == 10
+        assert index.frame.tolist() == [10, 11, 12, 13, 14]
+        assert index.meta["end"] == 15
+        assert index.fps == 10.0
+
+
+    @pytest.mark.parametrize("reported", [12, 0])
+    @patch('sharding.probe_keyframes', return_value=[])
+    def test_frames_past_an_undercounted_end_are_processed(self, mock_probe, reported, tmp_path):
+        """A container that reports too few (or no) frames loses none of them."""
+        from sharding import iter_sharded_detections
+
+        open_capture = cv2.VideoCapture
+
+        def undercounting_capture(path):
+            cap = open_capture(path)
+            counted = Mock(wraps=cap)
+            counted.get.side_effect = lambda prop: reported if prop == cv2.CAP_PROP_FRAME_COUNT else cap.get(prop)
+            return counted
+
+        video_path = str(tmp_path / "synthetic.avi")
+        _write_video(video_path, 20)
+        # Shards run in this process instead of spawned workers
+        pool = MagicMock()
+        pool.__enter__.return_value.imap = map
+        context = Mock(**{"Pool.return_value": pool})
+
+        with patch('sharding.cv2.VideoCapture', undercounting_capture), \
+                patch('sharding.multiprocessing.get_context', return_value=context), \
+                patch('sharding._worker_model', _detecting_model()):
+            indexes = list(iter_sharded_detections(video_path, "unused.pt", 2, conf=0.7, overlap_seconds=0))
+
+        assert np.concatenate([index.frame for index in indexes]).tolist() == list(range(20))
+        assert indexes[-1].meta["end"] == 20
+
+    def test_video_ending_before_the_shard_keeps_its_start(self, tmp_path):
+        """A shard past the real end reports no progress instead of moving it back."""
+        from sharding import Shard, process_shard
+
+        video_path = str(tmp_path / "synthetic.avi")
+        _write_video(video_path, 20)
+
+        index = process_shard(video_path, Shard(1, start=30, end=None, warmup_start=18), conf=0.7,
+                              model=_detecting_model())
+
+        assert len(index) == 0
+        assert index.meta["end"] == 30
+
+
+class TestPredictVideoSharded:
+    """Test suite for the sharded predict_video entry point."""
+
+    @patch('app.threading.Thread')
+    @patch('app.iter_sharded_detections')
+    def test_cooldown_carries_across_shards(self, mock_iter, mock_thread):
+        """Alerts match the sequential rules even when a cooldown spans a shard boundary."""
+        from app import predict_video_sharded
+
+        # 10 fps: alerts at 1s and 40s; the 20s detection in shard 2 is inside the cooldown
+        mock_iter.return_value = iter([
+            _index([10], [0.9], end=150),
+            _index([200, 400], [0.9, 0.8], end=600),
+        ])
+
+        predict_video_sharded("/fake/video.mp4", {"cameraId": "cam_001"}, shards=2)
+
+        timestamps = [c[1]['args'][1] for c in mock_thread.call_args_list]
+        assert timestamps == ["00:01", "00:40"]
+
+    @patch('app.threading.Thread')
+    @patch('app.iter_sharded_detections', side_effect=IOError("Could not open video file"))
+    def test_unreadable_video(self, mock_iter, mock_thread):
+        """An unreadable video is logged instead of raising."""
+        from app import predict_video_sharded
+
+        assert predict_video_sharded("/fake/invalid.mp4", {}, shards=2) is None
+        mock_thread.assert_not_called()
+
+    @patch('app.threading.Thread')
+    @patch('app.iter_sharded_detections')
+    def test_worker_failure_is_raised(self, mock_iter, mock_thread):
+        """A failed shard fails the job instead of looking like a finished run."""
+        from app import predict_video_sharded
+
+        def shards():
+            yield _index([10], [0.9], end=150)
+            raise RuntimeError("worker died")
+
+        mock_iter.return_value = shards()
+        with pytest.raises(RuntimeError):
+            predict_video_sharded("/fake/video.mp4", {"cameraId": "cam_001"}, shards=2)
+
+    def test_shard_count_is_bounded(self, client):
+        """Every shard is a process with its own model, so there is at most one per core."""
+        import os
+
+        request_data = {"videoId": "v1", "cameraId": "c", "location": "x"}
+        for shards in (0, (os.cpu_count() or 1) + 1):
+            response = client.post("/run", json={**request_data, "shards": shards})
+            assert response.status_code == 422
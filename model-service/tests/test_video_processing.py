@@ -42,6 +42,41 @@ class TestVideoProcessing:
         # Verify thread was started for broadcast
         mock_thread.assert_called()
     
+    @patch('app.cv2.VideoCapture')
+    @patch('app.model')
+    @patch('app.threading.Thread')
+    def test_predict_video_saves_index(self, mock_thread, mock_model, mock_cv2, tmp_path):
+        """Test that raw detections below the alert threshold are kept in the index."""
+        from app import predict_video
+        from detection_index import DetectionIndex
+
+        mock_cap = Mock()
+        mock_cap.isOpened.return_value = True
+        mock_cap.get.return_value = 30.0
+        mock_cv2.return_value = mock_cap
+
+        low = Mock()
+        low.cls.item.return_value = 0
+        low.conf.item.return_value = 0.4
+        low.xyxy = [Mock(tolist=Mock(return_value=[1.0, 2.0, 3.0, 4.0]))]
+        high = Mock()
+        high.cls.item.return_value = 0
+        high.conf.item.return_value = 0.9
+        high.xyxy = [Mock(tolist=Mock(return_value=[5.0, 6.0, 7.0, 8.0]))]
+        mock_model.track.return_value = [Mock(boxes=[low]), Mock(boxes=[high])]
+
+        with patch('app.INDEX_DIR', str(tmp_path)):
+            predict_video("/fake/video.mp4", {"cameraId": "cam_001"}, save_index=True)
+
+        # Inference runs at the index confidence, alerts still use THRESHOLD
+        assert mock_model.track.call_args[1]['conf'] < 0.7
+        assert mock_thread.call_count == 1
+
+        index = DetectionIndex.load(str(tmp_path / "video"))
+        assert list(index.frame) == [0, 1]
+        assert index.xyxy[1].tolist() == [5.0, 6.0, 7.0, 8.0]
+        assert index.meta["frame_count"] == 2
+
     @patch('app.cv2.VideoCapture')
     def test_predict_video_invalid_file(self, mock_cv2):
         """Test video prediction with invalid video file."""
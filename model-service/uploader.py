@@ -1,11 +1,17 @@
 import os
+import json
 import subprocess
 import datetime
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.http import MediaFileUpload
 from dotenv import load_dotenv
 import logging
+from metrics import timed
 
 load_dotenv()
 
@@ -14,13 +20,22 @@ load_dotenv()
 # ─────────────────────────────────────────────────────────────
 SERVICE_ACCOUNT_FILE = os.getenv("SERVICE_ACCOUNT_FILE", "/app/credentials/drive_sa.json")
 ROOT_FOLDER_ID       = "1ycXApVQxo6s2AGJnaEpjO_yVHiZs7WVX"   # your Drive root for CrashAlert clips
+DRIVE_API_ENDPOINT   = os.getenv("DRIVE_API_ENDPOINT")        # local stand-in for Drive (load tests); no auth
 
 SCOPES = ["https://www.googleapis.com/auth/drive.file"]
 
-credentials  = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
-)
-drive_service = build("drive", "v3", credentials=credentials)
+if DRIVE_API_ENDPOINT:
+    # Rewrite rootUrl in the bundled discovery document rather than using
+    # client_options, which keeps https for media uploads
+    discovery_doc = json.loads(get_static_doc("drive", "v3"))
+    discovery_doc["rootUrl"] = DRIVE_API_ENDPOINT.rstrip("/") + "/"
+    credentials = AnonymousCredentials()
+    drive_service = build_from_document(discovery_doc, credentials=credentials)
+else:
+    credentials  = service_account.Credentials.from_service_account_file(
+        SERVICE_ACCOUNT_FILE, scopes=SCOPES
+    )
+    drive_service = build("drive", "v3", credentials=credentials)
 
 # ─────────────────────────────────────────────────────────────
 # Helpers
@@ -47,18 +62,27 @@ def trim_video_ffmpeg(
         output_video,
         "-y"
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with timed("clip_trim"):
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     return output_video
 
 
-def _get_or_create_today_folder() -> str:
+def _new_http() -> AuthorizedHttp:
+    """
+    A connection for one upload. httplib2 connections are not thread-safe and
+    clips are uploaded from concurrent broadcast threads.
+    """
+    return AuthorizedHttp(credentials, http=httplib2.Http())
+
+
+def _get_or_create_today_folder(http=None) -> str:
     """Return Drive folder-ID named YYYY-MM-DD under ROOT_FOLDER_ID."""
     today = datetime.date.today().isoformat()
     query = (
         f"'{ROOT_FOLDER_ID}' in parents and "
         f"name='{today}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
     )
-    resp = drive_service.files().list(q=query, fields="files(id)", pageSize=1).execute()
+    resp = drive_service.files().list(q=query, fields="files(id)", pageSize=1).execute(http=http)
     if resp["files"]:
         return resp["files"][0]["id"]
 
@@ -67,20 +91,22 @@ def _get_or_create_today_folder() -> str:
         "mimeType": "application/vnd.google-apps.folder",
         "parents": [ROOT_FOLDER_ID],
     }
-    return drive_service.files().create(body=meta, fields="id").execute()["id"]
+    return drive_service.files().create(body=meta, fields="id").execute(http=http)["id"]
 
 
 def upload_to_drive(logger: logging.Logger, file_path: str) -> str:
     """Upload MP4, set it public, and return the shareable /view link."""
-    folder_id = _get_or_create_today_folder()
-    media     = MediaFileUpload(file_path, mimetype="video/mp4")
+    with timed("storage_upload"):
+        http      = _new_http()
+        folder_id = _get_or_create_today_folder(http)
+        media     = MediaFileUpload(file_path, mimetype="video/mp4")
 
-    meta = {"name": os.path.basename(file_path), "parents": [folder_id]}
-    file = drive_service.files().create(body=meta, media_body=media, fields="id").execute()
+        meta = {"name": os.path.basename(file_path), "parents": [folder_id]}
+        file = drive_service.files().create(body=meta, media_body=media, fields="id").execute(http=http)
 
-    drive_service.permissions().create(
-        fileId=file["id"], body={"role": "reader", "type": "anyone"}, fields="id"
-    ).execute()
+        drive_service.permissions().create(
+            fileId=file["id"], body={"role": "reader", "type": "anyone"}, fields="id"
+        ).execute(http=http)
     
     link = f"https://drive.google.com/file/d/{file['id']}/view"
     logger.info(f"link: {link}")